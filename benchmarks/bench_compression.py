@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compression settings: wall time versus disk footprint.
+
+For each compression level and thread count this script BGZF-compresses a
+FASTQ and a VCF with bgzip (and a BAM with samtools, if --bam is given),
+then reads the result back once, the way the next rule of the pipeline
+would. It reports the write and read times and the compressed size, which is
+what the ``compression`` section of config.yaml trades off: kept files at
+``level``, temporary files read once at ``intermediate_level``.
+
+Without --fastq/--vcf, simulated reads and a synthetic VCF are generated.
+bgzip must be on PATH, and samtools for --bam.
+
+Usage:
+    python benchmarks/bench_compression.py --pairs 500000 --records 1000000
+    python benchmarks/bench_compression.py --fastq R1.fastq.gz --bam E1_OUT-sorted.bam --levels 0 1 6 --threads 1 8
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_filter_vcf import write_synthetic_vcf
+
+
+def sh(cmd):
+    subprocess.run(cmd, shell=True, check=True, executable="/bin/bash")
+
+
+def write_synthetic_fastq(path, pairs, read_len=150, seed=0):
+    """Write ``2 * pairs`` random reads with binned Illumina-style qualities, uncompressed."""
+    rng = random.Random(seed)
+    quals = "FFFFFFF:,#"
+    with open(path, "w") as f:
+        for i in range(pairs):
+            for mate in (1, 2):
+                seq = "".join(rng.choice("ACGT") for _ in range(read_len))
+                qual = "".join(rng.choice(quals) for _ in range(read_len))
+                f.write(f"@r{i}/{mate}\n{seq}\n+\n{qual}\n")
+
+
+def timed(cmd):
+    start = time.perf_counter()
+    sh(cmd)
+    return time.perf_counter() - start
+
+
+def bench_bgzip(name, source, workdir, level, threads):
+    out = os.path.join(workdir, f"{name}.l{level}.t{threads}.gz")
+    write = timed(f"bgzip -@ {threads} -l {level} -c {source} > {out}")
+    read = timed(f"bgzip -@ {threads} -d -c {out} > /dev/null")
+    size = os.path.getsize(out)
+    os.remove(out)
+    return name, level, threads, write, read, size
+
+
+def bench_bam(bam, workdir, level, threads):
+    out = os.path.join(workdir, f"bam.l{level}.t{threads}.bam")
+    write = timed(f"samtools view -@ {threads} -b --output-fmt-option level={level} -o {out} {bam}")
+    read = timed(f"samtools view -@ {threads} -c {out} > /dev/null")
+    size = os.path.getsize(out)
+    os.remove(out)
+    return "bam", level, threads, write, read, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BGZF compression levels and threads")
+    parser.add_argument("--fastq", help="FASTQ(.gz) to compress (default: simulated reads)")
+    parser.add_argument("--vcf", help="VCF(.gz) to compress (default: synthetic records)")
+    parser.add_argument("--bam", help="BAM to recompress with samtools")
+    parser.add_argument("--pairs", type=int, default=200_000, help="Simulated read pairs (default: 200000)")
+    parser.add_argument("--records", type=int, default=500_000, help="Synthetic VCF records (default: 500000)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[0, 1, 4, 6, 9], help="Levels (default: 0 1 4 6 9)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4], help="Thread counts (default: 1 4)")
+    parser.add_argument("--workdir", help="Directory for temporary files (default: system temp)")
+    args = parser.parse_args()
+
+    missing = [tool for tool in ["bgzip"] + (["samtools"] if args.bam else []) if shutil.which(tool) is None]
+    if missing:
+        sys.exit(f"Missing tools: {', '.join(missing)} (conda activate mbs)")
+    if any(not 0 <= level <= 9 for level in args.levels):
+        sys.exit("--levels must be between 0 and 9")
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        # Compress from plain text so every setting starts from the same input
+        sources = {}
+        for name, given in (("fastq", args.fastq), ("vcf", args.vcf)):
+            path = os.path.join(tmp, f"input.{name}")
+            if given:
+                sh(f"bgzip -dc {given} > {path}" if given.endswith(".gz") else f"cp {given} {path}")
+            elif name == "fastq":
+                print(f"Simulating {args.pairs:,} read pairs ...")
+                write_synthetic_fastq(path, args.pairs)
+            else:
+                print(f"Writing {args.records:,} synthetic VCF records ...")
+                write_synthetic_vcf(path, args.records)
+            sources[name] = path
+
+        results = []
+        for level in args.levels:
+            for threads in args.threads:
+                for name, path in sources.items():
+                    results.append(bench_bgzip(name, path, tmp, level, threads))
+                if args.bam:
+                    results.append(bench_bam(args.bam, tmp, level, threads))
+        plain = {name: os.path.getsize(path) for name, path in sources.items()}
+
+    print(f"{'data':<6} {'level':>5} {'threads':>7} {'write s':>9} {'read s':>8} {'MiB':>9} {'ratio':>6}")
+    for name, level, threads, write, read, size in results:
+        ratio = f"{plain[name] / size:>6.2f}" if name in plain and size else f"{'-':>6}"
+        print(f"{name:<6} {level:>5} {threads:>7} {write:>9.2f} {read:>8.2f} {size / 2**20:>9.1f} {ratio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+DAG build time versus number of libraries.
+
+For 10, 100 and 1000 libraries (by default) this script:
+  1. times the per-job dataset lookups snakemake makes while building the DAG
+     (two symlink lookups per library, one BAM list per sample, the FastQC
+     target list), with the original table-scanning functions and with the
+     DatasetIndex-backed ones;
+  2. builds a throw-away run from the templates and times `snakemake --dryrun`
+     on it (skipped with --no-dryrun or when snakemake is not on PATH).
+
+Usage:
+    python benchmarks/bench_dag.py
+    python benchmarks/bench_dag.py --libraries 10 100 1000 5000 --libraries-per-sample 4
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+import yaml
+
+from mapping_by_sequencing.pipeline.config_parsers import (
+    DatasetIndex, fastqc_raw_outputs, get_datasets_for_symlinks, get_sample_bamfiles,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_get_datasets_for_symlinks(df, sample=None, library=None, d=None, infolder="data/reads", outfolder="data/reads"):
+    """Pre-index ``get_datasets_for_symlinks``, kept verbatim as the baseline."""
+    dataset_file = None
+    for row in df.itertuples():
+        if library is None:
+            if getattr(row, "sample") == sample:
+                dataset_file = os.path.join(outfolder, getattr(row, d))
+        else:
+            if getattr(row, "sample") == sample and getattr(row, "library") == library:
+                dataset_file = os.path.join(outfolder, getattr(row, d))
+    return dataset_file
+
+
+def legacy_fastqc_raw_outputs(datasets_tab=None, analysis_tab=None, infolder="data/reads", outfolder="results/fastqc_raw", ext=".fastq.gz"):
+    fastqc_out = []
+    for i, l in datasets_tab.iterrows():
+        fastqc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.R1_fastqc.html".format(sample_ctrl=l["sample"], library=l["library"])))
+        fastqc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.R2_fastqc.html".format(sample_ctrl=l["sample"], library=l["library"])))
+    return fastqc_out
+
+
+def legacy_get_sample_bamfiles(df, res_dir="results", sample=None, library=None, ref_genome_mt=None, ref_genome_n=None):
+    outpaths = []
+    for row in df.itertuples():
+        if getattr(row, "sample") == sample:
+            bam_file = "{sample}_{library}_OUT-sorted.bam".format(sample=sample, library=getattr(row, "library"))
+            out_folder = "OUT_{base}".format(base=bam_file.replace("_OUT-sorted.bam", ""))
+            outpaths.append("{results}/{sample}/map/{out_folder}/{bam_file}".format(results=res_dir, bam_file=bam_file, sample=sample, out_folder=out_folder))
+    return outpaths
+
+
+def make_datasets(reads_dir, n_libraries, per_sample):
+    """datasets.tab with n_libraries rows, per_sample libraries per sample, the first sample as control."""
+    rows = []
+    for i in range(n_libraries):
+        sample, library = f"S{i // per_sample}", str(i % per_sample + 1)
+        r1, r2 = (os.path.join(reads_dir, f"{sample}_{library}_{r}.fq.gz") for r in ("1", "2"))
+        rows.append({"sample": sample, "sample_type": "control" if sample == "S0" else "mutated",
+                     "library": library, "R1": r1, "R2": r2})
+    return pd.DataFrame(rows)
+
+
+def time_lookups(df, source, symlinks, bamfiles, fastqc):
+    """Emulate the lookups made on ``source`` while building the DAG of ``df``; returns seconds."""
+    jobs = [(row.sample, row.library) for row in df.itertuples()]
+    samples = list(df["sample"].unique())
+    start = time.perf_counter()
+    fastqc(source)
+    for sample, library in jobs:
+        for d in ("R1", "R2"):
+            symlinks(source, sample=sample, library=library, d=d)
+    for sample in samples:
+        bamfiles(source, res_dir="results", sample=sample)
+    return time.perf_counter() - start
+
+
+def time_dryrun(workdir, df):
+    """Lay out a run from the templates and time snakemake --dryrun on it."""
+    ref_dir = os.path.join(workdir, "data", "reference_genomes")
+    run_dir = os.path.join(workdir, "runs", "bench")
+    os.makedirs(ref_dir)
+    os.makedirs(run_dir)
+    for row in df.itertuples():
+        for path in (row.R1, row.R2):
+            open(path, "w").close()
+    with open(os.path.join(REPO_ROOT, "templates", "config.yaml.template")) as f:
+        config = yaml.safe_load(f)
+    for ext in ("", ".fai", ".amb"):
+        with open(os.path.join(ref_dir, config["ref_genome"] + ext), "w") as f:
+            f.write(">1\nACGT\n" if ext == "" else "1\t4\t3\t4\t5\n" if ext == ".fai" else "")
+    config["workdir"] = run_dir
+    with open(os.path.join(run_dir, "config.yaml"), "w") as f:
+        yaml.dump(config, f)
+    shutil.copy2(os.path.join(REPO_ROOT, "templates", "Snakefile.template"), os.path.join(run_dir, "Snakefile"))
+    df.to_csv(os.path.join(run_dir, "datasets.tab"), sep="\t", index=False)
+
+    start = time.perf_counter()
+    subprocess.run(["snakemake", "--dryrun", "--cores", "1", "--quiet"], cwd=run_dir, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DAG construction vs number of libraries")
+    parser.add_argument("--libraries", type=int, nargs="+", default=[10, 100, 1000], help="Library counts (default: 10 100 1000)")
+    parser.add_argument("--libraries-per-sample", type=int, default=2, help="Libraries (lanes) per sample (default: 2)")
+    parser.add_argument("--no-dryrun", action="store_true", help="Only time the lookups, not snakemake --dryrun")
+    parser.add_argument("--workdir", help="Directory for temporary files (default: system temp)")
+    args = parser.parse_args()
+
+    dryrun = not args.no_dryrun and shutil.which("snakemake") is not None
+    if not args.no_dryrun and not dryrun:
+        print("snakemake not on PATH; timing lookups only")
+
+    results = []
+    for n in args.libraries:
+        with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+            reads_dir = os.path.join(tmp, "data", "reads")
+            os.makedirs(reads_dir)
+            df = make_datasets(reads_dir, n, args.libraries_per_sample)
+            legacy = time_lookups(df, df, legacy_get_datasets_for_symlinks, legacy_get_sample_bamfiles,
+                                  lambda d: legacy_fastqc_raw_outputs(datasets_tab=d))
+            start = time.perf_counter()
+            index = DatasetIndex(df)
+            build = time.perf_counter() - start
+            indexed = build + time_lookups(df, index, get_datasets_for_symlinks, get_sample_bamfiles,
+                                           lambda d: fastqc_raw_outputs(datasets_tab=d))
+            results.append((n, legacy, indexed, time_dryrun(tmp, df) if dryrun else None))
+
+    print(f"{'libraries':>10} {'scan lookups s':>15} {'indexed lookups s':>18} {'speedup':>8} {'dryrun s':>9}")
+    for n, legacy, indexed, dry in results:
+        dry = f"{dry:>9.2f}" if dry is not None else f"{'-':>9}"
+        print(f"{n:>10} {legacy:>15.4f} {indexed:>18.4f} {legacy / indexed:>7.1f}x {dry}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the EMS SNP filter.
+
+Generates a synthetic single-sample bcftools-style VCF, filters it with the
+original line-by-line implementation and with the chunked engine, checks
+that both outputs are byte-identical and reports records/sec.
+
+Usage:
+    python benchmarks/bench_filter_vcf.py --records 2000000
+"""
+
+import argparse
+import filecmp
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from mapping_by_sequencing.pipeline.vcf_filter import filter_vcf_chunked
+
+FORMAT = "GT:PL:DP:SP:ADF:ADR:AD"
+BASES = "ACGT"
+
+
+def legacy_filter_vcf(vcf_file, vcf_filt_file):
+    """The pre-engine ``utils.filter_vcf`` body, kept verbatim as the baseline."""
+    vcf = open(vcf_file, 'r')
+    vcf_filt = open(vcf_filt_file, 'w')
+    for l in vcf:
+        if l.startswith("#"):
+            vcf_filt.write(l)
+        else:
+            m = l.split()
+            REF = m[3]
+            ALT = m[4].split(',')
+            if REF == "G" and "A" in ALT:
+                snp_index = ALT.index("A")
+            elif REF == "C" and "T" in ALT:
+                snp_index = ALT.index("T")
+            else:
+                continue
+            FORMAT_DEF = m[8].split(":")
+            AD_index = FORMAT_DEF.index("AD")
+            DP_index = FORMAT_DEF.index("DP")
+            SAMPLE_INFO = m[-1]
+            AD = int(SAMPLE_INFO.split(":")[AD_index].split(',')[snp_index+1])
+            DP = int(SAMPLE_INFO.split(":")[DP_index])
+            if AD/DP >= 0.3:
+                vcf_filt.write(l)
+    vcf_filt.close()
+
+
+def write_synthetic_vcf(path, n_records, seed=0):
+    """Write ``n_records`` random SNP records, with some multi-allelic sites, to ``path``."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("##fileformat=VCFv4.2\n")
+        f.write('##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allelic depths">\n')
+        f.write('##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Number of high-quality bases">\n')
+        f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n")
+        pos = 0
+        for _ in range(n_records):
+            pos += rng.randint(1, 200)
+            ref = rng.choice(BASES)
+            alts = [b for b in BASES if b != ref]
+            alt = ",".join(rng.sample(alts, 2)) if rng.random() < 0.05 else rng.choice(alts)
+            n_alt = alt.count(",") + 1
+            ad = [rng.randint(0, 30) for _ in range(n_alt + 1)]
+            dp = max(1, sum(ad))
+            adf = ",".join(str(x // 2) for x in ad)
+            adr = ",".join(str(x - x // 2) for x in ad)
+            sample = f"0/1:0,0,0:{dp}:0:{adf}:{adr}:{','.join(map(str, ad))}"
+            f.write(f"1\t{pos}\t.\t{ref}\t{alt}\t50\t.\tDP={dp}\t{FORMAT}\t{sample}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chunked VCF EMS filter")
+    parser.add_argument("--records", type=int, default=2_000_000, help="Number of synthetic records (default: 2000000)")
+    parser.add_argument("--block-mb", type=int, default=8, help="Engine block size in MiB (default: 8)")
+    parser.add_argument("--workdir", help="Directory for temporary files (default: system temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        vcf = os.path.join(tmp, "synthetic.vcf")
+        print(f"Generating {args.records:,} records ...")
+        write_synthetic_vcf(vcf, args.records)
+
+        runs = [
+            ("legacy", legacy_filter_vcf, os.path.join(tmp, "legacy.vcf")),
+            ("chunked", lambda i, o: filter_vcf_chunked(i, o, block_bytes=args.block_mb << 20), os.path.join(tmp, "chunked.vcf")),
+        ]
+        # BGZF output is piped through bgzip -@
+        if shutil.which("bgzip"):
+            runs.append(("chunked (bgzf out)", lambda i, o: filter_vcf_chunked(i, o, block_bytes=args.block_mb << 20),
+                         os.path.join(tmp, "chunked.vcf.gz")))
+        else:
+            print("bgzip not found: skipping the BGZF output run")
+
+        results = []
+        for name, func, out in runs:
+            start = time.perf_counter()
+            func(vcf, out)
+            elapsed = time.perf_counter() - start
+            results.append((name, elapsed, args.records / elapsed))
+
+        identical = filecmp.cmp(os.path.join(tmp, "legacy.vcf"), os.path.join(tmp, "chunked.vcf"), shallow=False)
+
+    print(f"{'implementation':<20} {'seconds':>10} {'records/sec':>14}")
+    for name, elapsed, rate in results:
+        print(f"{name:<20} {elapsed:>10.2f} {rate:>14,.0f}")
+    print(f"Byte-identical output: {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Per-sample calling + subtractBed versus joint calling + single-pass subtraction.
+
+Runs both variant paths of the Snakefile and reports wall time and the disk
+used by intermediate files (everything except the final all_vs_<ctrl>.vcf
+and the per-sample *_filt.vcf files, which both paths produce).
+
+Without --ref/--bams the calling step is skipped: a synthetic joint VCF is
+generated and split into per-sample call sets, so only the post-calling
+stages are compared. The legacy path needs bgzip, bcftools and subtractBed on
+PATH; with --ref/--bams bcftools mpileup/call is timed as well.
+
+Usage:
+    python benchmarks/bench_joint_calling.py --records 500000 --mutants 4
+    python benchmarks/bench_joint_calling.py --ref ref.fna --bams CTRL.bam M1.bam M2.bam
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mapping_by_sequencing.pipeline.vcf_filter import filter_vcf_chunked, filter_vcf_samples
+from mapping_by_sequencing.pipeline.vcf_io import open_vcf
+
+FORMAT = "GT:PL:DP:SP:ADF:ADR:AD"
+MPILEUP = ("bcftools mpileup -d 1000 -Ou -a FORMAT/AD,FORMAT/ADF,FORMAT/ADR,FORMAT/DP,FORMAT/SP,FORMAT/SCR,"
+           "INFO/AD,INFO/ADF,INFO/ADR,INFO/SCR -f {ref} {bams} | bcftools call -mv {out}")
+
+
+def sh(cmd):
+    subprocess.run(cmd, shell=True, check=True, executable="/bin/bash")
+
+
+def write_synthetic_joint_vcf(path, samples, n_records, seed=0):
+    """Joint VCF where each sample carries the ALT allele at a random subset of sites."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("##fileformat=VCFv4.2\n##contig=<ID=1,length=1000000000>\n")
+        f.write('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n')
+        for key, number in (("PL", "G"), ("DP", "1"), ("SP", "1"), ("ADF", "R"), ("ADR", "R"), ("AD", "R")):
+            f.write(f'##FORMAT=<ID={key},Number={number},Type=Integer,Description="{key}">\n')
+        f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t" + "\t".join(samples) + "\n")
+        pos = 0
+        for _ in range(n_records):
+            pos += rng.randint(1, 200)
+            ref = rng.choice("ACGT")
+            alt = rng.choice([b for b in "ACGT" if b != ref])
+            cols = []
+            for _ in samples:
+                if rng.random() < 0.5:
+                    ad = [rng.randint(0, 20), rng.randint(1, 20)]
+                    gt = "0/1"
+                else:
+                    ad = [rng.randint(1, 20), 0]
+                    gt = "0/0"
+                adf = [x // 2 for x in ad]
+                adr = [x - y for x, y in zip(ad, adf)]
+                cols.append(f"{gt}:0,0,0:{sum(ad)}:0:{adf[0]},{adf[1]}:{adr[0]},{adr[1]}:{ad[0]},{ad[1]}")
+            f.write(f"1\t{pos}\t.\t{ref}\t{alt}\t50\t.\t.\t{FORMAT}\t" + "\t".join(cols) + "\n")
+
+
+def split_per_sample(joint_vcf, samples, outdir):
+    """Emulate per-sample calling: each sample's VCF holds its own column at its ALT sites."""
+    handles = {s: open(os.path.join(outdir, f"{s}.vcf"), "w") for s in samples}
+    with open(joint_vcf) as f:
+        for l in f:
+            if l.startswith("##"):
+                for h in handles.values():
+                    h.write(l)
+                continue
+            m = l.rstrip("\n").split("\t")
+            for i, s in enumerate(samples):
+                if l.startswith("#CHROM") or "1" in m[9 + i].split(":")[0]:
+                    handles[s].write("\t".join(m[:9] + [s if l.startswith("#CHROM") else m[9 + i]]) + "\n")
+    for h in handles.values():
+        h.close()
+
+
+def dir_bytes(path, exclude):
+    total = 0
+    files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            full = os.path.join(root, name)
+            if full not in exclude:
+                total += os.path.getsize(full)
+                files += 1
+    return total, files
+
+
+def run_per_sample(workdir, ctrl, mutants, ref=None, bams=None):
+    """The Snakefile's per_sample path: call, filter, subtractBed, bgzip/index, bcftools merge."""
+    samples = [ctrl] + mutants
+    if bams:
+        for s, bam in zip(samples, bams):
+            sh(MPILEUP.format(ref=ref, bams=bam, out=f"> {workdir}/{s}.vcf"))
+    final = {f"{workdir}/{s}_filt.vcf" for s in samples} | {f"{workdir}/all_vs_{ctrl}.vcf"}
+    for s in samples:
+        filter_vcf_chunked(f"{workdir}/{s}.vcf", f"{workdir}/{s}_filt.vcf")
+    for s in mutants:
+        sh(f"subtractBed -header -a {workdir}/{s}_filt.vcf -b {workdir}/{ctrl}_filt.vcf | bgzip -c > {workdir}/{s}_{ctrl}_filt.vcf.gz")
+        sh(f"bcftools index -f -o {workdir}/{s}_{ctrl}_filt.vcf.gz.csi {workdir}/{s}_{ctrl}_filt.vcf.gz")
+    sh(f"bgzip < {workdir}/{ctrl}_filt.vcf > {workdir}/{ctrl}_filt.vcf.gz")
+    sh(f"bcftools index -f -o {workdir}/{ctrl}_filt.vcf.gz.csi {workdir}/{ctrl}_filt.vcf.gz")
+    mutant_vcfs = " ".join(f"{workdir}/{s}_{ctrl}_filt.vcf.gz" for s in mutants)
+    sh(f"bcftools merge {workdir}/{ctrl}_filt.vcf.gz {mutant_vcfs} -O v -o {workdir}/all_vs_{ctrl}.vcf")
+    return final
+
+
+def run_joint(workdir, ctrl, mutants, joint_vcf=None, ref=None, bams=None):
+    """The Snakefile's joint path: one mpileup over all BAMs, one filtering/subtraction pass."""
+    samples = [ctrl] + mutants
+    rename = {}
+    if bams:
+        joint_vcf = f"{workdir}/all_samples.vcf.gz"
+        sh(MPILEUP.format(ref=ref, bams=" ".join(bams), out=f"-Oz -o {joint_vcf}"))
+        rename = dict(zip(bams, samples))
+    final = {f"{workdir}/{s}_filt.vcf" for s in samples} | {f"{workdir}/all_vs_{ctrl}.vcf"}
+    filter_vcf_samples(joint_vcf, {s: f"{workdir}/{s}_filt.vcf" for s in samples},
+                       merged_file=f"{workdir}/all_vs_{ctrl}.vcf", control_sample=ctrl, rename=rename)
+    return final
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-sample vs joint variant calling paths")
+    parser.add_argument("--records", type=int, default=500_000, help="Synthetic joint records (default: 500000)")
+    parser.add_argument("--mutants", type=int, default=4, help="Synthetic mutant samples (default: 4)")
+    parser.add_argument("--ref", help="Reference FASTA (real-data mode)")
+    parser.add_argument("--bams", nargs="+", help="Control BAM followed by mutant BAMs (real-data mode)")
+    parser.add_argument("--workdir", help="Directory for temporary files (default: system temp)")
+    args = parser.parse_args()
+
+    missing = [tool for tool in ("bcftools", "bgzip", "subtractBed") if shutil.which(tool) is None]
+    if missing:
+        sys.exit(f"Missing tools for the per-sample path: {', '.join(missing)} (conda activate mbs)")
+    if bool(args.ref) != bool(args.bams):
+        sys.exit("--ref and --bams must be given together")
+
+    n_mutants = len(args.bams) - 1 if args.bams else args.mutants
+    ctrl, mutants = "CTRL", [f"M{i + 1}" for i in range(n_mutants)]
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        legacy_dir, joint_dir = os.path.join(tmp, "per_sample"), os.path.join(tmp, "joint")
+        os.makedirs(legacy_dir)
+        os.makedirs(joint_dir)
+        joint_vcf = None
+        if not args.bams:
+            print(f"Generating {args.records:,} synthetic records for {n_mutants + 1} samples ...")
+            joint_vcf = os.path.join(joint_dir, "all_samples.vcf.gz")
+            plain = os.path.join(tmp, "joint.vcf")
+            write_synthetic_joint_vcf(plain, [ctrl] + mutants, args.records)
+            split_per_sample(plain, [ctrl] + mutants, legacy_dir)
+            with open(plain, "rb") as src, open_vcf(joint_vcf, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+        results = []
+        start = time.perf_counter()
+        final = run_per_sample(legacy_dir, ctrl, mutants, ref=args.ref, bams=args.bams)
+        results.append(("per_sample", time.perf_counter() - start) + dir_bytes(legacy_dir, final))
+        start = time.perf_counter()
+        final = run_joint(joint_dir, ctrl, mutants, joint_vcf=joint_vcf, ref=args.ref, bams=args.bams)
+        results.append(("joint", time.perf_counter() - start) + dir_bytes(joint_dir, final))
+
+    scope = "calling + post-calling" if args.bams else "post-calling only"
+    print(f"Samples: 1 control + {n_mutants} mutants ({scope})")
+    print(f"{'mode':<12} {'seconds':>10} {'intermediate MiB':>18} {'files':>7}")
+    for mode, elapsed, size, files in results:
+        print(f"{mode:<12} {elapsed:>10.2f} {size / 2**20:>18.1f} {files:>7}")
+
+
+if __name__ == "__main__":
+    main()
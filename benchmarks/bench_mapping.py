@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Mapping stage: SAM round-trip (map + sam2bam) versus the streaming map rule.
+
+The old rules wrote a gzipped SAM, gunzipped it to a full SAM in $TMP,
+converted it to BAM, sorted it to another BAM and ran rmdup. The streaming
+rule pipes bwa mem into fixmate/sort/markdup. For both, this script reports
+wall time and peak disk usage of the output and temp directories (sampled
+while the commands run).
+
+Without --ref/--r1/--r2 a random reference and simulated read pairs are
+generated. bwa and samtools must be on PATH.
+
+Usage:
+    python benchmarks/bench_mapping.py --genome-size 2000000 --pairs 500000
+    python benchmarks/bench_mapping.py --ref ref.fna --r1 R1.fastq.gz --r2 R2.fastq.gz --threads 8
+"""
+
+import argparse
+import gzip
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+def sh(cmd):
+    subprocess.run(cmd, shell=True, check=True, executable="/bin/bash")
+
+
+def simulate(workdir, genome_size, pairs, read_len=150, insert=400, seed=0):
+    """Write a random reference and gzipped paired reads sampled from it."""
+    rng = random.Random(seed)
+    genome = "".join(rng.choice("ACGT") for _ in range(genome_size))
+    ref = os.path.join(workdir, "ref.fna")
+    with open(ref, "w") as f:
+        f.write(">chr1\n")
+        for i in range(0, genome_size, 80):
+            f.write(genome[i:i + 80] + "\n")
+    r1, r2 = os.path.join(workdir, "R1.fastq.gz"), os.path.join(workdir, "R2.fastq.gz")
+    qual = "I" * read_len
+    with gzip.open(r1, "wt", compresslevel=1) as f1, gzip.open(r2, "wt", compresslevel=1) as f2:
+        for i in range(pairs):
+            start = rng.randint(0, genome_size - insert)
+            fragment = genome[start:start + insert]
+            f1.write(f"@r{i}/1\n{fragment[:read_len]}\n+\n{qual}\n")
+            f2.write(f"@r{i}/2\n{fragment[-read_len:].translate(COMPLEMENT)[::-1]}\n+\n{qual}\n")
+    return ref, r1, r2
+
+
+class DiskSampler(threading.Thread):
+    """Poll the total size of some directories and keep the maximum."""
+
+    def __init__(self, paths, interval=0.2):
+        super().__init__(daemon=True)
+        self.paths = paths
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def size(self):
+        total = 0
+        for path in self.paths:
+            for root, _, names in os.walk(path):
+                for name in names:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+        return total
+
+    def run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.size())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+        self.peak = max(self.peak, self.size())
+
+
+def measure(name, commands, dirs):
+    sampler = DiskSampler(dirs)
+    sampler.start()
+    start = time.perf_counter()
+    for cmd in commands:
+        sh(cmd)
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    return name, elapsed, sampler.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SAM round-trip vs streaming mapping")
+    parser.add_argument("--ref", help="Reference FASTA (bwa-indexed or indexable)")
+    parser.add_argument("--r1", help="R1 FASTQ(.gz)")
+    parser.add_argument("--r2", help="R2 FASTQ(.gz)")
+    parser.add_argument("--genome-size", type=int, default=2_000_000, help="Simulated genome size (default: 2000000)")
+    parser.add_argument("--pairs", type=int, default=500_000, help="Simulated read pairs (default: 500000)")
+    parser.add_argument("--threads", type=int, default=4, help="bwa/samtools threads (default: 4)")
+    parser.add_argument("--sort-mem", default="768M", help="samtools sort -m for the streaming rule (default: 768M)")
+    parser.add_argument("--workdir", help="Directory for temporary files (default: system temp)")
+    args = parser.parse_args()
+
+    missing = [tool for tool in ("bwa", "samtools") if shutil.which(tool) is None]
+    if missing:
+        sys.exit(f"Missing tools: {', '.join(missing)} (conda activate mbs)")
+    if any([args.ref, args.r1, args.r2]) and not all([args.ref, args.r1, args.r2]):
+        sys.exit("--ref, --r1 and --r2 must be given together")
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        if args.ref:
+            ref, r1, r2 = args.ref, args.r1, args.r2
+        else:
+            print(f"Simulating {args.pairs:,} pairs on a {args.genome_size:,} bp genome ...")
+            ref, r1, r2 = simulate(tmp, args.genome_size, args.pairs)
+        if not os.path.exists(ref + ".bwt"):
+            sh(f"bwa index {ref} 2> /dev/null")
+
+        t = args.threads
+        results = []
+        out, scratch = os.path.join(tmp, "old_out"), os.path.join(tmp, "old_tmp")
+        os.makedirs(out)
+        os.makedirs(scratch)
+        results.append(measure("map + sam2bam", [
+            f"bwa mem -t {t} {ref} {r1} {r2} 2> /dev/null | gzip - > {out}/lib.sam.gz",
+            f"gunzip -c {out}/lib.sam.gz > {scratch}/lib.sam && samtools view -@ {t} -bS -o {scratch}/lib.bam {scratch}/lib.sam",
+            f"samtools sort -@ {t} -T {scratch}/lib -o {scratch}/lib.sorted.bam {scratch}/lib.bam",
+            f"samtools rmdup -s {scratch}/lib.sorted.bam {out}/lib_OUT-sorted.bam 2> /dev/null",
+        ], [out, scratch]))
+
+        out, scratch = os.path.join(tmp, "new_out"), os.path.join(tmp, "new_tmp")
+        os.makedirs(out)
+        os.makedirs(scratch)
+        results.append(measure("streaming map", [
+            f"bwa mem -t {t} {ref} {r1} {r2} 2> /dev/null | samtools fixmate -m -u - - | "
+            f"samtools sort -u -@ {t} -m {args.sort_mem} -T {scratch}/lib.sort - | "
+            f"samtools markdup -r -@ {t} - {out}/lib_OUT-sorted.bam 2> /dev/null",
+        ], [out, scratch]))
+
+    print(f"{'stage':<16} {'seconds':>10} {'peak disk MiB':>15}")
+    for name, elapsed, peak in results:
+        print(f"{name:<16} {elapsed:>10.2f} {peak / 2**20:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Frequency plot render time and peak RSS versus number of sites.
+
+Each configuration renders one PNG with create_frequency_plot in a fresh
+process (so ru_maxrss is the peak of that render alone), in two modes:
+  - scatter:  every site drawn as a marker, one full-height panel per contig
+              (max_points/max_panels/max_figure_height disabled: the old behaviour)
+  - scalable: the defaults, hexbin density above max_points sites per panel,
+              small contigs grouped into one panel, figure height capped
+
+Usage:
+    python benchmarks/bench_plot.py
+    python benchmarks/bench_plot.py --points 10000 100000 1000000 5000000 --contigs 5 300
+    python benchmarks/bench_plot.py --dpi 150
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_mutations(n_points, n_contigs, seed=0):
+    """n_points sites over n_contigs contigs of decreasing length."""
+    rng = np.random.default_rng(seed)
+    lengths = (30_000_000 / np.arange(1, n_contigs + 1)).astype(np.int64) + 10_000
+    counts = rng.multinomial(n_points, lengths / lengths.sum())
+    mutations = OrderedDict()
+    for i, (length, count) in enumerate(zip(lengths, counts)):
+        positions = np.sort(rng.integers(1, length, count))
+        mutations[f"ctg{i + 1}"] = (positions, np.clip(rng.normal(50, 20, count), 0, 100))
+    return mutations
+
+
+def render(mode, n_points, n_contigs, output_file, dpi):
+    """Render once in this process; returns (seconds, peak RSS in MB)."""
+    from mapping_by_sequencing.pipeline.plotting import create_frequency_plot
+    mutations = make_mutations(n_points, n_contigs)
+    limits = {} if mode == "scalable" else {"max_points": None, "max_panels": None, "max_figure_height": None}
+    start = time.perf_counter()
+    create_frequency_plot(mutations, output_file, dpi=dpi, **limits)
+    seconds = time.perf_counter() - start
+    # Linux reports ru_maxrss in KiB
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(mode, n_points, n_contigs, dpi, workdir, timeout):
+    """Render in a subprocess; returns (seconds, rss MB) or an error string."""
+    output_file = os.path.join(workdir, f"{mode}_{n_points}_{n_contigs}.png")
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", mode, str(n_points), str(n_contigs), str(dpi),
+           output_file]
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return f"timeout >{timeout}s"
+    if result.returncode != 0 or not os.path.exists(output_file):
+        return "failed"
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data["seconds"], data["rss_mb"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frequency plot rendering vs number of sites")
+    parser.add_argument("--points", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Site counts (default: 10000 100000 1000000)")
+    parser.add_argument("--contigs", type=int, nargs="+", default=[5, 200], help="Contig counts (default: 5 200)")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolution, as in the pipeline (default: 300)")
+    parser.add_argument("--timeout", type=int, default=900, help="Seconds allowed per render (default: 900)")
+    parser.add_argument("--worker", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        mode, n_points, n_contigs, dpi, output_file = args.worker
+        seconds, rss_mb = render(mode, int(n_points), int(n_contigs), output_file, int(dpi))
+        print(json.dumps({"seconds": seconds, "rss_mb": rss_mb}))
+        return
+
+    def fmt(result):
+        return f"{result[0]:>8.2f} {result[1]:>9.0f}" if isinstance(result, tuple) else f"{result:>18}"
+
+    print(f"{'contigs':>8} {'sites':>10} {'scatter s':>9} {'RSS MB':>9} {'scalable s':>10} {'RSS MB':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_contigs in args.contigs:
+            for n_points in args.points:
+                scatter = run_worker("scatter", n_points, n_contigs, args.dpi, workdir, args.timeout)
+                scalable = run_worker("scalable", n_points, n_contigs, args.dpi, workdir, args.timeout)
+                print(f"{n_contigs:>8} {n_points:>10} {fmt(scatter)}  {fmt(scalable)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
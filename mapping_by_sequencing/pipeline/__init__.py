@@ -1,8 +1,28 @@
 """
 Pipeline core functionality including run management and utilities.
+
+Exports are imported on first access, so ``python -m
+mapping_by_sequencing.pipeline.<module>`` (as the Snakefile runs its steps)
+only loads that module and does not import it twice.
 """
 
-from .run_manager import RunManager
-from .plotting import plot_vcf_frequency, create_frequency_plot, parse_vcf_frequency, get_mutation_statistics
+import importlib
+
+_EXPORTS = {
+    'RunManager': 'run_manager',
+    'plot_vcf_frequency': 'plotting',
+    'create_frequency_plot': 'plotting',
+    'parse_vcf_frequency': 'plotting',
+    'get_mutation_statistics': 'plotting',
+    'MutationFrequencies': 'plotting',
+    'scan_windows': 'frequency_windows',
+    'candidate_intervals': 'frequency_windows',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = ['RunManager', 'plot_vcf_frequency', 'create_frequency_plot', 'parse_vcf_frequency', 'get_mutation_statistics']
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,267 @@
+"""
+snpEff annotation that reuses the annotations of earlier runs.
+
+snpEff's INFO fields (ANN, LOF, NMD) depend only on the site and the
+database, not on the samples' genotypes. Each annotated VCF keeps its site
+annotations in a sidecar table next to it (``<name>.sites.tsv.gz``,
+keyed by CHROM, POS, REF and ALT and tagged with the snpEff database, its
+version and the mtime of the database file). On
+the next run, e.g. after ``mbs add-sample``, only records whose site is not
+in the table go through snpEff. Every other record gets its stored
+annotation back. The annotation work then grows with the new sites, not
+with the cohort.
+
+snpEff's summary and gene table only describe the sites it annotated. When
+stored annotations were reused, both are instead built from the ANN field of
+every record of the annotated VCF, so they always cover the whole cohort.
+
+Usage:
+    python -m mapping_by_sequencing.pipeline.annotation all_vs_E1_corrected.vcf all_vs_E1_ann.vcf \\
+        --db Arabidopsis_thaliana --cache all_vs_E1_ann.sites.tsv.gz --summary summary.html --genes genes.txt
+"""
+
+import gzip
+import html
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .vcf_io import open_vcf
+
+# Bump when the table layout changes so old tables are ignored
+SITES_VERSION = 2
+# INFO keys written by snpEff
+SNPEFF_INFO = ("ANN", "EFF", "LOF", "NMD")
+SNPEFF_HEADERS = ("##SnpEff",) + tuple(f"##INFO=<ID={key}," for key in SNPEFF_INFO)
+# Impact columns of snpEff's gene table, in its order
+IMPACTS = ("HIGH", "LOW", "MODERATE", "MODIFIER")
+
+Site = Tuple[str, str, str, str]
+
+
+def _site(fields: List[str]) -> Site:
+    return fields[0], fields[1], fields[3], fields[4]
+
+
+def _snpeff_info(info: str) -> str:
+    return ";".join(part for part in info.split(";") if part.split("=", 1)[0] in SNPEFF_INFO)
+
+
+def database_stamp(db: str, snpeff: str = "snpEff") -> List[str]:
+    """
+    snpEff version and mtime of the ``db`` predictor file, to tell whether stored
+    annotations still match the database; the mtime is ``-`` if the file is not
+    in the data directory next to the snpEff installation.
+    """
+    exe = shutil.which(snpeff)
+    if exe is None:
+        raise RuntimeError(f"{snpeff} not found; activate the pipeline environment (conda activate mbs)")
+    result = subprocess.run([exe, "-version"], capture_output=True, text=True)
+    version = " ".join((result.stdout or result.stderr).strip().splitlines()[:1]).replace("\t", " ") or "unknown"
+    predictor = Path(os.path.realpath(exe)).parent / "data" / db / "snpEffectPredictor.bin"
+    mtime = str(int(predictor.stat().st_mtime)) if predictor.exists() else "-"
+    return [version, mtime]
+
+
+def load_sites(path, db: str, stamp: List[str]) -> Tuple[List[str], Dict[Site, str]]:
+    """snpEff header lines and per-site annotations stored for ``db`` at ``stamp``; empty if none or stale."""
+    headers, sites = [], {}
+    if not path or not os.path.exists(path):
+        return headers, sites
+    with gzip.open(path, 'rt') as f:
+        if f.readline().rstrip("\n").split("\t") != ["#sites", str(SITES_VERSION), db] + stamp:
+            return [], {}
+        for line in f:
+            if line.startswith("#header\t"):
+                headers.append(line[len("#header\t"):].rstrip("\n"))
+            else:
+                chrom, pos, ref, alt, annotation = line.rstrip("\n").split("\t")
+                sites[(chrom, pos, ref, alt)] = annotation
+    return headers, sites
+
+
+def save_sites(path, db: str, stamp: List[str], headers: List[str], sites: Dict[Site, str]):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with gzip.open(tmp, 'wt', compresslevel=1) as f:
+        f.write("\t".join(["#sites", str(SITES_VERSION), db] + stamp) + "\n")
+        for header in headers:
+            f.write(f"#header\t{header}\n")
+        for site, annotation in sites.items():
+            f.write("\t".join(site) + f"\t{annotation}\n")
+    os.replace(tmp, path)
+
+
+def _ann_entries(info: str) -> List[List[str]]:
+    """ANN entries of an INFO field, split into Allele|Annotation|Impact|Gene_Name|Gene_ID|Feature_Type|Feature_ID|BioType|..."""
+    for part in info.split(";"):
+        if part.startswith("ANN="):
+            return [entry.split("|") for entry in part[4:].split(",")]
+    return []
+
+
+def write_reports(vcf, db: str, summary=None, genes=None) -> int:
+    """
+    Gene table and HTML summary of every record of an annotated VCF, from its ANN field.
+
+    The gene table has the columns of snpEff's ``snpEff_genes.txt``: one row per
+    transcript, counting the variant annotations per impact and per effect.
+
+    Returns:
+        int: Number of genes with at least one annotated variant
+    """
+    records = annotated = 0
+    impacts, effects = Counter(), Counter()
+    transcripts: Dict[Tuple[str, str, str, str], Counter] = {}
+    with open_vcf(str(vcf)) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            records += 1
+            entries = _ann_entries(line.split("\t", 8)[7])
+            annotated += bool(entries)
+            for entry in entries:
+                if len(entry) < 8:
+                    continue
+                entry_effects = entry[1].split("&")
+                impacts[entry[2]] += 1
+                effects.update(entry_effects)
+                if entry[5] == "transcript":
+                    counts = transcripts.setdefault((entry[3], entry[4], entry[6], entry[7]), Counter())
+                    counts[f"variants_impact_{entry[2]}"] += 1
+                    counts.update(f"variants_effect_{effect}" for effect in entry_effects)
+
+    gene_ids = {key[1] for key in transcripts}
+    if genes:
+        columns = [f"variants_impact_{impact}" for impact in IMPACTS]
+        columns += sorted({c for counts in transcripts.values() for c in counts} - set(columns))
+        with open(genes, 'w') as f:
+            f.write(f"# Variant annotations per transcript over all {records} records of {Path(vcf).name}\n")
+            f.write("\t".join(["#GeneName", "GeneId", "TranscriptId", "BioType"] + columns) + "\n")
+            for key in sorted(transcripts):
+                f.write("\t".join(list(key) + [str(transcripts[key][c]) for c in columns]) + "\n")
+    if summary:
+        def table(title, counts):
+            rows = "".join(f"<tr><td>{html.escape(name)}</td><td>{n}</td></tr>"
+                           for name, n in sorted(counts.items(), key=lambda item: -item[1]))
+            return f"<h2>{title}</h2><table border=\"1\"><tr><th>{title}</th><th>Count</th></tr>{rows}</table>\n"
+
+        with open(summary, 'w') as f:
+            f.write(f"<html><head><title>snpEff summary: {html.escape(Path(vcf).name)}</title></head><body>\n"
+                    f"<h1>Variant annotation summary ({html.escape(db)})</h1>\n"
+                    f"<p>{records} records, {annotated} with snpEff annotations, {len(gene_ids)} genes affected. "
+                    f"Built from the ANN field of every record; snpEff only annotated the sites not seen "
+                    f"by earlier runs.</p>\n")
+            f.write(table("Impact", impacts) + table("Effect", effects) + "</body></html>\n")
+    return len(gene_ids)
+
+
+def run_snpeff(vcf, out_vcf, db: str, workdir, summary=None, genes=None, snpeff: str = "snpEff"):
+    """Annotate a VCF; snpEff writes its summary and gene table into the working directory."""
+    if shutil.which(snpeff) is None:
+        raise RuntimeError(f"{snpeff} not found; activate the pipeline environment (conda activate mbs)")
+    with open(out_vcf, 'w') as out:
+        result = subprocess.run([snpeff, db, os.path.abspath(vcf)], cwd=workdir, stdout=out,
+                                stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"snpEff failed with exit code {result.returncode}:\n{tail}")
+    for name, target in (("snpEff_summary.html", summary), ("snpEff_genes.txt", genes)):
+        if target and os.path.exists(os.path.join(workdir, name)):
+            shutil.move(os.path.join(workdir, name), target)
+
+
+def annotate_vcf(vcf, out_vcf, db: str, cache=None, summary=None, genes=None,
+                 snpeff: str = "snpEff") -> Tuple[int, int]:
+    """
+    Annotate ``vcf`` into ``out_vcf``, sending only sites missing from the
+    ``cache`` table through snpEff, and add the new sites to the table.
+
+    ``summary`` and ``genes`` are snpEff's own files when it annotated every
+    record, and are otherwise rebuilt from the whole output by ``write_reports``.
+
+    Returns:
+        tuple: (records written, records annotated by snpEff in this run)
+    """
+    stamp = database_stamp(db, snpeff) if cache else []
+    headers, sites = load_sites(cache, db, stamp)
+    out_dir = Path(out_vcf).resolve().parent
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".snpEff.") as tmp:
+        new_vcf, new_ann = os.path.join(tmp, "new_sites.vcf"), os.path.join(tmp, "new_sites_ann.vcf")
+        total = new = 0
+        with open_vcf(str(vcf)) as fin, open(new_vcf, 'w') as fout:
+            for line in fin:
+                if line.startswith("#"):
+                    fout.write(line)
+                    continue
+                total += 1
+                if _site(line.split("\t", 5)) not in sites:
+                    fout.write(line)
+                    new += 1
+
+        if new or not headers:
+            # snpEff's files describe the new sites only; keep them if those are all the sites
+            reports = (summary, genes) if new == total else (None, None)
+            run_snpeff(new_vcf, new_ann, db, tmp, *reports, snpeff)
+            with open(new_ann) as f:
+                for line in f:
+                    if line.startswith("#"):
+                        if line.startswith(SNPEFF_HEADERS) and line.rstrip("\n") not in headers:
+                            headers.append(line.rstrip("\n"))
+                        continue
+                    fields = line.rstrip("\n").split("\t", 8)
+                    sites[_site(fields)] = _snpeff_info(fields[7])
+
+        if new == total and headers and os.path.exists(new_ann):
+            # Nothing reused: keep snpEff's output as it is
+            shutil.move(new_ann, out_vcf)
+        else:
+            with open_vcf(str(vcf)) as fin, open(out_vcf, 'w') as fout:
+                for line in fin:
+                    if line.startswith("##"):
+                        fout.write(line)
+                    elif line.startswith("#"):
+                        fout.write("".join(h + "\n" for h in headers) + line)
+                    else:
+                        fields = line.rstrip("\n").split("\t")
+                        annotation = sites.get(_site(fields), "")
+                        if annotation:
+                            fields[7] = annotation if fields[7] == "." else f"{fields[7]};{annotation}"
+                        fout.write("\t".join(fields) + "\n")
+    if new < total:
+        write_reports(out_vcf, db, summary, genes)
+    if cache:
+        save_sites(cache, db, stamp, headers, sites)
+    return total, new
+
+
+def main():
+    """
+    Command-line interface: annotate a VCF with snpEff, reusing stored site annotations.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='snpEff annotation that only sends new sites through snpEff')
+    parser.add_argument('vcf_file', help='Input VCF (plain or gzipped)')
+    parser.add_argument('output_file', help='Annotated VCF')
+    parser.add_argument('--db', required=True, help='snpEff database')
+    parser.add_argument('--cache', help='Site annotation table to reuse and update (.tsv.gz)')
+    parser.add_argument('--summary', help='Write the HTML annotation summary of all records here')
+    parser.add_argument('--genes', help='Write the gene table of all records here')
+    args = parser.parse_args()
+
+    try:
+        total, new = annotate_vcf(args.vcf_file, args.output_file, args.db, cache=args.cache,
+                                  summary=args.summary, genes=args.genes)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {total} records written to {args.output_file}: {new} annotated by snpEff, {total - new} reused")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Content-addressed cache of per-sample intermediates shared by all runs.
+
+Trimmed reads, merged BAMs and per-sample VCFs are stored under
+``<repo>/cache/objects`` keyed on the checksums of the raw reads and the
+reference plus the config values that change their content. ``mbs run``
+restores hits into the run directory before starting snakemake (with
+modification times ordered so snakemake treats them as up to date) and
+stores new intermediates after a successful run. The cache has a size limit
+and evicts least recently used entries.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from mapping_by_sequencing.pipeline.config_parsers import get_snp_filter_settings, read_engine
+
+logger = logging.getLogger(__name__)
+
+# Bump when a cached rule's command changes in a way that alters its output
+CACHE_VERSION = 1
+
+# Order of the cached stages in the DAG; restored files are stamped in this order
+STAGE_ORDER = ["trimmed_reads", "sorted_bam", "sample_vcf", "filtered_vcf"]
+
+
+@contextmanager
+def file_lock(lock_file: Path, on_wait=None):
+    """Hold an exclusive ``flock`` on ``lock_file`` (created if needed) for the duration of the block.
+
+    ``on_wait`` is called once before blocking if another process holds the lock.
+    """
+    lock_file = Path(lock_file)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, 'a') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if on_wait is not None:
+                on_wait()
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _link_or_copy(src: Path, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def _copy(src: Path, dest: Path):
+    """
+    Copy into a new inode, so its timestamps can be set without touching the
+    source. copy_file_range lets btrfs/XFS share the extents (a reflink).
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    tmp = dest.with_name(f".{dest.name}.tmp{os.getpid()}")
+    try:
+        with open(src, 'rb') as fin, open(tmp, 'wb') as fout:
+            remaining = os.fstat(fin.fileno()).st_size
+            try:
+                while remaining > 0:
+                    copied = os.copy_file_range(fin.fileno(), fout.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            except (AttributeError, OSError):
+                fin.seek(0)
+                fout.seek(0)
+                fout.truncate()
+                shutil.copyfileobj(fin, fout, 1 << 20)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class IntermediateCache:
+    """LRU-evicted store of intermediate files addressed by a content key."""
+
+    def __init__(self, root: Path, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_file = self.root / "index.json"
+        self.checksums_file = self.root / "checksums.json"
+        self.lock_file = self.root / ".lock"
+        self.max_bytes = max_bytes
+        self._checksums: Optional[Dict[str, Dict]] = None
+
+    # -- keys -----------------------------------------------------------------
+
+    def file_checksum(self, path: Path) -> str:
+        """SHA-256 of a file, memoized on (real path, size, mtime) across runs."""
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        if self._checksums is None:
+            self._checksums = self._load_json(self.checksums_file)
+        memo = self._checksums.get(real)
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["sha256"]
+        digest = hashlib.sha256()
+        with open(real, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        self._checksums[real] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest.hexdigest()}
+        with file_lock(self.lock_file):
+            stored = self._load_json(self.checksums_file)
+            stored[real] = self._checksums[real]
+            self._write_json(self.checksums_file, stored)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(stage: str, **parts) -> str:
+        """Content key of a stage from JSON-serialisable parts."""
+        payload = json.dumps({"stage": stage, "version": CACHE_VERSION, **parts}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # -- storage --------------------------------------------------------------
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.objects_dir / key[:2] / key
+
+    def fetch(self, key: str, files: Dict[str, Path], mtime: Optional[float] = None) -> bool:
+        """
+        Materialise a cached entry as ``files`` (logical name -> destination).
+
+        Returns False, touching nothing, unless every file is cached. Restored
+        files are copies with their own inode (reflinked where the filesystem
+        can), never hardlinks: they get modification time ``mtime``, which
+        must not reach the cache entry or other runs sharing it.
+        """
+        entry = self._entry_dir(key)
+        if not all((entry / name).exists() for name in files):
+            return False
+        for name, dest in files.items():
+            _copy(entry / name, Path(dest))
+            if mtime is not None:
+                os.utime(dest, (mtime, mtime))
+        with file_lock(self.lock_file):
+            index = self._load_json(self.index_file)
+            if key in index:
+                index[key]["last_used"] = time.time()
+                self._write_json(self.index_file, index)
+        return True
+
+    def store(self, key: str, stage: str, files: Dict[str, Path]):
+        """Add ``files`` (logical name -> existing path) under ``key`` and evict if over the limit."""
+        entry = self._entry_dir(key)
+        with file_lock(self.lock_file):
+            index = self._load_json(self.index_file)
+            if key in index and all((entry / name).exists() for name in files):
+                index[key]["last_used"] = time.time()
+            else:
+                for name, src in files.items():
+                    _link_or_copy(Path(src), entry / name)
+                index[key] = {
+                    "stage": stage,
+                    "files": sorted(files),
+                    "size": sum((entry / name).stat().st_size for name in files),
+                    "last_used": time.time(),
+                }
+            self._evict(index)
+            self._write_json(self.index_file, index)
+
+    def _evict(self, index: Dict[str, Dict]):
+        if not self.max_bytes:
+            return
+        total = sum(e["size"] for e in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= index[key]["size"]
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            logger.info(f"Evicted cached {index[key]['stage']} {key[:12]}")
+            del index[key]
+
+    def usage(self) -> int:
+        """Bytes accounted to cached entries."""
+        return sum(e["size"] for e in self._load_json(self.index_file).values())
+
+    @staticmethod
+    def _load_json(path: Path) -> Dict:
+        if path.exists():
+            with open(path, 'r') as f:
+                return json.load(f)
+        return {}
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+
+def run_intermediates(cache: IntermediateCache, run_dir: Path, config: Dict, reference: Path) -> List[Dict]:
+    """
+    Describe the cacheable intermediates of a run, in dependency order per sample.
+
+    Each item has ``stage``, ``sample``, ``key``, ``files`` (logical name ->
+    path in the run), ``requires`` (keys of the items it builds on: a BAM
+    needs the trimmed reads of all its libraries, so restoring it alone cannot
+    make fastp, and with it the mapping, run again) and ``inputs`` (uncached
+    files its rules read, such as the reference indexes, which restored
+    files must not predate).
+    Per-sample VCFs are only cacheable in per-sample calling mode; in joint
+    mode they depend on the whole cohort.
+    """
+    datasets = pd.read_table(run_dir / "datasets.tab", sep="\t", comment='#')
+    datasets['library'] = datasets['library'].astype(str)
+    trimmomatic = config.get('read_processing', {}).get('trimmomatic', {})
+    engine = read_engine(config)
+    # Trimmomatic keys predate the engine option and stay as they were
+    engine_settings = {} if engine == "trimmomatic" else \
+        {"engine": engine, "extra": config['read_processing'].get(engine, {}).get('extra', "")}
+    ref_checksum = cache.file_checksum(reference)
+    joint = config.get('variant_calling', {}).get('mode', 'per_sample') == 'joint'
+    # Declared inputs of map (bwa index) and of variant calling (FASTA, .fai and the regions derived from it)
+    reference = Path(reference)
+    map_inputs = [reference, reference.with_name(reference.name + ".amb")]
+    calling_inputs = [reference, reference.with_name(reference.name + ".fai"),
+                      run_dir / "results/variant_calling_regions.tsv"]
+
+    items = []
+    for sample, libraries in datasets.groupby('sample', sort=False):
+        trim_keys = []
+        for row in libraries.itertuples():
+            lib = f"{sample}_{row.library}"
+            trim_key = cache.key(
+                "trimmed_reads",
+                reads=[cache.file_checksum(Path(row.R1)), cache.file_checksum(Path(row.R2))],
+                options=trimmomatic.get('options'),
+                processing_options=trimmomatic.get('processing_options'),
+                **engine_settings,
+            )
+            trim_keys.append(trim_key)
+            files = {name: run_dir / f"data/reads_filtered/{lib}_qc.{name}.fastq.gz" for name in ("R1", "R2", "U")}
+            if engine == "fastp":
+                # The QC reports come out of the same pass, so they travel with the reads
+                files.update({ext: run_dir / f"results/qc/{lib}.fastp.{ext}" for ext in ("json", "html")})
+            items.append({
+                "stage": "trimmed_reads", "sample": sample, "key": trim_key, "requires": [], "inputs": [],
+                "raw": {"R1": Path(row.R1), "R2": Path(row.R2)},
+                "files": files,
+                "links": {name: run_dir / f"data/reads/{lib}.{name}.fastq.gz" for name in ("R1", "R2")},
+            })
+
+        bam_key = cache.key(
+            "sorted_bam",
+            libraries=trim_keys,
+            reference=ref_checksum,
+            remove_duplicates=config.get('alignment', {}).get('remove_duplicates', True),
+        )
+        items.append({
+            "stage": "sorted_bam", "sample": sample, "key": bam_key, "requires": trim_keys, "inputs": map_inputs,
+            "files": {
+                "bam": run_dir / f"results/{sample}/map/{sample}_OUT-sorted.bam",
+                "bai": run_dir / f"results/{sample}/map/{sample}_OUT-sorted.bam.bai",
+            },
+        })
+        if joint:
+            continue
+
+        vcf_key = cache.key("sample_vcf", bam=bam_key, reference=ref_checksum)
+        items.append({
+            "stage": "sample_vcf", "sample": sample, "key": vcf_key, "requires": [bam_key],
+            "inputs": calling_inputs,
+            "files": {"vcf": run_dir / f"results/{sample}/variant_calling/{sample}.vcf"},
+        })
+        items.append({
+            "stage": "filtered_vcf", "sample": sample,
+            "key": cache.key("filtered_vcf", vcf=vcf_key, settings=get_snp_filter_settings(config, sample)),
+            "requires": [vcf_key], "inputs": [],
+            "files": {"vcf": run_dir / f"results/{sample}/variant_calling/{sample}_filt.vcf"},
+        })
+    return items
+
+
+def restore_run(cache: IntermediateCache, items: List[Dict]) -> List[Dict]:
+    """
+    Restore cache hits into a run; returns the restored items.
+
+    A stage is restored only if everything it builds on is present in the run,
+    and restored files are stamped a second apart in stage order so the
+    snakemake DAG sees the chain raw reads -> trimmed reads -> BAM -> VCF as
+    up to date. The stamps are in the past unless an uncached input (e.g. a
+    reference index rebuilt moments ago) is newer; they then follow it.
+    Files already present in the run are left alone.
+    """
+    restored = []
+    available = set()
+    newest = max((path.stat().st_mtime for item in items for path in item.get("inputs", []) if path.exists()),
+                 default=0)
+    base = max(time.time() - len(STAGE_ORDER) - 1, newest + 1)
+    for item in items:
+        if all(Path(p).exists() for p in item["files"].values()):
+            available.add(item["key"])
+            continue
+        if not all(key in available for key in item["requires"]):
+            continue
+        if item["stage"] == "trimmed_reads":
+            # The symlink_libraries outputs must predate the restored reads
+            for name, link in item["links"].items():
+                if not link.is_symlink():
+                    link.parent.mkdir(parents=True, exist_ok=True)
+                    link.symlink_to(item["raw"][name])
+                    os.utime(link, (base, base), follow_symlinks=False)
+        stamp = base + 1 + STAGE_ORDER.index(item["stage"])
+        if cache.fetch(item["key"], item["files"], mtime=stamp):
+            available.add(item["key"])
+            restored.append(item)
+    return restored
+
+
+def store_run(cache: IntermediateCache, items: List[Dict]) -> int:
+    """Store every intermediate of a finished run that is present on disk; returns the count stored."""
+    stored = 0
+    for item in items:
+        if all(Path(p).exists() for p in item["files"].values()):
+            cache.store(item["key"], item["stage"], item["files"])
+            stored += 1
+    return stored
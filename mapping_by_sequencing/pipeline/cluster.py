@@ -0,0 +1,146 @@
+"""
+Snakemake profiles for running a run locally or on a SLURM cluster.
+
+``mbs run --executor`` writes ``profiles/<executor>/config.yaml`` into the run
+directory and starts snakemake with ``--profile``. The local profile carries
+the core, memory and scratch budgets. The SLURM profile uses snakemake's
+cluster-generic executor: every job is submitted with sbatch, its threads,
+mem_mb and disk_mb becoming --cpus-per-task, --mem and --tmp, and its state
+is polled by a small squeue/sacct script written next to the profile. Small
+jobs (symlinks, VCF compression and indexing) are grouped into shared
+submissions to keep the scheduler load down. Both profiles turn on
+``--benchmark-extended`` so every job's benchmark can be read by ``mbs perf``.
+
+Only sbatch, squeue, sacct and scancel are called, so the SLURM profile can be
+exercised on any Linux box with the shims in ``test/slurm``.
+"""
+
+import os
+import shlex
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+EXECUTORS = ["local", "slurm"]
+
+# Rules whose jobs take seconds: submitted together, up to group_size DAG components per SLURM job
+GROUPED_RULES = ["symlink_libraries", "index_VCF", "bgzip_ctrl"]
+SMALL_JOBS_GROUP = "small_jobs"
+# Minutes per grouped job: a group's --time is the sum over its sequential layers
+SMALL_JOB_RUNTIME = 10
+
+# Defaults for the ``cluster`` section of config.yaml
+CLUSTER_DEFAULTS = {
+    "partition": "",
+    "account": "",
+    "runtime": 240,      # minutes per job unless a rule sets resources.runtime
+    "max_jobs": 100,     # jobs submitted or running at the same time
+    "group_size": 20,
+    "sbatch_extra": "",
+}
+
+# cluster-generic status command: prints running, success or failed for one job id.
+# Jobs still known to squeue are running; finished ones are looked up in sacct.
+STATUS_SCRIPT = """#!/usr/bin/env bash
+# Written by mbs run --executor slurm: job state for snakemake's cluster-generic executor
+jobid="$1"
+state=$(squeue -h -j "$jobid" -o %T 2>/dev/null | head -n 1)
+if [ -z "$state" ]; then
+    state=$(sacct -n -X -P -j "$jobid" -o State 2>/dev/null | head -n 1 | cut -d ' ' -f 1)
+fi
+case "$state" in
+    COMPLETED) echo success ;;
+    ""|PENDING|CONFIGURING|RUNNING|COMPLETING|SUSPENDED|REQUEUED|RESIZING|STAGE_OUT) echo running ;;
+    *) echo failed ;;
+esac
+"""
+
+
+def cluster_settings(config: Dict) -> Dict:
+    """The ``cluster`` section of a run config with defaults filled in."""
+    settings = dict(CLUSTER_DEFAULTS)
+    settings.update({k: v for k, v in (config.get("cluster") or {}).items() if v is not None})
+    return settings
+
+
+def slurm_submit_cmd(log_dir: str, partition: str = "", account: str = "", sbatch_extra: str = "") -> str:
+    """
+    sbatch command line for one job; snakemake fills in the {placeholders}
+    and appends the job script.
+    """
+    cmd = [
+        "sbatch", "--parsable",
+        "--job-name=mbs-{name}",
+        "--cpus-per-task={threads}",
+        "--mem={resources.mem_mb}",
+        "--tmp={resources.disk_mb}",
+        "--time={resources.runtime}",
+        f"--output={log_dir}/%j-{{name}}.log",
+    ]
+    if partition:
+        cmd.append(f"--partition={partition}")
+    if account:
+        cmd.append(f"--account={account}")
+    return " ".join(cmd + ([sbatch_extra] if sbatch_extra else []))
+
+
+def write_profile(run_dir, executor: str = "local", cores: Optional[int] = None,
+                  mem_mb: Optional[int] = None, tmp_disk_mb: Optional[int] = None,
+                  jobs: Optional[int] = None, config: Optional[Dict] = None) -> Path:
+    """
+    Write the snakemake profile of a run.
+
+    Args:
+        run_dir (str): Run directory
+        executor (str): "local" or "slurm"
+        cores (int): Local cores
+        mem_mb (int): Total mem_mb of concurrently running jobs
+        tmp_disk_mb (int): Total disk_mb (scratch) of concurrently running jobs
+        jobs (int): SLURM jobs submitted at once (default: cluster.max_jobs)
+        config (dict): Run config, for its ``cluster`` section
+
+    Returns:
+        Path: The profile directory, for ``snakemake --profile``
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor} (choose from {', '.join(EXECUTORS)})")
+    run_dir = Path(run_dir)
+    profile_dir = run_dir / "profiles" / executor
+    profile_dir.mkdir(parents=True, exist_ok=True)
+
+    budgets: List[str] = [f"{name}={value}" for name, value in
+                          [("mem_mb", mem_mb), ("disk_mb", tmp_disk_mb)] if value]
+    # Rule, threads, resources and input sizes next to each benchmark, for mbs perf
+    profile: Dict = {"benchmark-extended": True}
+    if executor == "local":
+        profile["cores"] = cores or os.cpu_count() or 1
+    else:
+        settings = cluster_settings(config or {})
+        log_dir = "logs/slurm"
+        (run_dir / log_dir).mkdir(parents=True, exist_ok=True)
+        status_script = profile_dir / "slurm-status.sh"
+        status_script.write_text(STATUS_SCRIPT)
+        status_script.chmod(0o755)
+        profile.update({
+            "executor": "cluster-generic",
+            "jobs": jobs or settings["max_jobs"],
+            "cluster-generic-submit-cmd": slurm_submit_cmd(log_dir, settings["partition"], settings["account"],
+                                                           settings["sbatch_extra"]),
+            "cluster-generic-status-cmd": shlex.quote(str(status_script.resolve())),
+            "cluster-generic-cancel-cmd": "scancel",
+            "default-resources": [f"runtime={int(settings['runtime'])}"],
+            "set-resources": [f"{rule}:runtime={SMALL_JOB_RUNTIME}" for rule in GROUPED_RULES],
+            "groups": [f"{rule}={SMALL_JOBS_GROUP}" for rule in GROUPED_RULES],
+            "group-components": [f"{SMALL_JOBS_GROUP}={int(settings['group_size'])}"],
+            "max-status-checks-per-second": 1,
+            # Shared filesystems may show outputs late on the submit host
+            "latency-wait": 60,
+        })
+    if budgets:
+        profile["resources"] = budgets
+
+    with open(profile_dir / "config.yaml", 'w') as f:
+        f.write(f"# Written by mbs run --executor {executor}; regenerated on every run\n")
+        yaml.safe_dump(profile, f, sort_keys=False, default_flow_style=False)
+    return profile_dir
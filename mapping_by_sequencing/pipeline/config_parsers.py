@@ -1,5 +1,7 @@
 import os, sys
 
+from mapping_by_sequencing.pipeline.vcf_filter import resolve_filter_settings
+
 def check_tmp_dir(dir):
     if os.getenv("TMP"):
         TMP = os.getenv("TMP")
@@ -7,16 +9,42 @@ def check_tmp_dir(dir):
         TMP = dir
     return TMP
 
+class DatasetIndex:
+    """
+    Sample/library index over datasets.tab, built once when the Snakefile loads.
+    Rows are grouped by sample (file order kept) and keyed by (sample, library),
+    so the input functions below answer per job without scanning the table.
+    Pass it wherever those functions take the datasets DataFrame.
+    """
+    def __init__(self, df):
+        self.rows = df.to_dict('records')
+        self.by_sample = {}
+        self.by_library = {}
+        for row in self.rows:
+            self.by_sample.setdefault(row["sample"], []).append(row)
+            # later rows win, as in the original table scans
+            self.by_library[(row["sample"], row["library"])] = row
+        self._memo = {}
+
+    def memo(self, key, func):
+        if key not in self._memo:
+            self._memo[key] = func()
+        return self._memo[key]
+
+def dataset_index(df):
+    """ DatasetIndex for a datasets DataFrame (or the index itself) """
+    return df if isinstance(df, DatasetIndex) else DatasetIndex(df)
+
 def get_datasets_for_symlinks(df, sample = None, library = None, d = None, infolder="data/reads", outfolder="data/reads"):
-    dataset_file = None
-    for row in df.itertuples():
-        if library is None:
-            if getattr(row, "sample") == sample:
-                dataset_file = os.path.join(outfolder, getattr(row, d))
-        else:
-            if getattr(row, "sample") == sample and getattr(row, "library") == library:
-                dataset_file = os.path.join(outfolder, getattr(row, d))
-    return dataset_file
+    index = dataset_index(df)
+    if library is None:
+        rows = index.by_sample.get(sample)
+        row = rows[-1] if rows else None
+    else:
+        row = index.by_library.get((sample, library))
+    if row is None:
+        return None
+    return os.path.join(outfolder, row[d])
 
 def get_control_samples(df):
     """
@@ -38,20 +66,200 @@ def get_control_samples(df):
         sys.exit("No mutant samples specified in the datasets.tab file!")
     return list(ctrl)[0], list(samples)
 
-def fastqc_raw_outputs(datasets_tab = None, analysis_tab = None, infolder="data/reads", outfolder="results/fastqc_raw", ext=".fastq.gz"):
+def fastqc_raw_outputs(datasets_tab = None, analysis_tab = None, infolder="data/reads", outfolder="results/fastqc_raw", ext=".fastq.gz", samples = None):
+    """
+    FastQC reports of every library, or only of the given samples.
+    """
+    index = dataset_index(datasets_tab)
+    def sample_outputs(sample):
+        fastqc_out = []
+        for l in index.by_sample[sample]:
+            fastqc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.R1_fastqc.html".format(sample_ctrl = l["sample"], library = l["library"])))
+            fastqc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.R2_fastqc.html".format(sample_ctrl = l["sample"], library = l["library"])))
+        return fastqc_out
     fastqc_out = []
-    for i,l in datasets_tab.iterrows():
-        #if l["sample"] in list(analysis_tab["sample"]):
-        fastqc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.R1_fastqc.html".format(sample_ctrl = l["sample"], library = l["library"])))
-        fastqc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.R2_fastqc.html".format(sample_ctrl = l["sample"], library = l["library"])))
+    for sample in index.by_sample:
+        if samples is None or sample in samples:
+            fastqc_out += index.memo(("fastqc", sample, outfolder), lambda: sample_outputs(sample))
     return fastqc_out
 
+def fastp_outputs(datasets_tab = None, outfolder="results/qc", samples = None):
+    """
+    fastp HTML and JSON QC reports of every library, or only of the given samples.
+    """
+    index = dataset_index(datasets_tab)
+    def sample_outputs(sample):
+        qc_out = []
+        for l in index.by_sample[sample]:
+            for ext in ("html", "json"):
+                qc_out.append(os.path.join(outfolder, "{sample_ctrl}_{library}.fastp.{ext}".format(sample_ctrl = l["sample"], library = l["library"], ext = ext)))
+        return qc_out
+    qc_out = []
+    for sample in index.by_sample:
+        if samples is None or sample in samples:
+            qc_out += index.memo(("fastp", sample, outfolder), lambda: sample_outputs(sample))
+    return qc_out
+
 def get_sample_bamfiles(df, res_dir="results", sample = None, library = None, ref_genome_mt = None, ref_genome_n = None):
-    outpaths = []
-    for row in df.itertuples():
-        if getattr(row, "sample") == sample:
-            #bam_file =
-            bam_file = "{sample}_{library}_OUT-sorted.bam".format(sample = sample, library = getattr(row, "library"), ref_genome_mt = ref_genome_mt, ref_genome_n = ref_genome_n)
+    index = dataset_index(df)
+    def sample_bamfiles():
+        outpaths = []
+        for row in index.by_sample.get(sample, []):
+            bam_file = "{sample}_{library}_OUT-sorted.bam".format(sample = sample, library = row["library"], ref_genome_mt = ref_genome_mt, ref_genome_n = ref_genome_n)
             out_folder = "OUT_{base}".format(base = bam_file.replace("_OUT-sorted.bam", ""))
             outpaths.append("{results}/{sample}/map/{out_folder}/{bam_file}".format(results = res_dir, bam_file = bam_file, sample = sample, out_folder = out_folder))
-    return outpaths  
+        return outpaths
+    return list(index.memo(("bamfiles", sample, res_dir), sample_bamfiles))
+
+def get_snp_filter_settings(config, sample = None):
+    """
+    EMS SNP filter thresholds from the ``snp_filter`` section of config.yaml.
+    Per-sample overrides under ``snp_filter: samples: <sample>:`` take precedence
+    over the global values; anything unset falls back to the built-in defaults.
+    """
+    snp_filter = dict(config.get("snp_filter") or {})
+    per_sample = snp_filter.pop("samples", None) or {}
+    overrides = per_sample.get(sample) if sample is not None else None
+    return resolve_filter_settings(snp_filter, overrides)
+
+def get_calling_regions(regions_file):
+    """
+    Read the shard table written by utils.write_calling_regions.
+    Returns an ordered dict of shard id -> bcftools region string.
+    """
+    regions = {}
+    with open(regions_file, 'r') as f:
+        for l in f:
+            if l.strip():
+                region_id, region = l.rstrip('\n').split('\t')
+                regions[region_id] = region
+    return regions
+
+def get_combinations(df, combinations_file = None, final_dir = "results/final"):
+    """
+    Control/mutant combinations analysed by a run, as an ordered dict of
+    final results dir -> (control, [mutants]).
+    A plain run has a single combination taken from datasets.tab (sample_type
+    column) with results in results/final. A batch lists one combination per
+    line in combinations.tab (combination, control, comma-separated mutants),
+    each with results in results/final/<combination>.
+    """
+    if combinations_file is None:
+        return {final_dir: get_control_samples(df)}
+    combinations = {}
+    known = set(df['sample'])
+    with open(combinations_file, 'r') as f:
+        for l in f:
+            if not l.strip() or l.startswith("#") or l.startswith("combination\t"):
+                continue
+            name, ctrl, mutants = l.rstrip('\n').split('\t')
+            mutants = mutants.split(',')
+            missing = [s for s in [ctrl] + mutants if s not in known]
+            if missing:
+                sys.exit("Combination {name} uses samples missing from datasets.tab: {missing}".format(name = name, missing = ", ".join(missing)))
+            combinations[os.path.join(final_dir, name)] = (ctrl, mutants)
+    if len(combinations) < 1:
+        sys.exit("No combinations specified in {f}!".format(f = combinations_file))
+    return combinations
+
+MEM_UNITS = {"k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+
+def mem_to_mb(value):
+    """
+    Memory or disk size as whole MB. Accepts Java/samtools style strings
+    ("4G", "768M", "1.5g", "512k", optionally ending in "B") and plain
+    numbers, which are taken as MB like snakemake's mem_mb.
+    """
+    text = str(value).strip().lower()
+    if text.endswith("b"):
+        text = text[:-1]
+    factor = MEM_UNITS.get(text[-1:], None)
+    number = text[:-1] if factor is not None else text
+    try:
+        return int(float(number) * (factor or 1))
+    except ValueError:
+        raise ValueError("Invalid memory size: {v!r} (use e.g. 4G, 768M or MB as a number)".format(v = value))
+
+def reference_size_mb(fasta):
+    """
+    Uncompressed size of a reference FASTA in MB, used to scale the memory of
+    indexing and alignment jobs. Gzipped FASTAs are estimated at 3.5x their
+    file size; a missing file counts as 0.
+    """
+    if not os.path.exists(fasta):
+        return 0
+    size = os.path.getsize(fasta) / 1024**2
+    return size * 3.5 if fasta.endswith(".gz") else size
+
+READ_ENGINES = ["fastp", "trimmomatic"]
+
+def read_engine(config):
+    """
+    Read trimming engine from ``read_processing: engine``. Configs written
+    before the option existed keep the separate FastQC + Trimmomatic steps.
+    """
+    engine = config.get('read_processing', {}).get('engine', "trimmomatic")
+    if engine not in READ_ENGINES:
+        sys.exit("Unknown read_processing engine: {e} (choose from {c})".format(e = engine, c = ", ".join(READ_ENGINES)))
+    return engine
+
+def trimmomatic_to_fastp(processing_options, options = ""):
+    """
+    fastp arguments equivalent to Trimmomatic settings, so both engines trim
+    from the same read_processing section of config.yaml:
+
+        LEADING:q          --cut_front (1 bp window, mean quality q)
+        TRAILING:q         --cut_tail (1 bp window, mean quality q)
+        SLIDINGWINDOW:w:q  --cut_right (w bp window, mean quality q)
+        MINLEN:n           --length_required n
+        CROP:n / HEADCROP:n  --max_len1/2 n / --trim_front1/2 n
+        AVGQUAL:q          --average_qual q
+
+    Adapters are found by pair overlap and sequence detection instead of
+    ILLUMINACLIP. fastp's own per-read quality filter is disabled because
+    Trimmomatic has none. Returns a list of arguments.
+    """
+    args = ["--detect_adapter_for_pe", "--disable_quality_filtering"]
+    if "-phred64" in str(options or "").split():
+        args.append("--phred64")
+    for step in str(processing_options or "").split():
+        name, _, values = step.partition(":")
+        values = values.split(":") if values else []
+        if name == "LEADING" and len(values) == 1:
+            args += ["--cut_front", "--cut_front_window_size", "1", "--cut_front_mean_quality", values[0]]
+        elif name == "TRAILING" and len(values) == 1:
+            args += ["--cut_tail", "--cut_tail_window_size", "1", "--cut_tail_mean_quality", values[0]]
+        elif name == "SLIDINGWINDOW" and len(values) == 2:
+            args += ["--cut_right", "--cut_right_window_size", values[0], "--cut_right_mean_quality", values[1]]
+        elif name == "MINLEN" and len(values) == 1:
+            args += ["--length_required", values[0]]
+        elif name == "CROP" and len(values) == 1:
+            args += ["--max_len1", values[0], "--max_len2", values[0]]
+        elif name == "HEADCROP" and len(values) == 1:
+            args += ["--trim_front1", values[0], "--trim_front2", values[0]]
+        elif name == "AVGQUAL" and len(values) == 1:
+            args += ["--average_qual", values[0]]
+        elif name == "ILLUMINACLIP":
+            continue
+        else:
+            raise ValueError("Trimmomatic step {step} has no fastp equivalent; set read_processing: engine: trimmomatic".format(step = step))
+    return args
+
+# Defaults for the ``compression`` section of config.yaml
+COMPRESSION_DEFAULTS = {"level": 6, "intermediate_level": 1, "threads": 4}
+
+def compression_settings(config):
+    """
+    The ``compression`` section of config.yaml with defaults filled in.
+    Every compressing rule writes BGZF: ``level`` for files kept after the
+    run, ``intermediate_level`` for temporary files the next rule reads once
+    (0 writes uncompressed BGZF blocks), ``threads`` for bgzip and bcftools.
+    """
+    settings = dict(COMPRESSION_DEFAULTS)
+    settings.update({k: v for k, v in (config.get('compression') or {}).items() if v is not None})
+    for key in ("level", "intermediate_level"):
+        if not 0 <= int(settings[key]) <= 9:
+            sys.exit("compression: {key} must be between 0 and 9, not {v}".format(key = key, v = settings[key]))
+        settings[key] = int(settings[key])
+    settings["threads"] = max(1, int(settings["threads"]))
+    return settings
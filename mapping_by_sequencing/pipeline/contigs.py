@@ -0,0 +1,273 @@
+"""
+Contig renaming between reference accessions and annotation database names.
+
+References downloaded from NCBI name sequences by accession (NC_003070.9,
+CM000663.2, ...) while snpEff databases use chromosome names (1, 2, X, Mt).
+The map is derived once per reference from the FASTA headers and cached next
+to the FASTA as ``<fasta>.contig_map.tsv``, keyed by the FASTA's SHA-256
+(with its size and mtime as a shortcut). VCFs are renamed in one streaming
+pass that only looks at the CHROM column and ``##contig`` header lines.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+from .vcf_io import is_gzipped, open_vcf
+
+logger = logging.getLogger(__name__)
+
+# Bump when the naming rules change so cached maps are rebuilt
+CONTIG_MAP_VERSION = 1
+
+# Accession-style sequence IDs (RefSeq NC_/NT_/NW_, GenBank CM000663.2, ...); other IDs are kept
+ACCESSION = re.compile(r"^[A-Z]{1,4}_?\d+(\.\d+)?$")
+CHROMOSOME = re.compile(r"\bchromosome\s+([A-Za-z0-9]+)\b", re.IGNORECASE)
+# Sub-chromosomal sequences that would otherwise take their chromosome's name
+SKIP = re.compile(r"unlocalized|unplaced|scaffold|patch|alternate|\balt\b", re.IGNORECASE)
+ORGANELLES = [
+    (re.compile(r"mitochondri(on|al)", re.IGNORECASE), "Mt"),
+    (re.compile(r"chloroplast|plastid", re.IGNORECASE), "Ch"),
+]
+CONTIG_HEADER = re.compile(rb"^(##contig=<(?:[^>]*?,)?ID=)([^,>]+)")
+HEADER_LINE = re.compile(rb"^>([^\n]*)\n", re.MULTILINE)
+
+
+def contig_name(seq_id: str, description: str) -> Optional[str]:
+    """
+    Database name of one FASTA sequence, or None to keep ``seq_id``.
+
+    Only accession-style IDs are renamed: ``... chromosome 2L ...`` becomes
+    ``2L``, mitochondrial and chloroplast sequences become Mt and Ch.
+    """
+    if not ACCESSION.match(seq_id) or SKIP.search(description):
+        return None
+    for pattern, name in ORGANELLES:
+        if pattern.search(description):
+            return name
+    match = CHROMOSOME.search(description)
+    return match.group(1) if match else None
+
+
+def _header_lines(chunks):
+    """Yield the '>' lines (without '>') found in a stream of byte chunks."""
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk
+        cut = data.rfind(b"\n") + 1
+        for match in HEADER_LINE.finditer(data, 0, cut):
+            yield match.group(1)
+        carry = data[cut:]
+    if carry.startswith(b">"):
+        yield carry[1:]
+
+
+def read_fasta_headers(fasta_file):
+    """
+    (sha256 hex digest, [(id, description)]) of a FASTA.
+
+    Plain FASTAs are hashed and scanned in a single chunked pass; gzipped ones
+    are hashed on their compressed bytes and scanned after decompression.
+    """
+    digest = hashlib.sha256()
+
+    def hashed(handle):
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+            yield chunk
+
+    if is_gzipped(fasta_file):
+        with open(fasta_file, 'rb') as raw:
+            for _ in hashed(raw):
+                pass
+        with open_vcf(fasta_file, 'rb') as handle:
+            lines = list(_header_lines(iter(lambda: handle.read(1 << 20), b"")))
+    else:
+        with open(fasta_file, 'rb') as raw:
+            lines = list(_header_lines(hashed(raw)))
+
+    headers = []
+    for line in lines:
+        seq_id, _, description = line.decode(errors="replace").strip().partition(" ")
+        headers.append((seq_id, description))
+    return digest.hexdigest(), headers
+
+
+def build_contig_map(headers) -> Dict[str, str]:
+    """Map of renamed sequence IDs; a name already used by an earlier sequence is not reused."""
+    mapping: Dict[str, str] = {}
+    taken = {seq_id for seq_id, _ in headers}
+    for seq_id, description in headers:
+        name = contig_name(seq_id, description)
+        if name is None or name == seq_id:
+            continue
+        if name in taken:
+            logger.warning(f"Not renaming {seq_id} to {name}: name already used")
+            continue
+        mapping[seq_id] = name
+        taken.add(name)
+    return mapping
+
+
+def _read_map_file(map_file: Path) -> Dict[str, str]:
+    mapping = {}
+    with open(map_file, 'r') as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            old, new = line.rstrip("\n").split("\t")[:2]
+            mapping[old] = new
+    return mapping
+
+
+def _read_map_meta(map_file: Path) -> Dict[str, str]:
+    meta = {}
+    with open(map_file, 'r') as f:
+        for line in f:
+            if not line.startswith("#"):
+                break
+            key, _, value = line[1:].strip().partition("=")
+            meta[key] = value
+    return meta
+
+
+def reference_contig_map(fasta_file, map_file=None) -> Dict[str, str]:
+    """
+    Contig map of a reference FASTA, from the cache next to it when still valid.
+
+    The cache is reused without reading the FASTA while its size and mtime are
+    unchanged; otherwise the FASTA is checksummed and the map rebuilt only if
+    the checksum differs.
+    """
+    fasta_file = Path(fasta_file)
+    map_file = Path(map_file) if map_file else fasta_file.with_name(fasta_file.name + ".contig_map.tsv")
+    st = os.stat(fasta_file)
+    meta = _read_map_meta(map_file) if map_file.exists() else {}
+    if meta.get("version") == str(CONTIG_MAP_VERSION) and \
+            meta.get("size") == str(st.st_size) and meta.get("mtime_ns") == str(st.st_mtime_ns):
+        return _read_map_file(map_file)
+
+    checksum, headers = read_fasta_headers(fasta_file)
+    if meta.get("version") == str(CONTIG_MAP_VERSION) and meta.get("sha256") == checksum:
+        mapping = _read_map_file(map_file)
+    else:
+        mapping = build_contig_map(headers)
+        logger.info(f"Built contig map for {fasta_file.name}: {len(mapping)} of {len(headers)} sequences renamed")
+
+    tmp = map_file.with_name(map_file.name + f".tmp{os.getpid()}")
+    try:
+        with open(tmp, 'w') as f:
+            f.write(f"#version={CONTIG_MAP_VERSION}\n#sha256={checksum}\n#size={st.st_size}\n#mtime_ns={st.st_mtime_ns}\n")
+            for old, new in mapping.items():
+                f.write(f"{old}\t{new}\n")
+        os.replace(tmp, map_file)
+    except OSError as e:
+        # Read-only reference directory: the map is still valid, just not cached
+        logger.warning(f"Could not cache contig map {map_file}: {e}")
+    return mapping
+
+
+def rename_vcf_contigs(vcf_file, output_file, mapping: Dict[str, str], chunk_bytes: int = 4 << 20) -> int:
+    """
+    Rename CHROM values and ``##contig`` IDs in one streaming pass.
+
+    Records are processed in chunks of whole lines: a CHROM value is the text
+    between a newline and the first tab, so each mapped name is replaced with
+    one ``bytes.replace`` of ``\\nOLD\\t`` per chunk and other columns are never
+    touched. Maps that chain names (a new name that is also an old one) fall
+    back to a per-record lookup.
+
+    Returns:
+        int: Number of data records written
+    """
+    bmap = {old.encode(): new.encode() for old, new in mapping.items()}
+    chained = bool(set(bmap) & set(bmap.values()))
+    records = 0
+    with open_vcf(vcf_file, 'rb') as src, open_vcf(output_file, 'wb') as dst:
+        line = src.readline()
+        while line.startswith(b"#"):
+            match = CONTIG_HEADER.match(line) if line.startswith(b"##contig") else None
+            if match and match.group(2) in bmap:
+                line = match.group(1) + bmap[match.group(2)] + line[match.end():]
+            dst.write(line)
+            line = src.readline()
+
+        carry = line
+        for chunk in iter(lambda: src.read(chunk_bytes), b""):
+            data = carry + chunk
+            cut = data.rfind(b"\n") + 1
+            carry = data[cut:]
+            records += _rename_chunk(data[:cut], bmap, chained, dst)
+        if carry:
+            records += _rename_chunk(carry if carry.endswith(b"\n") else carry + b"\n", bmap, chained, dst)
+    return records
+
+
+def _rename_chunk(data: bytes, bmap: Dict[bytes, bytes], chained: bool, dst) -> int:
+    """Write ``data`` (whole records) with renamed CHROM values; returns the record count."""
+    if not data:
+        return 0
+    if chained:
+        out = []
+        for line in data.splitlines(keepends=True):
+            chrom, tab, rest = line.partition(b"\t")
+            out.append(bmap.get(chrom, chrom) + tab + rest)
+        dst.writelines(out)
+        return len(out)
+    # Leading newline so the first record matches like the others
+    data = b"\n" + data
+    for old, new in bmap.items():
+        key = b"\n" + old + b"\t"
+        if key in data:
+            data = data.replace(key, b"\n" + new + b"\t")
+    dst.write(data[1:])
+    return data.count(b"\n") - 1
+
+
+def write_mapping_report(mapping: Dict[str, str], report_file) -> None:
+    """Write the applied renames as 'old new' lines (or a note when nothing was renamed)."""
+    with open(report_file, 'w') as f:
+        if not mapping:
+            f.write("No conversion needed\n")
+        for old, new in mapping.items():
+            f.write(f"{old} {new}\n")
+
+
+def main():
+    """
+    Command-line interface: rename the contigs of a VCF after a reference FASTA.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rename VCF contigs from reference accessions to chromosome names')
+    parser.add_argument('vcf_file', help='Input VCF (plain or gzipped)')
+    parser.add_argument('output_file', help='Output VCF (BGZF when ending in .gz)')
+    parser.add_argument('-r', '--reference', help='Reference FASTA the contig map is derived from')
+    parser.add_argument('--map', help='Tab-separated old<TAB>new contig map to use instead of the FASTA headers')
+    parser.add_argument('--mapping-out', help='Write the applied renames here')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    if args.map:
+        mapping = _read_map_file(Path(args.map))
+    elif args.reference:
+        mapping = reference_contig_map(args.reference)
+    else:
+        parser.error("give --reference or --map")
+
+    try:
+        records = rename_vcf_contigs(args.vcf_file, args.output_file, mapping)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    if args.mapping_out:
+        write_mapping_report(mapping, args.mapping_out)
+    print(f"✅ {records} records written to {args.output_file} ({len(mapping)} contig name(s) mapped)")
+
+
+if __name__ == "__main__":
+    main()
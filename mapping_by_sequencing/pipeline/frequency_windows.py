@@ -0,0 +1,213 @@
+"""
+Sliding-window allele-frequency mapping.
+
+Per chromosome, windows of ``window`` bp are laid every ``step`` bp from
+position 1. SNP counts and frequency sums per window come from prefix sums
+over the sorted positions (two ``searchsorted`` calls per chromosome), and the
+smoothed curve is a SNP-weighted Gaussian convolution over neighbouring
+windows, so a whole-genome scan costs O(n log n) in the number of SNPs and
+no Python work per window.
+
+The causal mutation of an EMS mapping population lies where the mutant
+allele frequency approaches 100%; candidate intervals are the runs of
+windows around each peak of the smoothed curve.
+"""
+
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 1_000_000
+DEFAULT_STEP = 250_000
+DEFAULT_SMOOTH = 2.0
+
+WINDOW_COLUMNS = ["chrom", "start", "end", "center", "n_snps", "density_per_mb", "mean_af", "smoothed_af"]
+CANDIDATE_COLUMNS = ["rank", "chrom", "start", "end", "peak_position", "peak_af", "mean_af", "n_snps"]
+
+
+def _gaussian_kernel(sigma: float) -> np.ndarray:
+    """Normalised Gaussian kernel with standard deviation ``sigma`` windows (identity for sigma <= 0)."""
+    if sigma <= 0:
+        return np.ones(1)
+    half = int(np.ceil(3 * sigma))
+    x = np.arange(-half, half + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+def chromosome_windows(positions: np.ndarray, frequencies: np.ndarray, window: int = DEFAULT_WINDOW,
+                       step: int = DEFAULT_STEP, smooth: float = DEFAULT_SMOOTH) -> Dict[str, np.ndarray]:
+    """
+    Rolling statistics of one chromosome.
+
+    Args:
+        positions (np.ndarray): SNP positions (any order)
+        frequencies (np.ndarray): Mutation frequency (%) of each SNP
+        window (int): Window size in bp
+        step (int): Distance between window starts in bp
+        smooth (float): Standard deviation, in windows, of the Gaussian used for ``smoothed_af`` (0: none)
+
+    Returns:
+        dict: Arrays ``start``, ``end`` (1-based, inclusive), ``center``, ``n_snps``,
+        ``density_per_mb``, ``mean_af`` and ``smoothed_af`` (both NaN for empty windows),
+        plus the sorted ``positions`` and frequency prefix sums ``cum_af``
+    """
+    if window <= 0 or step <= 0:
+        raise ValueError(f"window and step must be positive (got window={window}, step={step})")
+    order = np.argsort(positions, kind='stable')
+    positions = np.asarray(positions, dtype=np.int64)[order]
+    frequencies = np.asarray(frequencies, dtype=np.float64)[order]
+    cum_af = np.concatenate(([0.0], np.cumsum(frequencies)))
+
+    last = int(positions[-1]) if positions.size else 1
+    # Enough windows to cover the last SNP
+    n_windows = max(1, -(-max(last - window, 0) // step) + 1)
+    start = 1 + step * np.arange(n_windows, dtype=np.int64)
+    end = start + window - 1
+    lo = np.searchsorted(positions, start, side='left')
+    hi = np.searchsorted(positions, end, side='right')
+    n_snps = hi - lo
+    af_sum = cum_af[hi] - cum_af[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_af = af_sum / n_snps
+        kernel = _gaussian_kernel(smooth)
+        half = kernel.size // 2
+        # SNP-weighted smoothing: sparse windows pull the curve less than dense ones
+        smoothed_af = (np.convolve(af_sum, kernel)[half:half + n_windows]
+                       / np.convolve(n_snps, kernel)[half:half + n_windows])
+    # No curve (and no peak) where a window holds no SNPs
+    smoothed_af[n_snps == 0] = np.nan
+
+    return {
+        "start": start,
+        "end": end,
+        "center": start + (window - 1) // 2,
+        "n_snps": n_snps,
+        "density_per_mb": n_snps * (1e6 / window),
+        "mean_af": mean_af,
+        "smoothed_af": smoothed_af,
+        "positions": positions,
+        "cum_af": cum_af,
+    }
+
+
+def scan_windows(mutations, window: int = DEFAULT_WINDOW, step: int = DEFAULT_STEP,
+                 smooth: float = DEFAULT_SMOOTH) -> pd.DataFrame:
+    """
+    Sliding-window table over all chromosomes of a parsed VCF.
+
+    Args:
+        mutations (dict): Chromosome -> (positions, frequencies) arrays
+        window (int): Window size in bp
+        step (int): Distance between window starts in bp
+        smooth (float): Gaussian smoothing width in windows
+
+    Returns:
+        pd.DataFrame: One row per window with the columns of ``WINDOW_COLUMNS``
+    """
+    frames = []
+    for chrom, (positions, frequencies) in mutations.items():
+        if len(positions) == 0:
+            continue
+        stats = chromosome_windows(positions, frequencies, window, step, smooth)
+        frame = pd.DataFrame({col: stats[col] for col in WINDOW_COLUMNS[1:]})
+        frame.insert(0, "chrom", chrom)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=WINDOW_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _peak_intervals(stats: Dict[str, np.ndarray], drop: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (peak window, first window, last window) of the local maxima of the smoothed curve.
+
+    Peaks are taken highest first; a peak whose interval overlaps that of a higher one is dropped.
+    """
+    curve = np.where(np.isnan(stats["smoothed_af"]), -np.inf, stats["smoothed_af"])
+    padded = np.concatenate(([-np.inf], curve, [-np.inf]))
+    # Left edge of plateaus counts once
+    peaks = np.flatnonzero((padded[1:-1] > padded[:-2]) & (padded[1:-1] >= padded[2:]) & np.isfinite(curve))
+    if peaks.size == 0:
+        return peaks, peaks, peaks
+    peaks = peaks[np.argsort(-curve[peaks], kind='stable')]
+    covered = np.zeros(curve.size, dtype=bool)
+    kept, first, last = [], [], []
+    for peak in peaks.tolist():
+        if covered[peak]:
+            continue
+        # Nearest windows on either side that fall below peak - drop
+        below = np.flatnonzero(curve < curve[peak] - drop)
+        j = np.searchsorted(below, peak)
+        lo = int(below[j - 1]) + 1 if j > 0 else 0
+        hi = int(below[j]) - 1 if j < below.size else curve.size - 1
+        if covered[lo:hi + 1].any():
+            continue
+        covered[lo:hi + 1] = True
+        kept.append(peak)
+        first.append(lo)
+        last.append(hi)
+    return np.array(kept, dtype=np.int64), np.array(first, dtype=np.int64), np.array(last, dtype=np.int64)
+
+
+def candidate_intervals(mutations, window: int = DEFAULT_WINDOW, step: int = DEFAULT_STEP,
+                        smooth: float = DEFAULT_SMOOTH, top: int = 5, drop: float = 10.0,
+                        min_snps: int = 3) -> pd.DataFrame:
+    """
+    Rank candidate intervals for the causal mutation.
+
+    Each local maximum of the smoothed AF curve is widened to the windows whose
+    smoothed AF stays within ``drop`` percentage points of the peak. Intervals
+    are ranked by peak smoothed AF, then by SNP count.
+
+    Args:
+        mutations (dict): Chromosome -> (positions, frequencies) arrays
+        window (int): Window size in bp
+        step (int): Distance between window starts in bp
+        smooth (float): Gaussian smoothing width in windows
+        top (int): Number of intervals to report (0: all)
+        drop (float): Allowed decrease from the peak, in AF percentage points
+        min_snps (int): Minimum SNPs inside an interval
+
+    Returns:
+        pd.DataFrame: Columns of ``CANDIDATE_COLUMNS``, best interval first
+    """
+    rows = []
+    for chrom, (positions, frequencies) in mutations.items():
+        if len(positions) == 0:
+            continue
+        stats = chromosome_windows(positions, frequencies, window, step, smooth)
+        peaks, first, last = _peak_intervals(stats, drop)
+        for peak, lo_w, hi_w in zip(peaks.tolist(), first.tolist(), last.tolist()):
+            lo = np.searchsorted(stats["positions"], stats["start"][lo_w], side='left')
+            hi = np.searchsorted(stats["positions"], stats["end"][hi_w], side='right')
+            if hi - lo < max(min_snps, 1):
+                continue
+            rows.append({
+                "chrom": chrom,
+                # Span of the SNPs inside the windows
+                "start": int(stats["positions"][lo]),
+                "end": int(stats["positions"][hi - 1]),
+                "peak_position": int(np.clip(stats["center"][peak], stats["positions"][lo], stats["positions"][hi - 1])),
+                "peak_af": float(stats["smoothed_af"][peak]),
+                "mean_af": float((stats["cum_af"][hi] - stats["cum_af"][lo]) / (hi - lo)),
+                "n_snps": int(hi - lo),
+            })
+
+    if not rows:
+        return pd.DataFrame(columns=CANDIDATE_COLUMNS)
+    candidates = pd.DataFrame(rows).sort_values(["peak_af", "n_snps"], ascending=False, kind='stable')
+    if top:
+        candidates = candidates.head(top)
+    candidates.insert(0, "rank", np.arange(1, len(candidates) + 1))
+    return candidates.reset_index(drop=True)[CANDIDATE_COLUMNS]
+
+
+def write_candidates(candidates: pd.DataFrame, output_file: str) -> None:
+    """Write candidate intervals as a TSV with AF values rounded to 0.01%."""
+    candidates.to_csv(output_file, sep='\t', index=False, float_format='%.2f')
+    logger.info(f"Candidate intervals written to {output_file}")
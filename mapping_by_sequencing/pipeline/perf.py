@@ -0,0 +1,298 @@
+"""
+Per-rule performance of finished runs, from snakemake's benchmark files.
+
+Every rule of the Snakefile writes ``benchmarks/<rule>/<wildcards>.tsv`` and
+``mbs run`` starts snakemake with ``--benchmark-extended``, so each file holds
+one job's wall time, CPU time, max RSS and I/O together with its rule,
+threads, requested resources and input sizes. This module collects them for
+one or more run directories. It prints, per rule, the job count, wall time,
+CPU efficiency, peak memory next to the requested mem_mb, and how wall time
+and RSS scale with the input size (the exponent b of a fit of
+``value ~ input_size^b``). For each run it also reports the critical path of
+the latest snakemake invocation: the chain of jobs, each waiting on the
+last-finishing producer of its inputs, that set the total runtime. The DAG and
+the end times come from snakemake's ``.snakemake/metadata`` records.
+
+Usage:
+    python -m mapping_by_sequencing.pipeline.perf runs/run_20250810_E1_vs_E19
+    python -m mapping_by_sequencing.pipeline.perf runs/* --tsv jobs.tsv
+"""
+
+import ast
+import json
+import os
+import sys
+from base64 import urlsafe_b64decode
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .progress import latest_log
+
+BENCHMARK_DIR = "benchmarks"
+# Fits need this many jobs whose input sizes span at least SCALING_SPAN
+SCALING_MIN_JOBS = 3
+SCALING_SPAN = 1.5
+
+NUMERIC_COLUMNS = ["threads", "wall_s", "cpu_s", "max_rss_mb", "io_in_mb", "io_out_mb", "mem_mb", "input_mb"]
+JOB_COLUMNS = ["run", "rule", "job"] + NUMERIC_COLUMNS + ["inputs"]
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _field(record: pd.Series, key: str):
+    value = record.get(key)
+    return None if value is None or pd.isna(value) else value
+
+
+def _literal(value, default):
+    try:
+        return ast.literal_eval(value) if isinstance(value, str) else default
+    except (ValueError, SyntaxError):
+        return default
+
+
+def read_benchmarks(run_dir) -> pd.DataFrame:
+    """
+    One row per benchmarked job of a run (the last repeat of each file).
+
+    Files written without --benchmark-extended lack rule, threads, resources and
+    input sizes; their rule is taken from the directory name and the rest is NaN.
+    """
+    run_dir = Path(run_dir)
+    run_name = run_dir.resolve().name
+    rows = []
+    for path in sorted((run_dir / BENCHMARK_DIR).rglob("*.tsv")):
+        try:
+            table = pd.read_table(path, sep="\t", dtype=str)
+        except (pd.errors.EmptyDataError, pd.errors.ParserError):
+            continue
+        if table.empty or "s" not in table.columns:
+            continue
+        record = table.iloc[-1]
+        relative = path.relative_to(run_dir / BENCHMARK_DIR)
+        rule = _field(record, "rule_name") or relative.parts[0]
+        inputs = _literal(_field(record, "input_size_mb"), {})
+        resources = _literal(_field(record, "resources"), {})
+        rows.append({
+            "run": run_name,
+            "rule": rule,
+            "job": str(Path(*relative.parts[1:]).with_suffix("")),
+            "threads": _number(_field(record, "threads")),
+            "wall_s": _number(_field(record, "s")),
+            "cpu_s": _number(_field(record, "cpu_time")),
+            "max_rss_mb": _number(_field(record, "max_rss")),
+            "io_in_mb": _number(_field(record, "io_in")),
+            "io_out_mb": _number(_field(record, "io_out")),
+            "mem_mb": _number(resources.get("mem_mb")),
+            "input_mb": sum(inputs.values()) if inputs else np.nan,
+            "inputs": tuple(sorted(inputs)),
+        })
+    return pd.DataFrame(rows, columns=JOB_COLUMNS).astype({column: float for column in NUMERIC_COLUMNS})
+
+
+def read_metadata(run_dir) -> Dict[str, dict]:
+    """
+    snakemake's record of every output file it created in a run directory:
+    rule, inputs, start and end time, keyed by the output path.
+    """
+    root = Path(run_dir) / ".snakemake" / "metadata"
+    records = {}
+    if not root.exists():
+        return records
+    for path in root.rglob("*"):
+        # Long names are split into directories, all but the last part prefixed with "@"
+        if not path.is_file() or path.name.startswith("@"):
+            continue
+        encoded = "".join(part.lstrip("@") for part in path.relative_to(root).parts)
+        try:
+            output = urlsafe_b64decode(encoded).decode()
+            with open(path) as f:
+                record = json.load(f)
+        except (ValueError, OSError):
+            continue
+        if not record.get("incomplete") and record.get("endtime"):
+            records[output] = record
+    return records
+
+
+def invocation_start(run_dir) -> Optional[float]:
+    """Start (Unix time) of the latest snakemake invocation, from its log file name."""
+    log = latest_log(run_dir)
+    if log is None:
+        return None
+    try:
+        return datetime.strptime(log.name.split(".snakemake")[0], "%Y-%m-%dT%H%M%S.%f").timestamp()
+    except ValueError:
+        return log.stat().st_ctime
+
+
+def critical_path(run_dir, jobs: Optional[pd.DataFrame] = None) -> List[dict]:
+    """
+    Critical path of the latest snakemake invocation of a run.
+
+    Starts from the job that finished last and steps back, each time to the
+    producer of the job's inputs that finished last, until it reaches inputs
+    that were already there when the invocation started. Wall times come from
+    the benchmark of the job (matched on rule and inputs), or from the
+    metadata's start and end times.
+
+    Returns:
+        list: One dict per job in execution order (rule, output, wall_s, end_s
+        since the invocation started); empty without metadata
+    """
+    records = read_metadata(run_dir)
+    start = invocation_start(run_dir) or 0
+    recent = {output: record for output, record in records.items() if record["endtime"] >= start}
+    if not recent:
+        return []
+    if jobs is None:
+        jobs = read_benchmarks(run_dir)
+    walls = {(row.rule, row.inputs): row.wall_s for row in jobs.itertuples()}
+
+    output = max(recent, key=lambda o: recent[o]["endtime"])
+    path, seen = [], set()
+    while output is not None and output not in seen:
+        record = recent[output]
+        seen.update(o for o, r in recent.items() if r.get("job_hash") == record.get("job_hash")
+                    and r.get("rule") == record.get("rule"))
+        inputs = tuple(sorted(record.get("input", [])))
+        wall = walls.get((record["rule"], inputs))
+        if wall is None or np.isnan(wall):
+            wall = max(0.0, record["endtime"] - record.get("starttime", record["endtime"]))
+        path.append({"rule": record["rule"], "output": output, "wall_s": wall,
+                     "end_s": record["endtime"] - start})
+        producers = [i for i in record.get("input", []) if i in recent and i not in seen]
+        output = max(producers, key=lambda i: recent[i]["endtime"]) if producers else None
+    return path[::-1]
+
+
+def _fit_exponent(x: pd.Series, y: pd.Series) -> float:
+    """b of y ~ x^b (least squares in log-log), or NaN without enough spread in x."""
+    valid = (x > 0) & (y > 0)
+    x, y = x[valid], y[valid]
+    if len(x) < SCALING_MIN_JOBS or x.max() < SCALING_SPAN * x.min():
+        return np.nan
+    return float(np.polyfit(np.log(x), np.log(y), 1)[0])
+
+
+def rule_summary(jobs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-rule aggregates of a job table from read_benchmarks, slowest rules
+    (total wall time) first.
+    """
+    rows = []
+    for rule, group in jobs.groupby("rule", sort=False):
+        core_s = (group["wall_s"] * group["threads"].fillna(1)).sum()
+        per_gb = group["wall_s"] / (group["input_mb"] / 1024)
+        rows.append({
+            "rule": rule,
+            "jobs": len(group),
+            "wall_total_s": group["wall_s"].sum(),
+            "wall_median_s": group["wall_s"].median(),
+            "wall_max_s": group["wall_s"].max(),
+            "cpu_efficiency": group["cpu_s"].sum(min_count=1) / core_s if core_s else np.nan,
+            "max_rss_mb": group["max_rss_mb"].max(),
+            "mem_mb": group["mem_mb"].max(),
+            "input_gb": group["input_mb"].sum(min_count=1) / 1024,
+            "s_per_gb": per_gb[group["input_mb"] > 0].median(),
+            "wall_exponent": _fit_exponent(group["input_mb"], group["wall_s"]),
+            "rss_exponent": _fit_exponent(group["input_mb"], group["max_rss_mb"]),
+        })
+    summary = pd.DataFrame(rows)
+    return summary.sort_values("wall_total_s", ascending=False, ignore_index=True) if not summary.empty else summary
+
+
+def _duration(seconds) -> str:
+    return "-" if seconds is None or np.isnan(seconds) else str(timedelta(seconds=int(round(seconds))))
+
+
+def _value(value, fmt: str) -> str:
+    return "-" if value is None or np.isnan(value) else format(value, fmt)
+
+
+def _table(rows: List[tuple]) -> List[str]:
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return ["   " + "  ".join(cell.ljust(w) if i == 0 else cell.rjust(w)
+                              for i, (cell, w) in enumerate(zip(row, widths))) for row in rows]
+
+
+def render_summary(summary: pd.DataFrame) -> List[str]:
+    rows = [("rule", "jobs", "wall total", "median", "max", "CPU %", "max RSS MB", "mem_mb",
+             "input GB", "s/GB", "time~in^b", "RSS~in^b")]
+    for row in summary.itertuples():
+        rows.append((row.rule, str(row.jobs), _duration(row.wall_total_s), _duration(row.wall_median_s),
+                     _duration(row.wall_max_s), _value(100 * row.cpu_efficiency, ".0f"), _value(row.max_rss_mb, ",.0f"),
+                     _value(row.mem_mb, ",.0f"), _value(row.input_gb, ".2f"), _value(row.s_per_gb, ".1f"),
+                     _value(row.wall_exponent, ".2f"), _value(row.rss_exponent, ".2f")))
+    return _table(rows)
+
+
+def render_critical_path(path: List[dict]) -> List[str]:
+    rows = [("rule", "output", "wall", "finished at")]
+    rows += [(step["rule"], step["output"], _duration(step["wall_s"]), _duration(step["end_s"])) for step in path]
+    return _table(rows)
+
+
+def perf_report(run_dirs: list, tsv: Optional[str] = None) -> str:
+    """
+    Text report over run directories: per-rule table for all their jobs, then
+    the critical path of each run (in full for a single run).
+    """
+    run_dirs = [Path(d).resolve() for d in run_dirs]
+    tables = [read_benchmarks(d) for d in run_dirs]
+    with_jobs = [table for table in tables if not table.empty]
+    jobs = pd.concat(with_jobs, ignore_index=True) if with_jobs else pd.DataFrame(columns=JOB_COLUMNS)
+    if tsv:
+        jobs.drop(columns="inputs").to_csv(tsv, sep="\t", index=False)
+    if jobs.empty:
+        return "No benchmarks found (runs write them to <run>/benchmarks/ as their jobs finish)"
+
+    lines = [f"⏱️  {len(jobs)} job(s) from {len(with_jobs)} run(s)"]
+    lines += render_summary(rule_summary(jobs))
+    for run_dir, table in zip(run_dirs, tables):
+        if table.empty:
+            continue
+        path = critical_path(run_dir, table)
+        if not path:
+            continue
+        busy = sum(step["wall_s"] for step in path)
+        lines.append("")
+        lines.append(f"🧭 Critical path of {run_dir.name}: {_duration(path[-1]['end_s'])} elapsed, "
+                     f"{_duration(busy)} running, {len(path)} job(s)")
+        if len(run_dirs) == 1:
+            lines += render_critical_path(path)
+        else:
+            rules = [step["rule"] for step in path]
+            lines.append("   " + " → ".join(r for i, r in enumerate(rules) if i == 0 or r != rules[i - 1]))
+    return "\n".join(lines)
+
+
+def main():
+    """
+    Command-line interface: per-rule performance of one or more run directories.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Per-rule wall time, CPU, memory and scaling from snakemake benchmarks')
+    parser.add_argument('run_dirs', nargs='+', help='Run directories (contain benchmarks/)')
+    parser.add_argument('--tsv', help='Also write one row per job to this TSV')
+    args = parser.parse_args()
+
+    missing = [d for d in args.run_dirs if not os.path.isdir(d)]
+    if missing:
+        print(f"❌ Run directory not found: {', '.join(missing)}")
+        sys.exit(1)
+    print(perf_report(args.run_dirs, tsv=args.tsv))
+
+
+if __name__ == "__main__":
+    main()
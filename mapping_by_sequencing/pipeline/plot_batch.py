@@ -0,0 +1,231 @@
+"""
+Plot many VCFs in one process pool.
+
+Each job parses one annotated VCF (reusing its ``.freq.npz`` cache), writes the
+frequency plot and candidate-interval TSV, and contributes one row to a
+combined index TSV. Workers are forked from this interpreter, so matplotlib
+and numpy are imported once for the whole batch.
+
+Usage:
+    python -m mapping_by_sequencing.pipeline.plot_batch a.vcf b.vcf.gz --control E1 -j 8
+    python -m mapping_by_sequencing.pipeline.plot_batch --runs-dir runs -j 8 --index runs/plot_index.tsv
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend for headless environments
+import matplotlib.pyplot as plt
+import pandas as pd
+import yaml
+
+from .frequency_windows import DEFAULT_SMOOTH, DEFAULT_STEP, DEFAULT_WINDOW, write_candidates
+from .plotting import MutationFrequencies
+
+logger = logging.getLogger(__name__)
+
+FINAL_VCF_PATTERN = re.compile(r"^all_vs_(?P<control>.+)_ann\.vcf(\.gz)?$")
+INDEX_COLUMNS = ["label", "status", "vcf", "control", "n_sites", "n_chromosomes", "top_candidate",
+                 "top_peak_af", "plot", "candidates", "seconds", "error"]
+
+
+def _vcf_stem(vcf_file) -> str:
+    name = Path(vcf_file).name
+    for ext in (".gz", ".vcf"):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return name
+
+
+def run_jobs(run_dir, out_dir=None, **options) -> List[Dict]:
+    """
+    Plot jobs for the final annotated VCF(s) of a run directory.
+
+    The control comes from the VCF name (all_vs_<control>_ann.vcf) and window
+    settings from the run's config.yaml unless given in ``options``. Outputs go
+    next to each VCF, or under ``out_dir/<run>/<combination>``.
+    """
+    run_dir = Path(run_dir)
+    final_root = run_dir / "results" / "final"
+    window_config = {}
+    if (run_dir / "config.yaml").exists():
+        with open(run_dir / "config.yaml", 'r') as f:
+            window_config = (yaml.safe_load(f) or {}).get('mapping_windows', {}) or {}
+
+    jobs = []
+    for vcf in sorted(final_root.rglob("all_vs_*_ann.vcf*")) if final_root.exists() else []:
+        match = FINAL_VCF_PATTERN.match(vcf.name)
+        if not match:
+            continue
+        combination = vcf.parent.relative_to(final_root)
+        label = run_dir.name if combination == Path(".") else f"{run_dir.name}/{combination}"
+        target = vcf.parent if out_dir is None else Path(out_dir) / label
+        title = f"Mutation Frequency vs. Chromosome Location - {run_dir.name}"
+        if combination != Path("."):
+            title += f" - {combination.name}"
+        job = {
+            "label": label,
+            "vcf": str(vcf),
+            "control": match.group("control"),
+            "plot": str(target / "mutation_frequency_plot.png"),
+            "candidates": str(target / "candidate_intervals.tsv"),
+            "title": title,
+        }
+        for key in ("window", "step", "smooth", "top"):
+            if key in window_config:
+                job[key] = window_config[key]
+        job.update({k: v for k, v in options.items() if v is not None})
+        jobs.append(job)
+    return jobs
+
+
+def vcf_jobs(vcf_files, out_dir=None, **options) -> List[Dict]:
+    """Plot jobs for explicit VCF paths; outputs are named after each VCF."""
+    jobs, seen = [], {}
+    for vcf in vcf_files:
+        label = _vcf_stem(vcf)
+        seen[label] = seen.get(label, 0) + 1
+        if seen[label] > 1:
+            label = f"{label}_{seen[label]}"
+        target = Path(vcf).parent if out_dir is None else Path(out_dir)
+        job = {
+            "label": label,
+            "vcf": str(vcf),
+            "plot": str(target / f"{label}_frequency_plot.png"),
+            "candidates": str(target / f"{label}_candidate_intervals.tsv"),
+        }
+        job.update({k: v for k, v in options.items() if v is not None})
+        jobs.append(job)
+    return jobs
+
+
+def plot_job(job: Dict) -> Dict:
+    """Parse, plot and rank one VCF; never raises, failures are reported in the row."""
+    start = time.perf_counter()
+    row = {col: job.get(col, "") for col in INDEX_COLUMNS}
+    row.update({"status": "ok", "error": ""})
+    try:
+        data = MutationFrequencies.from_vcf(job["vcf"], control_sample=job.get("control"),
+                                            min_dp=job.get("min_dp", 0), use_cache=job.get("use_cache", True))
+        window, step, smooth = job.get("window", DEFAULT_WINDOW), job.get("step", DEFAULT_STEP), job.get("smooth", DEFAULT_SMOOTH)
+        row["n_sites"] = sum(len(positions) for positions, _ in data.mutations.values())
+        row["n_chromosomes"] = len(data.mutations)
+
+        for path in (job["plot"], job["candidates"]):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        windows = data.windows(window, step, smooth)
+        candidates = data.candidates(window, step, smooth, top=job.get("top", 5))
+        write_candidates(candidates, job["candidates"])
+        if len(candidates):
+            best = candidates.iloc[0]
+            row["top_candidate"] = f"{best['chrom']}:{best['start']}-{best['end']}"
+            row["top_peak_af"] = round(float(best['peak_af']), 2)
+
+        fig = data.plot(job["plot"], job.get("title"), dpi=job.get("dpi", 300), windows=windows, candidates=candidates)
+        if fig is None:
+            row["status"] = "no mutations"
+        else:
+            # Workers are long-lived: free the figure
+            plt.close(fig)
+    except Exception as e:
+        row["status"], row["error"] = "error", str(e)
+    row["seconds"] = round(time.perf_counter() - start, 2)
+    return row
+
+
+def plot_many(jobs: List[Dict], processes: Optional[int] = None, index_file=None) -> pd.DataFrame:
+    """
+    Run plot jobs across a process pool and write the combined index.
+
+    Args:
+        jobs (list): Job dicts from ``run_jobs``/``vcf_jobs``
+        processes (int): Worker processes (default: CPU count, at most one per job)
+        index_file (str): Optional TSV path for the index
+
+    Returns:
+        pd.DataFrame: One row per job, in job order
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, len(jobs) or 1))
+    rows: List[Optional[Dict]] = [None] * len(jobs)
+    if processes == 1:
+        for i, job in enumerate(jobs):
+            rows[i] = plot_job(job)
+            _report(rows[i], i + 1, len(jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(plot_job, job): i for i, job in enumerate(jobs)}
+            for done, future in enumerate(as_completed(futures), 1):
+                rows[futures[future]] = future.result()
+                _report(rows[futures[future]], done, len(jobs))
+
+    index = pd.DataFrame(rows, columns=INDEX_COLUMNS)
+    if index_file:
+        Path(index_file).parent.mkdir(parents=True, exist_ok=True)
+        index.to_csv(index_file, sep='\t', index=False)
+    return index
+
+
+def _report(row: Dict, done: int, total: int) -> None:
+    icon = "✅" if row["status"] == "ok" else "⚠️" if row["status"] == "no mutations" else "❌"
+    detail = row["top_candidate"] or row["error"] or row["status"]
+    print(f"{icon} [{done}/{total}] {row['label']} ({row['seconds']}s) {detail}", flush=True)
+
+
+def main():
+    """
+    Command-line interface: plot many VCFs, or every run under a runs directory.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Plot mutation frequency for many VCFs in parallel')
+    parser.add_argument('vcf_files', nargs='*', help='Input VCF files')
+    parser.add_argument('--runs-dir', help='Plot the final VCF(s) of every run in this directory instead')
+    parser.add_argument('--runs', nargs='+', help='With --runs-dir: only these runs')
+    parser.add_argument('-o', '--out-dir', help='Write plots here instead of next to each VCF')
+    parser.add_argument('--index', help='Combined index TSV (default: <out-dir or runs-dir>/plot_index.tsv)')
+    parser.add_argument('-j', '--jobs', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--control', help='Control sample of the given VCFs (runs: taken from the VCF name)')
+    parser.add_argument('--min-dp', type=int, default=5, help='Minimum total depth required to include a site (default: 5, as in the pipeline)')
+    parser.add_argument('--window', type=int, help=f'Sliding-window size in bp (default: run config or {DEFAULT_WINDOW})')
+    parser.add_argument('--step', type=int, help=f'Window step in bp (default: run config or {DEFAULT_STEP})')
+    parser.add_argument('--smooth', type=float, help=f'Gaussian smoothing width in windows (default: run config or {DEFAULT_SMOOTH})')
+    parser.add_argument('--top', type=int, help='Number of candidate intervals (default: run config or 5)')
+    parser.add_argument('--dpi', type=int, default=300, help='DPI for saved plots (default: 300)')
+    parser.add_argument('--no-cache', action='store_true', help='Always re-read the VCFs')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    options = dict(min_dp=args.min_dp, window=args.window, step=args.step, smooth=args.smooth, top=args.top,
+                   dpi=args.dpi, use_cache=not args.no_cache)
+
+    if args.runs_dir:
+        run_dirs = [Path(args.runs_dir) / r for r in args.runs] if args.runs else \
+            sorted(d for d in Path(args.runs_dir).iterdir() if d.is_dir())
+        jobs = [job for run_dir in run_dirs for job in run_jobs(run_dir, args.out_dir, **options)]
+        default_index = Path(args.out_dir or args.runs_dir) / "plot_index.tsv"
+    elif args.vcf_files:
+        jobs = vcf_jobs(args.vcf_files, args.out_dir, control=args.control, **options)
+        default_index = Path(args.out_dir or ".") / "plot_index.tsv"
+    else:
+        parser.error("give VCF files or --runs-dir")
+
+    if not jobs:
+        print("❌ No VCFs to plot")
+        sys.exit(1)
+
+    index = plot_many(jobs, processes=args.jobs, index_file=args.index or default_index)
+    failed = int((index["status"] == "error").sum())
+    print(f"\n📋 Index written to: {args.index or default_index} ({int((index['status'] == 'ok').sum())}/{len(index)} plotted)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
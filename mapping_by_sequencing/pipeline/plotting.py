@@ -7,151 +7,261 @@ import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend for headless environments
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import defaultdict
+from collections import OrderedDict
 from pathlib import Path
+import json
 import logging
-from typing import Optional, List
+import os
+import sys
+from typing import Optional
+
+from .vcf_frequency import parse_vcf_frequency_columnar
+from .frequency_windows import (
+    DEFAULT_SMOOTH, DEFAULT_STEP, DEFAULT_WINDOW, candidate_intervals, scan_windows, write_candidates,
+)
 
 logger = logging.getLogger(__name__)
 
-def _detect_sample_columns(header_line: str) -> List[str]:
-    """Return list of sample column names from a VCF header line starting with '#CHROM'."""
-    parts = header_line.strip().split('\t')
-    # Standard VCF has 9 fixed columns; samples start at index 9
-    if len(parts) <= 9:
-        return []
-    return parts[9:]
+# Bump when the parser's output changes so stale .npz caches are re-parsed
+FREQUENCY_CACHE_VERSION = 1
+
+# Rendering limits of create_frequency_plot
+DEFAULT_MAX_POINTS = 200_000
+DEFAULT_MAX_PANELS = 12
+DEFAULT_MAX_FIGURE_HEIGHT = 40  # inches
+# Panels beyond this many get half the per-panel height
+FULL_HEIGHT_PANELS = 3
+
+
+def _mutation_arrays(chrom_mutations):
+    """(positions, frequencies) arrays from a parser result entry or a list of (position, frequency) tuples."""
+    if isinstance(chrom_mutations, tuple) and len(chrom_mutations) == 2 and isinstance(chrom_mutations[0], np.ndarray):
+        return chrom_mutations
+    if len(chrom_mutations) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    positions, frequencies = zip(*chrom_mutations)
+    return np.asarray(positions), np.asarray(frequencies, dtype=np.float64)
 
 
 def parse_vcf_frequency(vcf_file: str, control_sample: Optional[str] = None, min_dp: int = 0):
     """
     Parse VCF file to extract mutation frequency and chromosome location.
     
+    Frequencies are averaged over the mutant samples (all but ``control_sample``)
+    that carry an ALT genotype. Plain and gzipped/BGZF VCFs are read transparently.
+    
     Args:
-        vcf_file (str): Path to VCF file
+        vcf_file (str): Path to VCF file (.vcf or .vcf.gz)
+        control_sample (str): Control sample to exclude from the frequency
+        min_dp (int): Minimum total depth for a sample to be counted
         
     Returns:
-        dict: Dictionary with chromosome as key and list of (position, frequency) tuples as value
+        dict: Dictionary with chromosome as key and a (positions, frequencies) tuple of NumPy arrays as value
     """
-    mutations = defaultdict(list)
-    sample_names: Optional[List[str]] = None
-    mutant_sample_indices: Optional[List[int]] = None
-    
     try:
-        with open(vcf_file, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                if line.startswith('#'):
-                    # Capture sample names when we hit the header
-                    if line.startswith('#CHROM'):
-                        sample_names = _detect_sample_columns(line)
-                        if sample_names:
-                            # Determine mutant sample indices (0-based relative to samples)
-                            if control_sample:
-                                mutant_sample_indices = [i for i, name in enumerate(sample_names)
-                                                         if control_sample not in name]
-                            else:
-                                mutant_sample_indices = list(range(len(sample_names)))
-                    continue
-                    
-                parts = line.strip().split('\t')
-                if len(parts) < 10:
-                    logger.warning(f"Line {line_num}: insufficient columns, skipping")
-                    continue
-                    
-                chrom = parts[0]
-                pos = int(parts[1])
-                
-                # Skip if no samples present
-                if len(parts) < 10:
-                    continue
-
-                # Parse genotype information to get frequency from mutant samples (exclude control)
-                format_fields = parts[8].split(':')
-                # Identify indices to consider
-                if mutant_sample_indices is None:
-                    # If we have not seen header, assume all sample columns are mutants
-                    num_samples = len(parts) - 9
-                    mutant_sample_indices = list(range(num_samples))
-
-                per_sample_freqs: list[float] = []
-
-                for rel_idx in mutant_sample_indices:
-                    col_idx = 9 + rel_idx
-                    if col_idx >= len(parts):
-                        continue
-                    sample_field_str = parts[col_idx]
-                    if sample_field_str == '.' or sample_field_str == './.':
-                        continue
-                    sample_fields = sample_field_str.split(':')
-
-                    # Build dict of FORMAT -> value
-                    fmt_map = {key: sample_fields[i] if i < len(sample_fields) else None for i, key in enumerate(format_fields)}
-
-                    # Require an ALT genotype (exclude 0/0), so values from mutants without the variant don't drag the average
-                    gt_raw = fmt_map.get('GT') or ''
-                    if '1' not in gt_raw:  # handles 0/1, 1/1, 1|0, 1|1, 0/1/2, etc.
-                        continue
-
-                    # Prefer AD for allele depths
-                    ad_raw = fmt_map.get('AD')
-                    dp_raw = fmt_map.get('DP')
-                    if not ad_raw:
-                        # Try reconstruct from ADF/ADR if available
-                        adf_raw = fmt_map.get('ADF')
-                        adr_raw = fmt_map.get('ADR')
-                        if adf_raw and adr_raw:
-                            try:
-                                adf = [int(x) for x in adf_raw.split(',') if x != '.']
-                                adr = [int(x) for x in adr_raw.split(',') if x != '.']
-                                ad_list = [a + b for a, b in zip(adf, adr)]
-                                ad_raw = ','.join(str(x) for x in ad_list)
-                            except Exception:
-                                ad_raw = None
-                    if not ad_raw:
-                        continue
-                    try:
-                        ad_vals = [int(x) for x in ad_raw.split(',') if x != '.']
-                        if len(ad_vals) < 2:
-                            continue
-                        ref_depth = ad_vals[0]
-                        alt_depth = sum(ad_vals[1:])  # support multi-allelic
-                        total_depth = ref_depth + alt_depth
-                        # Fallback to DP if AD seems inconsistent
-                        if (dp_raw and dp_raw != '.' and dp_raw.isdigit() and int(dp_raw) > total_depth):
-                            total_depth = int(dp_raw)
-                        if total_depth < max(1, min_dp):
-                            continue
-                        freq = alt_depth / total_depth
-                        per_sample_freqs.append(freq)
-                    except Exception:
-                        logger.debug(f"Line {line_num}: could not parse AD/DP fields for sample idx {rel_idx}, skipping")
-                        continue
-
-                if per_sample_freqs:
-                    frequency_pct = float(np.mean(per_sample_freqs)) * 100.0
-                    mutations[chrom].append((pos, frequency_pct))
-                    
+        return parse_vcf_frequency_columnar(vcf_file, control_sample=control_sample, min_dp=min_dp)
     except FileNotFoundError:
         logger.error(f"VCF file not found: {vcf_file}")
         raise
     except Exception as e:
         logger.error(f"Error parsing VCF file: {e}")
         raise
+
+def default_cache_file(vcf_file) -> Path:
+    """Cache path of the parsed frequencies of a VCF: ``<vcf>.freq.npz`` next to it."""
+    vcf_path = Path(vcf_file)
+    return vcf_path.with_name(vcf_path.name + ".freq.npz")
+
+
+class MutationFrequencies:
+    """
+    Parsed mutation frequencies of a VCF, reusable for plots and statistics.
+    
+    The result can be saved as ``.npz``; the file records the VCF's size and
+    mtime together with the parse options, and is only reused while all of
+    them still match.
+    """
+    
+    def __init__(self, mutations, vcf_file: Optional[str] = None, control_sample: Optional[str] = None, min_dp: int = 0):
+        self.mutations = OrderedDict(
+            (chrom, _mutation_arrays(chrom_mutations)) for chrom, chrom_mutations in mutations.items()
+        )
+        self.vcf_file = vcf_file
+        self.control_sample = control_sample
+        self.min_dp = min_dp
+        # Cache metadata when loaded from disk
+        self.source: Optional[dict] = None
+    
+    @classmethod
+    def from_vcf(cls, vcf_file, control_sample: Optional[str] = None, min_dp: int = 0,
+                 use_cache: bool = True, cache_file=None):
+        """
+        Parse a VCF, or load its parsed frequencies from the cache when still valid.
+        
+        Args:
+            vcf_file (str): Path to VCF file (.vcf or .vcf.gz)
+            control_sample (str): Control sample to exclude from the frequency
+            min_dp (int): Minimum total depth for a sample to be counted
+            use_cache (bool): Read and write the on-disk cache
+            cache_file (str): Cache path (default: ``<vcf>.freq.npz``)
+            
+        Returns:
+            MutationFrequencies: The parsed result
+        """
+        cache_file = Path(cache_file) if cache_file else default_cache_file(vcf_file)
+        if use_cache and cache_file.exists():
+            try:
+                cached = cls.load(cache_file)
+                if cached.source == cls._source_of(vcf_file, control_sample, min_dp):
+                    logger.info(f"Using parsed frequencies from {cache_file}")
+                    return cached
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable frequency cache {cache_file}: {e}")
+        
+        logger.info(f"Parsing VCF file: {vcf_file}")
+        data = cls(parse_vcf_frequency(vcf_file, control_sample=control_sample, min_dp=min_dp),
+                   vcf_file=str(vcf_file), control_sample=control_sample, min_dp=min_dp)
+        if use_cache:
+            try:
+                data.save(cache_file)
+            except OSError as e:
+                logger.warning(f"Could not write frequency cache {cache_file}: {e}")
+        return data
     
-    return mutations
+    @staticmethod
+    def _source_of(vcf_file, control_sample, min_dp) -> dict:
+        """What a cached result depends on: VCF size and mtime plus the parse options."""
+        st = os.stat(vcf_file)
+        return {
+            "version": FREQUENCY_CACHE_VERSION,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "control_sample": control_sample,
+            "min_dp": min_dp,
+        }
+    
+    def save(self, path) -> None:
+        """Write the result to ``path`` (.npz), replacing any previous file atomically."""
+        path = Path(path)
+        chroms = list(self.mutations)
+        positions = [self.mutations[c][0] for c in chroms]
+        frequencies = [self.mutations[c][1] for c in chroms]
+        meta = self._source_of(self.vcf_file, self.control_sample, self.min_dp) if self.vcf_file else {}
+        meta.update({"vcf_file": self.vcf_file, "chromosomes": chroms})
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                counts=np.array([len(p) for p in positions], dtype=np.int64),
+                positions=np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64),
+                frequencies=np.concatenate(frequencies) if frequencies else np.zeros(0, dtype=np.float64),
+            )
+        os.replace(tmp, path)
+    
+    @classmethod
+    def load(cls, path):
+        """Read a result written by ``save``."""
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz["meta"]))
+            bounds = np.concatenate(([0], np.cumsum(npz["counts"])))
+            positions, frequencies = npz["positions"], npz["frequencies"]
+        mutations = OrderedDict(
+            (chrom, (positions[lo:hi], frequencies[lo:hi]))
+            for chrom, lo, hi in zip(meta.pop("chromosomes"), bounds[:-1], bounds[1:])
+        )
+        data = cls(mutations, vcf_file=meta.pop("vcf_file"), control_sample=meta.get("control_sample"),
+                   min_dp=meta.get("min_dp", 0))
+        data.source = meta
+        return data
+    
+    def statistics(self):
+        """Summary statistics per chromosome, see ``get_mutation_statistics``."""
+        return get_mutation_statistics(self.mutations)
+    
+    def windows(self, window: int = DEFAULT_WINDOW, step: int = DEFAULT_STEP, smooth: float = DEFAULT_SMOOTH):
+        """Sliding-window mean AF, SNP density and smoothed AF, see ``frequency_windows.scan_windows``."""
+        return scan_windows(self.mutations, window, step, smooth)
+    
+    def candidates(self, window: int = DEFAULT_WINDOW, step: int = DEFAULT_STEP, smooth: float = DEFAULT_SMOOTH, **kwargs):
+        """Ranked candidate intervals, see ``frequency_windows.candidate_intervals``."""
+        return candidate_intervals(self.mutations, window, step, smooth, **kwargs)
+    
+    def plot(self, output_file=None, title=None, **kwargs):
+        """
+        Plot the frequencies; styling options are passed to ``create_frequency_plot``.
+        
+        Returns:
+            matplotlib.figure.Figure: The created figure object, or None without mutations
+        """
+        if title is None:
+            name = Path(self.vcf_file).parent.name if self.vcf_file else ""
+            title = f"Mutation Frequency vs. Chromosome Location - {name}"
+        
+        if not self.mutations:
+            logger.warning("No mutations found in VCF file")
+            return None
+        
+        logger.info(f"Found mutations on {len(self.mutations)} chromosomes:")
+        for chrom, (positions, _) in self.mutations.items():
+            logger.info(f"  Chromosome {chrom}: {len(positions)} mutations")
+        
+        return create_frequency_plot(self.mutations, output_file, title, **kwargs)
+
+def _panel_layout(mutations, max_panels: Optional[int]):
+    """
+    Group chromosomes into plot panels.
+    
+    Returns a list of (title, [(chrom, positions, frequencies, x offset)]). With more
+    than ``max_panels`` non-empty chromosomes, the ``max_panels - 1`` with the most
+    sites keep their own panel and the rest share the last one, laid end to end.
+    """
+    contigs = []
+    for chrom, chrom_mutations in mutations.items():
+        positions, frequencies = _mutation_arrays(chrom_mutations)
+        if positions.size == 0:
+            logger.warning(f"No mutations found for chromosome {chrom}")
+            continue
+        contigs.append((chrom, positions, frequencies))
+    
+    if max_panels is None or len(contigs) <= max_panels:
+        return [(f'Chromosome {chrom}', [(chrom, positions, frequencies, 0)]) for chrom, positions, frequencies in contigs]
+    
+    by_size = sorted(range(len(contigs)), key=lambda i: contigs[i][1].size, reverse=True)
+    own = set(by_size[:max(max_panels - 1, 0)])
+    panels = [(f'Chromosome {contigs[i][0]}', [(*contigs[i], 0)]) for i in sorted(own)]
+    grouped, offset = [], 0
+    for i in range(len(contigs)):
+        if i in own:
+            continue
+        chrom, positions, frequencies = contigs[i]
+        grouped.append((chrom, positions, frequencies, offset))
+        offset += int(positions.max())
+    panels.append((f'{len(grouped)} smaller contigs (end to end)', grouped))
+    return panels
+
 
 def create_frequency_plot(mutations, output_file=None, title="Mutation Frequency vs. Chromosome Location", 
-                         figsize=(12, 8), dpi=300, show_plot=False):
+                         figsize=(12, 8), dpi=300, show_plot=False, windows=None, candidates=None,
+                         max_points: Optional[int] = DEFAULT_MAX_POINTS, max_panels: Optional[int] = DEFAULT_MAX_PANELS,
+                         max_figure_height: Optional[float] = DEFAULT_MAX_FIGURE_HEIGHT):
     """
     Create a plot showing mutation frequency vs. chromosome location.
     
     Args:
-        mutations (dict): Dictionary with chromosome as key and list of (position, frequency) tuples as value
+        mutations (dict): Chromosome -> (positions, frequencies) arrays, or list of (position, frequency) tuples
         output_file (str): Optional output file path for saving the plot
         title (str): Plot title
-        figsize (tuple): Figure size (width, height)
+        figsize (tuple): Figure size (width, height per panel; halved beyond FULL_HEIGHT_PANELS panels)
         dpi (int): DPI for saved plots
         show_plot (bool): Whether to display the plot
+        windows (pd.DataFrame): Optional sliding-window table (``scan_windows``); its
+            smoothed AF is drawn instead of the linear trend line
+        candidates (pd.DataFrame): Optional candidate intervals to shade
+        max_points (int): Panels with more sites are drawn as a log-scaled hexbin
+            density instead of a scatter (None: always scatter)
+        max_panels (int): Maximum number of panels; smaller contigs share the last one (None: no limit)
+        max_figure_height (float): Cap on the total figure height in inches (None: no cap)
         
     Returns:
         matplotlib.figure.Figure: The created figure object
@@ -160,60 +270,86 @@ def create_frequency_plot(mutations, output_file=None, title="Mutation Frequency
         logger.warning("No mutations to plot")
         return None
     
+    panels = _panel_layout(mutations, max_panels)
+    if not panels:
+        logger.warning("No mutations to plot")
+        return None
+    
     # Set up the plot
-    num_chroms = len(mutations)
+    num_panels = len(panels)
+    height = figsize[1] * min(num_panels, FULL_HEIGHT_PANELS) + figsize[1] / 2 * max(0, num_panels - FULL_HEIGHT_PANELS)
+    if max_figure_height is not None and height > max_figure_height:
+        height = max_figure_height
     fig, axes = plt.subplots(
-        num_chroms,
+        num_panels,
         1,
-        figsize=(figsize[0], figsize[1] * num_chroms),
+        figsize=(figsize[0], height),
         constrained_layout=True,
+        squeeze=False,
     )
-    if num_chroms == 1:
-        axes = [axes]
+    axes = axes[:, 0]
     
     # Color palette for chromosomes
-    colors = plt.cm.Set3(np.linspace(0, 1, num_chroms))
+    colors = plt.cm.Set3(np.linspace(0, 1, num_panels))
+    windows_by_chrom = dict(tuple(windows.groupby("chrom", sort=False))) if windows is not None else {}
+    candidates_by_chrom = dict(tuple(candidates.groupby("chrom", sort=False))) if candidates is not None else {}
     
-    for i, (chrom, chrom_mutations) in enumerate(mutations.items()):
-        if not chrom_mutations:
-            logger.warning(f"No mutations found for chromosome {chrom}")
-            continue
-            
-        # Sort by position
-        chrom_mutations.sort(key=lambda x: x[0])
-        positions, frequencies = zip(*chrom_mutations)
+    for i, (panel_title, contigs) in enumerate(panels):
+        ax = axes[i]
+        positions = np.concatenate([chrom_positions + offset for _, chrom_positions, _, offset in contigs])
+        frequencies = np.concatenate([chrom_frequencies for _, _, chrom_frequencies, _ in contigs])
         
-        # Create scatter plot
-        axes[i].scatter(positions, frequencies, alpha=0.6, s=20, color=colors[i])
+        if max_points is not None and positions.size > max_points:
+            # Density instead of millions of markers
+            ax.hexbin(positions, frequencies, gridsize=(300, 40), extent=(positions.min(), positions.max(), 0, 100),
+                      bins='log', mincnt=1, cmap='viridis', linewidths=0)
+        else:
+            # Sort by position
+            order = np.argsort(positions, kind='stable')
+            ax.scatter(positions[order], frequencies[order], alpha=0.6, s=20, color=colors[i], rasterized=True)
+        
+        for chrom, chrom_positions, _, offset in contigs:
+            if chrom in windows_by_chrom:
+                # Smoothed AF along the chromosome
+                chrom_windows = windows_by_chrom[chrom]
+                ax.plot(chrom_windows["center"] + offset, chrom_windows["smoothed_af"], "r-", alpha=0.8, linewidth=1.5)
+            for interval in candidates_by_chrom.get(chrom, pd.DataFrame()).itertuples():
+                ax.axvspan(interval.start + offset, interval.end + offset, color='orange', alpha=0.2)
+                ax.text(interval.peak_position + offset, 97, f'#{interval.rank}', ha='center', va='top', fontsize=9)
         
         # Add trend line if there are multiple points
-        if len(positions) > 1:
+        if windows is None and len(contigs) == 1 and len(positions) > 1:
             try:
                 z = np.polyfit(positions, frequencies, 1)
                 p = np.poly1d(z)
-                axes[i].plot(positions, p(positions), "r--", alpha=0.8, linewidth=1)
+                line_x = np.array([positions.min(), positions.max()])
+                ax.plot(line_x, p(line_x), "r--", alpha=0.8, linewidth=1)
             except np.RankWarning:
-                logger.debug(f"Could not fit trend line for chromosome {chrom}")
+                logger.debug(f"Could not fit trend line for {panel_title}")
+        
+        if len(contigs) > 1 and len(contigs) <= 50:
+            for _, _, _, offset in contigs[1:]:
+                ax.axvline(offset, color='grey', alpha=0.3, linewidth=0.5)
         
         # Customize axes
-        axes[i].set_xlabel('Position on Chromosome')
-        axes[i].set_ylabel('Mutation Frequency (%)')
-        axes[i].set_title(f'Chromosome {chrom}')
-        axes[i].grid(True, alpha=0.3)
+        ax.set_xlabel('Position on Chromosome' if len(contigs) == 1 else 'Cumulative position')
+        ax.set_ylabel('Mutation Frequency (%)')
+        ax.set_title(panel_title)
+        ax.grid(True, alpha=0.3)
         
         # Format x-axis to show positions in millions
-        if max(positions) > 1000000:
-            axes[i].xaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/1000000:.1f}M'))
+        if positions.max() > 1000000:
+            ax.xaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/1000000:.1f}M'))
         
         # Set y-axis limits
-        axes[i].set_ylim(0, 100)
+        ax.set_ylim(0, 100)
         
         # Add statistics
         mean_freq = np.mean(frequencies)
         max_freq = np.max(frequencies)
-        axes[i].text(0.02, 0.98, f'Mean: {mean_freq:.1f}%\nMax: {max_freq:.1f}%\nCount: {len(positions)}', 
-                    transform=axes[i].transAxes, verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+        ax.text(0.02, 0.98, f'Mean: {mean_freq:.1f}%\nMax: {max_freq:.1f}%\nCount: {len(positions)}', 
+                transform=ax.transAxes, verticalalignment='top',
+                bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
     
     fig.suptitle(title, fontsize=16)
     
@@ -229,7 +365,7 @@ def create_frequency_plot(mutations, output_file=None, title="Mutation Frequency
     
     return fig
 
-def plot_vcf_frequency(vcf_file, output_file=None, title=None, show_plot=False, control_sample: Optional[str] = None, min_dp: int = 0, **kwargs):
+def plot_vcf_frequency(vcf_file, output_file=None, title=None, show_plot=False, control_sample: Optional[str] = None, min_dp: int = 0, use_cache: bool = True, **kwargs):
     """
     Convenience function to parse VCF and create frequency plot.
     
@@ -237,34 +373,21 @@ def plot_vcf_frequency(vcf_file, output_file=None, title=None, show_plot=False,
         vcf_file (str): Path to VCF file
         output_file (str): Optional output file path
         title (str): Optional plot title
+        use_cache (bool): Reuse/write the parsed result next to the VCF (see MutationFrequencies)
         **kwargs: Additional arguments passed to create_frequency_plot
         
     Returns:
         matplotlib.figure.Figure: The created figure object
     """
-    if title is None:
-        vcf_path = Path(vcf_file)
-        title = f"Mutation Frequency vs. Chromosome Location - {vcf_path.parent.name}"
-    
-    logger.info(f"Parsing VCF file: {vcf_file}")
-    mutations = parse_vcf_frequency(vcf_file, control_sample=control_sample, min_dp=min_dp)
-    
-    if not mutations:
-        logger.warning("No mutations found in VCF file")
-        return None
-    
-    logger.info(f"Found mutations on {len(mutations)} chromosomes:")
-    for chrom, chrom_mutations in mutations.items():
-        logger.info(f"  Chromosome {chrom}: {len(chrom_mutations)} mutations")
-    
-    return create_frequency_plot(mutations, output_file, title, **kwargs)
+    data = MutationFrequencies.from_vcf(vcf_file, control_sample=control_sample, min_dp=min_dp, use_cache=use_cache)
+    return data.plot(output_file, title, show_plot=show_plot, **kwargs)
 
 def get_mutation_statistics(mutations):
     """
     Calculate summary statistics for mutations.
     
     Args:
-        mutations (dict): Dictionary with chromosome as key and list of (position, frequency) tuples as value
+        mutations (dict): Chromosome -> (positions, frequencies) arrays, or list of (position, frequency) tuples
         
     Returns:
         dict: Dictionary with summary statistics
@@ -272,11 +395,10 @@ def get_mutation_statistics(mutations):
     stats = {}
     
     for chrom, chrom_mutations in mutations.items():
-        if not chrom_mutations:
+        positions, frequencies = _mutation_arrays(chrom_mutations)
+        if positions.size == 0:
             continue
             
-        positions, frequencies = zip(*chrom_mutations)
-        
         stats[chrom] = {
             'count': len(positions),
             'mean_frequency': np.mean(frequencies),
@@ -284,8 +406,8 @@ def get_mutation_statistics(mutations):
             'max_frequency': np.max(frequencies),
             'min_frequency': np.min(frequencies),
             'std_frequency': np.std(frequencies),
-            'min_position': min(positions),
-            'max_position': max(positions)
+            'min_position': int(positions.min()),
+            'max_position': int(positions.max())
         }
     
     return stats
@@ -307,6 +429,20 @@ def main():
     parser.add_argument('--dpi', type=int, default=300, help='DPI for saved plots (default: 300)')
     parser.add_argument('--figsize', nargs=2, type=float, default=[12, 8], 
                        help='Figure size as width height (default: 12 8)')
+    parser.add_argument('--max-points', type=int, default=DEFAULT_MAX_POINTS,
+                       help=f'Draw panels with more sites as a density (hexbin), 0 to always scatter (default: {DEFAULT_MAX_POINTS})')
+    parser.add_argument('--max-panels', type=int, default=DEFAULT_MAX_PANELS,
+                       help=f'Maximum panels; smaller contigs share the last one, 0 for no limit (default: {DEFAULT_MAX_PANELS})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always re-read the VCF and do not write <vcf>.freq.npz')
+    parser.add_argument('--window', type=int,
+                       help=f'Sliding-window size in bp; draws the smoothed AF (default when windows are used: {DEFAULT_WINDOW})')
+    parser.add_argument('--step', type=int, default=DEFAULT_STEP, help=f'Window step in bp (default: {DEFAULT_STEP})')
+    parser.add_argument('--smooth', type=float, default=DEFAULT_SMOOTH,
+                       help=f'Gaussian smoothing width in windows, 0 for none (default: {DEFAULT_SMOOTH})')
+    parser.add_argument('--candidates', help='Write the top candidate intervals to this TSV')
+    parser.add_argument('--windows-out', help='Write the sliding-window table to this TSV')
+    parser.add_argument('--top', type=int, default=5, help='Number of candidate intervals to report (default: 5)')
     
     args = parser.parse_args()
     
@@ -314,24 +450,43 @@ def main():
         # Set up logging
         logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
         
+        # Parse once (or load the cached parse) for both the plot and the statistics
+        data = MutationFrequencies.from_vcf(
+            args.vcf_file,
+            control_sample=args.control,
+            min_dp=args.min_dp,
+            use_cache=not args.no_cache
+        )
+        
+        # Sliding windows and candidate intervals
+        windows = candidates = None
+        if args.window or args.candidates or args.windows_out:
+            window = args.window or DEFAULT_WINDOW
+            windows = data.windows(window, args.step, args.smooth)
+            candidates = data.candidates(window, args.step, args.smooth, top=args.top)
+            if args.windows_out:
+                windows.to_csv(args.windows_out, sep='\t', index=False, float_format='%.2f')
+            if args.candidates:
+                write_candidates(candidates, args.candidates)
+        
         # Create the plot
-        fig = plot_vcf_frequency(
-            args.vcf_file, 
+        fig = data.plot(
             output_file=args.output, 
             title=args.title,
             show_plot=not args.no_show,
-            control_sample=args.control,
-            min_dp=args.min_dp,
             dpi=args.dpi,
-            figsize=tuple(args.figsize)
+            figsize=tuple(args.figsize),
+            max_points=args.max_points or None,
+            max_panels=args.max_panels or None,
+            windows=windows,
+            candidates=candidates
         )
         
         if fig is None:
             sys.exit(1)
             
         # Print statistics
-        mutations = parse_vcf_frequency(args.vcf_file)
-        stats = get_mutation_statistics(mutations)
+        stats = data.statistics()
         
         print("\n📊 MUTATION STATISTICS:")
         print("=" * 50)
@@ -342,6 +497,13 @@ def main():
             print(f"  Max frequency: {chrom_stats['max_frequency']:.2f}%")
             print(f"  Position range: {chrom_stats['min_position']:,} - {chrom_stats['max_position']:,}")
         
+        if candidates is not None:
+            print("\n🎯 CANDIDATE INTERVALS:")
+            print("=" * 50)
+            for interval in candidates.itertuples():
+                print(f"  #{interval.rank} {interval.chrom}:{interval.start:,}-{interval.end:,}  "
+                      f"peak {interval.peak_af:.1f}% at {interval.peak_position:,} ({interval.n_snps} SNPs)")
+        
         if args.output:
             print(f"\n✅ Plot saved to: {args.output}")
             
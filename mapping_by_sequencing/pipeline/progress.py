@@ -0,0 +1,338 @@
+"""
+Follow a running workflow through its snakemake log.
+
+Snakemake writes every scheduling event to ``.snakemake/log/<time>.snakemake.log``:
+the job stats table, one block per started job (rule, jobid, timestamp) or a
+single ``Job N: <message>`` line for rules with a ``message:``, ``Finished
+jobid: N (Rule: X)`` lines, ``N of M steps`` counters and ``Error in rule``
+blocks. The monitor reads only the bytes appended since its last poll, so it
+never rebuilds the DAG or stats output files the way ``snakemake --summary``
+does, and the workflow does not notice it is being watched.
+
+Usage:
+    python -m mapping_by_sequencing.pipeline.progress runs/run_20250810_E1_vs_E19
+    python -m mapping_by_sequencing.pipeline.progress runs/run_20250810_E1_vs_E19 --once
+"""
+
+import os
+import re
+import sys
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Completions within this many seconds (log time) set the current throughput
+THROUGHPUT_WINDOW = 900
+
+TIMESTAMP = re.compile(r"^\s*\[(\w{3} \w{3} +\d+ \d\d:\d\d:\d\d \d{4})\]")
+JOB_START = re.compile(r"^\s*(?:local)?(?:rule|checkpoint) (\S+):$")
+JOB_ERROR = re.compile(r"^\s*Error in rule (\S+):$")
+JOBID = re.compile(r"^\s*jobid: (\d+)$")
+JOB_MESSAGE = re.compile(r"^\s*Job (\d+): (.*)$")
+FINISHED = re.compile(r"^Finished job(?:id:)? (\d+)(?: \(Rule: (\S+)\))?")
+RESTART = re.compile(r"^Trying to restart job (\d+)")
+STEPS = re.compile(r"^(\d+) of (\d+) steps \(")
+STATS_ROW = re.compile(r"^(\S+)\s+(\d+)$")
+RULE_DEF = re.compile(r"^\s*(?:local)?(?:rule|checkpoint) (\w+):", re.M)
+MESSAGE_DEF = re.compile(r"^\s*message:\s*f?\"([^\"]*)\"", re.M)
+
+
+def latest_log(run_dir) -> Optional[Path]:
+    """Newest snakemake log of a run directory, or None before the first run."""
+    log_dir = Path(run_dir) / ".snakemake" / "log"
+    logs = sorted(log_dir.glob("*.snakemake.log")) if log_dir.exists() else []
+    return logs[-1] if logs else None
+
+
+def snakemake_running(run_dir) -> bool:
+    """True while a snakemake process holds the run directory's lock."""
+    lock_dir = Path(run_dir) / ".snakemake" / "locks"
+    return lock_dir.exists() and any(lock_dir.iterdir())
+
+
+def message_rules(snakefile) -> List[Tuple["re.Pattern", str]]:
+    """
+    Patterns matching the ``message:`` of each rule of a Snakefile.
+
+    Jobs of these rules are logged as ``Job N: <message>`` without the rule
+    name; every ``{...}`` placeholder of the message matches any text.
+    """
+    try:
+        text = Path(snakefile).read_text()
+    except OSError:
+        return []
+    rules = list(RULE_DEF.finditer(text))
+    patterns = []
+    for rule, following in zip(rules, rules[1:] + [None]):
+        body = text[rule.end():following.start() if following else len(text)]
+        message = MESSAGE_DEF.search(body)
+        if message:
+            parts = re.split(r"\{[^}]*\}", message.group(1))
+            patterns.append((re.compile(".*?".join(re.escape(part) for part in parts) + "$"), rule.group(1)))
+    return patterns
+
+
+class LogFollower:
+    """Returns the complete lines appended to a file since the previous call."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offset = 0
+        self.partial = b""
+
+    def read_lines(self) -> List[str]:
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        self.offset += len(data)
+        data = self.partial + data
+        cut = data.rfind(b"\n") + 1
+        self.partial = data[cut:]
+        return data[:cut].decode(errors="replace").splitlines()
+
+
+class WorkflowProgress:
+    """
+    Per-rule job counts, durations and throughput built from snakemake log lines.
+
+    Feed lines in order with ``feed``; times are the log's own timestamps, so a
+    finished log gives the same numbers as following it live. ``messages``
+    (from ``message_rules``) names the rule of a ``Job N: <message>`` start;
+    without a match the job runs under ``?`` until its ``Finished`` line
+    names the rule.
+    """
+
+    def __init__(self, messages: Optional[List[Tuple["re.Pattern", str]]] = None):
+        self.messages = messages or []
+        self.totals: "OrderedDict[str, int]" = OrderedDict()
+        self.done: Counter = Counter()
+        self.running: Dict[int, Tuple[str, Optional[datetime]]] = {}
+        self.failed: Dict[int, str] = {}
+        self.durations: Dict[str, List[float]] = {}
+        self.steps_done = 0
+        self.steps_total: Optional[int] = None
+        self.started_at: Optional[datetime] = None
+        self.last_time: Optional[datetime] = None
+        self.completions: deque = deque()
+        self.status = "running"
+        self._block: Optional[Tuple[str, str]] = None
+        self._in_stats = False
+        self._jobs: Dict[int, str] = {}
+
+    def feed(self, line: str):
+        match = TIMESTAMP.match(line)
+        if match:
+            self.last_time = datetime.strptime(match.group(1), "%a %b %d %H:%M:%S %Y")
+            if self.started_at is None:
+                self.started_at = self.last_time
+            return
+
+        if line.startswith("Job stats:"):
+            self._in_stats, self.totals = True, OrderedDict()
+            return
+        if self._in_stats:
+            match = STATS_ROW.match(line.strip())
+            if match and match.group(1) != "job":
+                if match.group(1) == "total":
+                    self.steps_total = self.steps_total or int(match.group(2))
+                else:
+                    self.totals[match.group(1)] = int(match.group(2))
+            elif not line.strip():
+                self._in_stats = False
+            return
+
+        match = JOB_START.match(line)
+        if match:
+            self._block = ("start", match.group(1))
+            return
+        match = JOB_ERROR.match(line)
+        if match:
+            self._block = ("error", match.group(1))
+            return
+        match = JOBID.match(line)
+        if match and self._block:
+            kind, rule = self._block
+            jobid = int(match.group(1))
+            self._jobs[jobid] = rule
+            if kind == "start":
+                self.running[jobid] = (rule, self.last_time)
+            else:
+                self.running.pop(jobid, None)
+                self.failed[jobid] = rule
+            self._block = None
+            return
+
+        match = JOB_MESSAGE.match(line)
+        if match:
+            jobid = int(match.group(1))
+            rule = next((rule for pattern, rule in self.messages if pattern.match(match.group(2))), "?")
+            self._jobs[jobid] = rule
+            self.running[jobid] = (rule, self.last_time)
+            return
+
+        match = FINISHED.match(line)
+        if match:
+            jobid = int(match.group(1))
+            rule, start = self.running.pop(jobid, (self._jobs.get(jobid, "?"), None))
+            rule = match.group(2) or rule
+            self.done[rule] += 1
+            if start is not None and self.last_time is not None:
+                self.durations.setdefault(rule, []).append((self.last_time - start).total_seconds())
+            if self.last_time is not None:
+                self.completions.append(self.last_time)
+            return
+        match = STEPS.match(line)
+        if match:
+            self.steps_done, self.steps_total = int(match.group(1)), int(match.group(2))
+            return
+        match = RESTART.match(line)
+        if match:
+            jobid = int(match.group(1))
+            rule = self.failed.pop(jobid, self._jobs.get(jobid, "?"))
+            self.running[jobid] = (rule, self.last_time)
+            return
+
+        if line.startswith("Exiting because a job execution failed"):
+            self.status = "failed"
+        elif line.startswith("Nothing to be done"):
+            self.status = "complete"
+        elif line.startswith("Complete log") and self.status == "running":
+            self.status = "failed" if self.failed else "complete"
+
+    def throughput(self) -> Optional[float]:
+        """Jobs finished per second over the last THROUGHPUT_WINDOW seconds of log time."""
+        if not self.completions or self.last_time is None:
+            return None
+        while self.completions and (self.last_time - self.completions[0]).total_seconds() > THROUGHPUT_WINDOW:
+            self.completions.popleft()
+        since = max(self.started_at, self.last_time - timedelta(seconds=THROUGHPUT_WINDOW))
+        span = (self.last_time - since).total_seconds()
+        return len(self.completions) / span if span > 0 and self.completions else None
+
+    def eta(self) -> Optional[timedelta]:
+        """Remaining steps at the current throughput."""
+        rate = self.throughput()
+        if not rate or self.steps_total is None:
+            return None
+        return timedelta(seconds=int((self.steps_total - self.steps_done) / rate))
+
+    def render(self, title: str = "") -> str:
+        """Summary line plus one row per rule."""
+        total = self.steps_total or sum(self.totals.values())
+        percent = f" ({100 * self.steps_done / total:.0f}%)" if total else ""
+        rate, eta = self.throughput(), self.eta()
+        head = [f"{self.steps_done}/{total or '?'} steps{percent}", f"{len(self.running)} running",
+                f"{len(self.failed)} failed"]
+        if rate:
+            head.append(f"{rate * 60:.1f} jobs/min")
+        if self.status == "running" and eta is not None:
+            head.append(f"ETA {eta}")
+        elif self.status != "running":
+            head.append(self.status)
+        lines = [(f"📈 {title}: " if title else "📈 ") + " | ".join(head)]
+
+        running = Counter(rule for rule, _ in self.running.values())
+        failed = Counter(self.failed.values())
+        rules = list(self.totals) + [r for r in list(self.done) + list(running) + list(failed) if r not in self.totals]
+        rows = [("rule", "done", "running", "failed", "avg time")]
+        for rule in dict.fromkeys(rules):
+            durations = self.durations.get(rule)
+            avg = str(timedelta(seconds=int(sum(durations) / len(durations)))) if durations else "-"
+            rows.append((rule, f"{self.done[rule]}/{self.totals.get(rule, '?')}", str(running[rule]),
+                         str(failed[rule]), avg))
+        widths = [max(len(row[i]) for row in rows) for i in range(5)]
+        for row in rows:
+            lines.append("   " + "  ".join(cell.ljust(w) if i == 0 else cell.rjust(w)
+                                            for i, (cell, w) in enumerate(zip(row, widths))))
+        return "\n".join(lines)
+
+
+def watch(run_dir, interval: float = 2.0, once: bool = False, stream=None) -> Optional[WorkflowProgress]:
+    """
+    Follow the newest snakemake log of a run until the workflow ends.
+
+    On a terminal the table is redrawn in place; otherwise it is printed again
+    only when it changes. A newer log (snakemake restarted) starts a new count.
+
+    Args:
+        run_dir (str): Run directory
+        interval (float): Seconds between reads of the log
+        once (bool): Print the current state and return
+
+    Returns:
+        WorkflowProgress: The final state, or None if no log was found
+    """
+    stream = stream or sys.stdout
+    run_dir = Path(run_dir)
+    redraw = stream.isatty()
+    log, follower, progress, shown = None, None, None, None
+    waiting = False
+    last_growth = time.monotonic()
+    while True:
+        newest = latest_log(run_dir)
+        if newest is None:
+            if once:
+                print(f"No snakemake log in {run_dir} yet", file=stream)
+                return None
+            if not waiting:
+                print(f"⏳ Waiting for snakemake to start in {run_dir}", file=stream, flush=True)
+                waiting = True
+            time.sleep(interval)
+            continue
+        if newest != log:
+            log, follower = newest, LogFollower(newest)
+            progress = WorkflowProgress(message_rules(run_dir / "Snakefile"))
+        lines = follower.read_lines()
+        if lines:
+            last_growth = time.monotonic()
+        for line in lines:
+            progress.feed(line)
+
+        text = progress.render(run_dir.resolve().name)
+        if text != shown:
+            if redraw and shown is not None:
+                # Move back over the previous table and clear to the end of the screen
+                stream.write(f"\033[{shown.count(chr(10)) + 1}F\033[J")
+            print(text, file=stream, flush=True)
+            shown = text
+        if once or progress.status != "running":
+            return progress
+        # No lock while the DAG is still being built, so only trust it once the log has gone quiet
+        if not snakemake_running(run_dir) and time.monotonic() - last_growth > max(10, 3 * interval) \
+                and latest_log(run_dir) == log:
+            print("⚠️  snakemake is no longer running (killed or interrupted)", file=stream)
+            return progress
+        time.sleep(interval)
+
+
+def main():
+    """
+    Command-line interface: follow the progress of a run directory.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Follow snakemake progress from its log (per-rule counts, throughput, ETA)')
+    parser.add_argument('run_dir', help='Run directory (contains .snakemake/log)')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between log reads (default: 2)')
+    parser.add_argument('--once', action='store_true', help='Print the current state and exit')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.run_dir):
+        print(f"❌ Run directory not found: {args.run_dir}")
+        sys.exit(1)
+    try:
+        progress = watch(args.run_dir, interval=args.interval, once=args.once)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching.")
+        return
+    if progress is not None and progress.status == "failed":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Reference preparation shared by all runs.
+
+Files derived from a reference FASTA in data/reference_genomes (samtools .fai
+and .dict, the bwa index and the contig map) are built once per FASTA
+checksum and recorded in ``<fasta>.prepared.json``. Builds hold
+``<fasta>.lock``, so runs started together wait for a single build instead
+of writing the same index concurrently, and every output is written under a
+temporary name and renamed into place.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .cache import file_lock
+from .contigs import reference_contig_map
+
+logger = logging.getLogger(__name__)
+
+# Bump when a build command changes so existing indexes are rebuilt
+REFERENCE_VERSION = 1
+
+INDEX_STEPS = ["faidx", "dict", "bwa", "contig_map"]
+# .amb last: it is the file the Snakefile depends on, so it must appear only once the rest is in place
+BWA_EXTENSIONS = [".ann", ".bwt", ".pac", ".sa", ".amb"]
+FASTA_SUFFIXES = (".fa", ".fna", ".fasta", ".fa.gz", ".fna.gz", ".fasta.gz")
+
+
+def index_files(fasta: Path, step: str) -> List[Path]:
+    """Files produced by one preparation step."""
+    fasta = Path(fasta)
+    if step == "faidx":
+        return [fasta.with_name(fasta.name + ".fai")]
+    if step == "dict":
+        # samtools and picard look for genome.dict next to genome.fa(.gz)
+        plain = fasta.with_suffix("") if fasta.suffix == ".gz" else fasta
+        return [plain.with_suffix(".dict")]
+    if step == "bwa":
+        return [fasta.with_name(fasta.name + ext) for ext in BWA_EXTENSIONS]
+    if step == "contig_map":
+        return [fasta.with_name(fasta.name + ".contig_map.tsv")]
+    raise ValueError(f"Unknown reference preparation step: {step} (choose from {', '.join(INDEX_STEPS)})")
+
+
+def _run_tool(cmd: List[str]):
+    if shutil.which(cmd[0]) is None:
+        raise RuntimeError(f"{cmd[0]} not found; activate the pipeline environment (conda activate mbs)")
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"{' '.join(cmd)} failed with exit code {result.returncode}:\n{tail}")
+
+
+def _build(fasta: Path, step: str):
+    """Run one step into temporary files and move them into place."""
+    tmp = fasta.with_name(f".{fasta.name}.{step}.tmp{os.getpid()}")
+    outputs = index_files(fasta, step)
+    try:
+        if step == "faidx":
+            _run_tool(["samtools", "faidx", str(fasta), "--fai-idx", str(tmp)])
+            os.replace(tmp, outputs[0])
+        elif step == "dict":
+            _run_tool(["samtools", "dict", "-o", str(tmp), str(fasta)])
+            os.replace(tmp, outputs[0])
+        elif step == "bwa":
+            _run_tool(["bwa", "index", "-p", str(tmp), str(fasta)])
+            for ext, output in zip(BWA_EXTENSIONS, outputs):
+                os.replace(f"{tmp}{ext}", output)
+        elif step == "contig_map":
+            # Written atomically and keyed by checksum by the contigs module itself
+            reference_contig_map(fasta)
+    finally:
+        for leftover in fasta.parent.glob(tmp.name + "*"):
+            leftover.unlink()
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_file(fasta: Path) -> Path:
+    return Path(fasta).with_name(Path(fasta).name + ".prepared.json")
+
+
+def _load_manifest(fasta: Path) -> Dict:
+    path = manifest_file(fasta)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(fasta: Path, manifest: Dict):
+    path = manifest_file(fasta)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def prepare_reference(fasta, steps: Optional[List[str]] = None, force: bool = False,
+                      on_wait: Optional[Callable[[], None]] = None) -> List[str]:
+    """
+    Build the derived files of a reference FASTA that are missing or stale.
+
+    A step is current when its files exist and were built from a FASTA with
+    the same checksum. Files found without a record (indexes made before this
+    manifest existed) are adopted when newer than the FASTA. Current files
+    older than the FASTA (same content, touched or copied) get their mtime
+    refreshed so snakemake does not schedule a rebuild.
+
+    Args:
+        fasta (str): Reference FASTA path
+        steps (list): Steps to check (default: all of ``INDEX_STEPS``)
+        force (bool): Rebuild even if current
+        on_wait (callable): Called once if another process holds the lock
+
+    Returns:
+        list: The steps that were built
+    """
+    fasta = Path(fasta)
+    if not fasta.exists():
+        raise FileNotFoundError(f"Reference FASTA not found: {fasta}")
+    steps = list(steps or INDEX_STEPS)
+    for step in steps:
+        index_files(fasta, step)
+
+    built = []
+    with file_lock(fasta.with_name(fasta.name + ".lock"), on_wait=on_wait):
+        manifest = _load_manifest(fasta)
+        st = fasta.stat()
+        if manifest.get("size") == st.st_size and manifest.get("mtime_ns") == st.st_mtime_ns and manifest.get("sha256"):
+            checksum = manifest["sha256"]
+        else:
+            checksum = _sha256(fasta)
+        # Indexes found on a reference never prepared before may be adopted
+        adoptable = not manifest
+        if manifest.get("version") != REFERENCE_VERSION or manifest.get("sha256") != checksum:
+            # New reference content: forget what was built before
+            manifest = {"indexes": {}}
+        indexes = manifest.setdefault("indexes", {})
+
+        for step in steps:
+            outputs = index_files(fasta, step)
+            present = all(path.exists() for path in outputs)
+            entry = indexes.get(step)
+            adopt = entry is None and adoptable and present and \
+                all(path.stat().st_mtime_ns >= st.st_mtime_ns for path in outputs)
+            if not force and present and (entry is not None or adopt):
+                if adopt:
+                    indexes[step] = {"built": "adopted", "files": [p.name for p in outputs]}
+                now = datetime.now().timestamp()
+                for path in outputs:
+                    if path.stat().st_mtime_ns < st.st_mtime_ns:
+                        os.utime(path, (now, now))
+                continue
+            logger.info(f"Building {step} for {fasta.name}")
+            _build(fasta, step)
+            indexes[step] = {"built": datetime.now().isoformat(timespec="seconds"),
+                             "files": [p.name for p in outputs]}
+            built.append(step)
+
+        manifest.update({"version": REFERENCE_VERSION, "sha256": checksum,
+                         "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+        _write_manifest(fasta, manifest)
+    return built
+
+
+def find_references(reference_dir) -> List[Path]:
+    """FASTA files in a reference directory."""
+    reference_dir = Path(reference_dir)
+    if not reference_dir.exists():
+        return []
+    return sorted(p for p in reference_dir.iterdir() if p.is_file() and p.name.endswith(FASTA_SUFFIXES))
+
+
+def main():
+    """
+    Command-line interface: prepare one or more reference FASTAs.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build bwa/samtools indexes and the contig map of reference FASTAs')
+    parser.add_argument('fasta', nargs='+', help='Reference FASTA file(s)')
+    parser.add_argument('--only', nargs='+', choices=INDEX_STEPS, help='Only these steps (default: all)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if current')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    for fasta in args.fasta:
+        try:
+            built = prepare_reference(fasta, steps=args.only, force=args.force,
+                                      on_wait=lambda: print(f"⏳ Waiting for another process preparing {fasta}", flush=True))
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ {fasta}: " + (f"built {', '.join(built)}" if built else "up to date"))
+
+
+if __name__ == "__main__":
+    main()
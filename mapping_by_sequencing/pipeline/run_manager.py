@@ -5,10 +5,18 @@ Simple Mapping-by-sequencing Pipeline Run Manager
 Usage:
     python scripts/run_manager.py configure E1 E19
     python scripts/run_manager.py run run_20250810_E1_vs_E19
+    python scripts/run_manager.py run run_20250810_E1_vs_E19 --preview 5x
+    python scripts/run_manager.py add-sample run_20250810_E1_vs_E19 E20
+    python scripts/run_manager.py batch E1:E19,E20 E1:E21 --cores 32
     python scripts/run_manager.py list
+    python scripts/run_manager.py watch run_20250810_E1_vs_E19
+    python scripts/run_manager.py prepare-reference
+    python scripts/run_manager.py plot --jobs 8
+    python scripts/run_manager.py perf run_20250810_E1_vs_E19
 """
 
 import argparse
+import importlib.util
 import os
 import shutil
 import subprocess
@@ -20,6 +28,14 @@ import pandas as pd
 import yaml
 from typing import Optional
 
+from mapping_by_sequencing.pipeline.cache import IntermediateCache, run_intermediates, restore_run, store_run
+from mapping_by_sequencing.pipeline.cluster import EXECUTORS, write_profile
+from mapping_by_sequencing.pipeline.config_parsers import check_tmp_dir, mem_to_mb, read_engine, trimmomatic_to_fastp
+from mapping_by_sequencing.pipeline.perf import perf_report
+from mapping_by_sequencing.pipeline.progress import latest_log, watch as watch_progress
+from mapping_by_sequencing.pipeline.reference import INDEX_STEPS, find_references, prepare_reference
+from mapping_by_sequencing.pipeline.subsample import parse_preview, preview_fractions
+
 
 class RunManager:
     def __init__(self):
@@ -40,48 +56,37 @@ class RunManager:
         self.runs_dir = self.repo_root / "runs"
         self.templates_dir = self.repo_root / "templates"
         self.master_data_dir = self.repo_root / "data"
+        self.cache_dir = self.repo_root / "cache"
         
         # Create runs directory if it doesn't exist
         self.runs_dir.mkdir(exist_ok=True)
     
-    def configure_run(self, control_sample: str, mutant1: str, mutant2: str):
-        """Configure a new run: control_sample=control, mutant1=mutated, mutant2=mutated"""
-        print(f"🔍 Configuring run: {control_sample} (control) vs {mutant1} (mutant1) vs {mutant2} (mutant2)")
+    def configure_run(self, control_sample: str, mutants: list, name: Optional[str] = None):
+        """Configure a new run: control_sample=control, mutants=one or more mutated samples"""
+        mutants = list(dict.fromkeys(mutants))
+        print(f"🔍 Configuring run: {control_sample} (control) vs " +
+              " vs ".join(f"{m} (mutant{i})" for i, m in enumerate(mutants, 1)))
         
-        # Load sample mapping
-        sample_mapping_file = self.master_data_dir / "sample_mapping.yaml"
-        if not sample_mapping_file.exists():
-            print("❌ Sample mapping file not found")
+        # Load sample mapping and validate samples exist in it
+        sample_mapping = self._load_sample_mapping()
+        available_samples = list(sample_mapping.keys())
+        
+        if control_sample not in available_samples:
+            print(f"❌ Control sample '{control_sample}' not found")
+            print(f"Available: {', '.join(available_samples)}")
             sys.exit(1)
         
-        try:
-            with open(sample_mapping_file, 'r') as f:
-                sample_mapping = yaml.safe_load(f)
-            
-            # Validate samples exist in mapping
-            available_samples = list(sample_mapping.keys())
-            
-            if control_sample not in available_samples:
-                print(f"❌ Control sample '{control_sample}' not found")
-                print(f"Available: {', '.join(available_samples)}")
-                sys.exit(1)
-            
-            if mutant1 not in available_samples:
-                print(f"❌ Mutant sample 1 '{mutant1}' not found")
+        for i, mutant in enumerate(mutants, 1):
+            if mutant not in available_samples:
+                print(f"❌ Mutant sample {i} '{mutant}' not found")
                 print(f"Available: {', '.join(available_samples)}")
                 sys.exit(1)
-                
-            if mutant2 not in available_samples:
-                print(f"❌ Mutant sample 2 '{mutant2}' not found")
-                print(f"Available: {', '.join(available_samples)}")
+            if mutant == control_sample:
+                print(f"❌ Sample '{mutant}' cannot be both control and mutant")
                 sys.exit(1)
-                
-        except Exception as e:
-            print(f"❌ Error reading sample mapping: {e}")
-            sys.exit(1)
         
         # Generate run name
-        run_name = f"run_{datetime.now().strftime('%Y%m%d')}_{control_sample}_vs_{mutant1}_vs_{mutant2}"
+        run_name = f"run_{datetime.now().strftime('%Y%m%d')}_{name or '_vs_'.join([control_sample] + mutants)}"
         run_dir = self.runs_dir / run_name
         
         if run_dir.exists():
@@ -106,6 +111,7 @@ class RunManager:
             with open(config_template, 'r') as f:
                 config = yaml.safe_load(f)
             config['workdir'] = str(run_dir)
+            self._check_read_processing(config)
             
             with open(run_dir / "config.yaml", 'w') as f:
                 yaml.dump(config, f, default_flow_style=False)
@@ -114,35 +120,21 @@ class RunManager:
             print("❌ Config template not found")
             sys.exit(1)
         
-        # Create run-specific datasets.tab using actual sample names (e.g., E1/E19/E20)
-        run_datasets = pd.DataFrame({
-            'sample': [control_sample, mutant1, mutant2],
-            'sample_type': ['control', 'mutated', 'mutated'],
-            'library': [1, 1, 1],
-            'R1': [
-                str(self.repo_root / "data" / "reads" / sample_mapping[control_sample]['R1']),
-                str(self.repo_root / "data" / "reads" / sample_mapping[mutant1]['R1']),
-                str(self.repo_root / "data" / "reads" / sample_mapping[mutant2]['R1'])
-            ],
-            'R2': [
-                str(self.repo_root / "data" / "reads" / sample_mapping[control_sample]['R2']),
-                str(self.repo_root / "data" / "reads" / sample_mapping[mutant1]['R2']),
-                str(self.repo_root / "data" / "reads" / sample_mapping[mutant2]['R2'])
-            ]
-        })
-
+        # Create run-specific datasets.tab using actual sample names (e.g., E1/E19/E20),
+        # one row per library/lane listed in sample_mapping.yaml
+        run_datasets = self._sample_datasets(sample_mapping, [control_sample] + mutants, controls={control_sample})
         run_datasets.to_csv(run_dir / "datasets.tab", sep='\t', index=False)
-        print(f"📊 Created datasets.tab (control={control_sample}, mutant1={mutant1}, mutant2={mutant2})")
+        n_libraries = run_datasets.groupby('sample', sort=False).size()
+        print(f"📊 Created datasets.tab (control={control_sample}, mutants={','.join(mutants)}; "
+              f"{len(run_datasets)} libraries)")
         
         # Create summary
         summary = f"""# Run Summary: {run_name}
 Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 Samples:
-- {control_sample} (control)
-- {mutant1} (mutant1)
-- {mutant2} (mutant2)
-
+- {control_sample} (control, {n_libraries[control_sample]} library/libraries)
+""" + "".join(f"- {m} (mutant{i}, {n_libraries[m]} library/libraries)\n" for i, m in enumerate(mutants, 1)) + f"""
 To run: mbs run {run_name}
 """
         
@@ -151,12 +143,244 @@ To run: mbs run {run_name}
         
         print(f"✅ Configured run: {run_name}")
         print(f"🚀 To run: mbs run {run_name}")
+
+    def add_samples(self, run_name: str, samples: list):
+        """Add mutants to a configured run by appending their libraries to its datasets.tab.
+
+        Snakemake then only trims, maps and calls the new samples: the control's and the other
+        mutants' outputs are untouched, and the cache restores whatever another run already
+        computed. bcftools merge rebuilds all_vs_<ctrl>.vcf from the per-sample VCFs (cheap),
+        and snpEff only annotates sites missing from all_vs_<ctrl>_ann.sites.tsv.gz.
+        """
+        run_dir = self.runs_dir / run_name
+        if not run_dir.exists():
+            print(f"❌ Run not found: {run_name}")
+            sys.exit(1)
+        if (run_dir / "combinations.tab").exists():
+            print(f"❌ {run_name} is a batch; configure the new combination with mbs batch instead")
+            sys.exit(1)
+
+        samples = list(dict.fromkeys(samples))
+        sample_mapping = self._load_sample_mapping()
+        datasets = pd.read_table(run_dir / "datasets.tab", sep="\t", comment='#')
+        existing = list(dict.fromkeys(datasets['sample'].astype(str)))
+        control = datasets.loc[datasets['sample_type'] == 'control', 'sample'].astype(str).iloc[0]
+        for sample in samples:
+            if sample not in sample_mapping:
+                print(f"❌ Sample '{sample}' not found")
+                print(f"Available: {', '.join(sample_mapping.keys())}")
+                sys.exit(1)
+            if sample == control:
+                print(f"❌ Sample '{sample}' is the control of {run_name}")
+                sys.exit(1)
+            if sample in existing:
+                print(f"❌ Sample '{sample}' is already in {run_name}")
+                sys.exit(1)
+
+        with open(run_dir / "config.yaml", 'r') as f:
+            config = yaml.safe_load(f) or {}
+        if config.get('variant_calling', {}).get('mode') == 'joint':
+            print("⚠️  Joint calling: the shared mpileup is recomputed over all samples")
+        if "pipeline.annotation" not in (run_dir / "Snakefile").read_text():
+            print("⚠️  The run's Snakefile predates incremental annotation; snpEff re-annotates every site "
+                  "(copy templates/Snakefile.template to runs/<run>/Snakefile to update it)")
+
+        new_datasets = self._sample_datasets(sample_mapping, samples, controls=set())
+        new_datasets.to_csv(run_dir / "datasets.tab", sep='\t', index=False, header=False, mode='a')
+        n_libraries = new_datasets.groupby('sample', sort=False).size()
+
+        with open(run_dir / "run_summary.txt", 'a') as f:
+            f.write(f"\nAdded {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}:\n" +
+                    "".join(f"- {s} (mutant{i}, {n_libraries[s]} library/libraries)\n"
+                            for i, s in enumerate(samples, len(existing))))
+
+        print(f"📊 Added {', '.join(samples)} to datasets.tab ({len(new_datasets)} libraries); "
+              f"{run_name} now has {len(existing) + len(samples) - 1} mutant(s)")
+        print(f"✅ Updated run: {run_name}")
+
+    def _run_cache(self, run_dir: Path):
+        """Shared intermediate cache and the run's cacheable items, or (None, []) if disabled."""
+        with open(run_dir / "config.yaml", 'r') as f:
+            config = yaml.safe_load(f)
+        cache_config = config.get('cache', {})
+        if not cache_config.get('enabled', True):
+            return None, []
+        reference = self.master_data_dir / "reference_genomes" / config['ref_genome']
+        if not reference.exists():
+            return None, []
+        max_size_gb = cache_config.get('max_size_gb')
+        cache = IntermediateCache(self.cache_dir, int(max_size_gb * 1024**3) if max_size_gb else None)
+        return cache, run_intermediates(cache, run_dir, config, reference)
+
+    def prepare_reference(self, references: Optional[list] = None, steps: Optional[list] = None, force: bool = False):
+        """Build missing bwa/samtools indexes and contig maps of references (default: all in data/reference_genomes)"""
+        reference_dir = self.master_data_dir / "reference_genomes"
+        if references:
+            paths = [Path(r) if Path(r).exists() else reference_dir / r for r in references]
+        else:
+            paths = find_references(reference_dir)
+        if not paths:
+            print(f"❌ No reference FASTA found in {reference_dir}")
+            sys.exit(1)
+        
+        for path in paths:
+            print(f"🧬 Preparing reference: {path.name}")
+            try:
+                built = prepare_reference(path, steps=steps, force=force,
+                                          on_wait=lambda: print(f"⏳ Another process is preparing {path.name}; waiting...", flush=True))
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+            print(f"✅ {path.name}: " + (f"built {', '.join(built)}" if built else "all indexes up to date"))
     
-    def run_pipeline(self, run_name: str, cores: Optional[int] = None):
+    @staticmethod
+    def _check_read_processing(config: dict):
+        """Fail before snakemake starts if the read_processing section cannot be run."""
+        if read_engine(config) != "fastp":
+            return
+        trimmomatic = config.get('read_processing', {}).get('trimmomatic', {})
+        try:
+            trimmomatic_to_fastp(trimmomatic.get('processing_options'), trimmomatic.get('options'))
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    def _load_sample_mapping(self) -> dict:
+        sample_mapping_file = self.master_data_dir / "sample_mapping.yaml"
+        if not sample_mapping_file.exists():
+            print("❌ Sample mapping file not found")
+            sys.exit(1)
+        try:
+            with open(sample_mapping_file, 'r') as f:
+                return yaml.safe_load(f)
+        except Exception as e:
+            print(f"❌ Error reading sample mapping: {e}")
+            sys.exit(1)
+
+    def _sample_datasets(self, sample_mapping: dict, samples: list, controls: set) -> pd.DataFrame:
+        """datasets.tab rows for samples, one per library.
+
+        A sample_mapping.yaml entry is either {R1, R2} (one library) or a list of
+        {R1, R2} entries, one per lane/library, optionally naming it with 'library'
+        (default: position in the list, from 1).
+        """
+        rows = []
+        for sample in samples:
+            entry = sample_mapping[sample]
+            libraries = entry if isinstance(entry, list) else [entry]
+            for i, lib in enumerate(libraries, 1):
+                if not isinstance(lib, dict) or 'R1' not in lib or 'R2' not in lib:
+                    print(f"❌ Sample '{sample}' library {i}: expected R1 and R2 in sample_mapping.yaml")
+                    sys.exit(1)
+                rows.append({
+                    'sample': sample,
+                    'sample_type': 'control' if sample in controls else 'mutated',
+                    'library': lib.get('library', i),
+                    'R1': str(self.repo_root / "data" / "reads" / lib['R1']),
+                    'R2': str(self.repo_root / "data" / "reads" / lib['R2']),
+                })
+        datasets = pd.DataFrame(rows, columns=['sample', 'sample_type', 'library', 'R1', 'R2'])
+        duplicated = datasets[datasets.duplicated(['sample', 'library'])]
+        if not duplicated.empty:
+            print(f"❌ Duplicate library names for: {', '.join(duplicated['sample'].unique())}")
+            sys.exit(1)
+        return datasets
+
+    @staticmethod
+    def parse_combination(spec: str) -> tuple:
+        """Parse 'CONTROL:MUTANT[,MUTANT...]' into (control, [mutants])."""
+        control, sep, mutants = spec.partition(':')
+        mutants = [m for m in mutants.split(',') if m]
+        if not sep or not control or not mutants:
+            print(f"❌ Invalid combination '{spec}' (expected CONTROL:MUTANT[,MUTANT...])")
+            sys.exit(1)
+        return control, mutants
+
+    def configure_batch(self, combinations: list, name: Optional[str] = None) -> str:
+        """Configure one run directory holding several control/mutant combinations.
+
+        All samples go into a single datasets.tab and the combinations into combinations.tab,
+        so the Snakefile builds one DAG: every sample is trimmed, mapped and called once, and
+        each combination gets its own results/final/<combination> directory.
+        """
+        sample_mapping = self._load_sample_mapping()
+        combinations = list(dict.fromkeys((ctrl, tuple(mutants)) for ctrl, mutants in combinations))
+        samples = list(dict.fromkeys(s for ctrl, mutants in combinations for s in (ctrl, *mutants)))
+        missing = [s for s in samples if s not in sample_mapping]
+        if missing:
+            print(f"❌ Samples not found: {', '.join(missing)}")
+            print(f"Available: {', '.join(sample_mapping.keys())}")
+            sys.exit(1)
+        controls = {ctrl for ctrl, _ in combinations}
+
+        batch_name = f"batch_{datetime.now().strftime('%Y%m%d')}_{name or f'{len(combinations)}combinations'}"
+        run_dir = self.runs_dir / batch_name
+        if run_dir.exists():
+            print(f"❌ Run already exists: {batch_name}")
+            sys.exit(1)
+
+        print(f"🔍 Configuring batch: {len(combinations)} combination(s) over {len(samples)} sample(s)")
+        run_dir.mkdir(parents=True)
+        snakefile_template = self.templates_dir / "Snakefile.template"
+        config_template = self.templates_dir / "config.yaml.template"
+        if not snakefile_template.exists() or not config_template.exists():
+            print("❌ Snakefile or config template not found")
+            sys.exit(1)
+        shutil.copy2(snakefile_template, run_dir / "Snakefile")
+        with open(config_template, 'r') as f:
+            config = yaml.safe_load(f)
+        config['workdir'] = str(run_dir)
+        self._check_read_processing(config)
+        if config.get('variant_calling', {}).get('mode') == 'joint':
+            print("⚠️  Joint calling is per combination; using per_sample calling for the batch")
+            config['variant_calling']['mode'] = 'per_sample'
+        with open(run_dir / "config.yaml", 'w') as f:
+            yaml.dump(config, f, default_flow_style=False)
+
+        self._sample_datasets(sample_mapping, samples, controls).to_csv(run_dir / "datasets.tab", sep='\t', index=False)
+
+        names = [f"{ctrl}_vs_{'_vs_'.join(mutants)}" for ctrl, mutants in combinations]
+        pd.DataFrame({
+            'combination': names,
+            'control': [ctrl for ctrl, _ in combinations],
+            'mutants': [','.join(mutants) for _, mutants in combinations],
+        }).to_csv(run_dir / "combinations.tab", sep='\t', index=False)
+
+        summary = f"""# Run Summary: {batch_name}
+Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+Combinations (results/final/<combination>):
+""" + "".join(f"- {n}\n" for n in names) + f"""
+Samples: {', '.join(samples)}
+
+To run: mbs run {batch_name}
+"""
+        with open(run_dir / "run_summary.txt", 'w') as f:
+            f.write(summary)
+
+        print(f"✅ Configured batch: {batch_name}")
+        return batch_name
+
+    def run_pipeline(self, run_name: str, cores: Optional[int] = None, use_cache: bool = True,
+                     mem_mb: Optional[int] = None, tmp_disk_mb: Optional[int] = None,
+                     executor: str = "local", jobs: Optional[int] = None,
+                     preview: Optional[tuple] = None, seed: int = 0):
         """Run the pipeline for a configured run.
 
-        If progress=True, show a simple tqdm progress bar by polling snakemake summaries while the
-        workflow is running. This does not slow down the pipeline but provides a task-level view.
+        Follow a running pipeline from another terminal with `mbs watch <run>`.
+
+        With use_cache, trimmed reads, merged BAMs and per-sample VCFs found in the shared cache
+        (repo_root/cache) are restored before snakemake starts, and new ones are stored afterwards.
+        mem_mb and tmp_disk_mb cap the summed mem_mb / disk_mb (scratch under $TMP) of concurrently
+        running jobs (snakemake --resources); they default to the node's physical memory and the
+        free space of $TMP (or /tmp).
+
+        snakemake is started with a profile written to runs/<run>/profiles/<executor>. With
+        executor="slurm" every job is submitted with sbatch (at most `jobs` at a time, default
+        cluster.max_jobs in config.yaml) and the budgets only apply when given.
+
+        preview, from parse_preview ("fraction", 0.05) or ("coverage", 5), runs the whole
+        pipeline on subsampled reads in runs/<run>/results_preview instead; see _setup_preview.
         """
         run_dir = self.runs_dir / run_name
         if not run_dir.exists():
@@ -169,25 +393,74 @@ To run: mbs run {run_name}
         # Determine cores to use
         max_cores = os.cpu_count() or 1
         selected_cores = cores if cores and cores > 0 else max_cores
-        print(f"🔧 Using {selected_cores} cores")
         
         # Invoke snakemake directly; expect the user to have activated the conda env (mbs)
         command_base = ["snakemake"]
         if shutil.which("snakemake") is None:
             print("❌ snakemake not found. Please 'conda activate mbs' and try again.")
             sys.exit(1)
+        if executor == "slurm":
+            if shutil.which("sbatch") is None:
+                print("❌ sbatch not found: --executor slurm needs a SLURM submit host")
+                sys.exit(1)
+            if importlib.util.find_spec("snakemake_executor_plugin_cluster_generic") is None:
+                print("❌ snakemake-executor-plugin-cluster-generic not installed (conda env update -n mbs -f envs/mbs.yaml)")
+                sys.exit(1)
 
         def run_sm(args: list[str], capture: bool = False):
             if capture:
                 return subprocess.run(command_base + args, cwd=run_dir, check=False, capture_output=True, text=True)
             return subprocess.run(command_base + args, cwd=run_dir, check=False)
 
-        # If progress is requested, pre-compute total steps from dryrun
-        total_tasks: Optional[int] = None
-        bar = None
+        # Shared reference indexes are built (or waited for) under a lock before snakemake
+        # starts, so concurrent runs never schedule their own index builds
+        with open(run_dir / "config.yaml", 'r') as f:
+            run_config = yaml.safe_load(f) or {}
+        self._check_read_processing(run_config)
+        ref_genome = run_config.get('ref_genome')
+        if ref_genome and (self.master_data_dir / "reference_genomes" / ref_genome).exists():
+            self.prepare_reference([ref_genome])
+
+        work_dir = run_dir
+        if preview:
+            work_dir = self._setup_preview(run_dir, run_config, preview, seed)
+            # Subsampled intermediates must never be restored into full runs
+            use_cache = False
+        
+        cache, cached_items = self._run_cache(run_dir) if use_cache else (None, [])
+        if cache is not None:
+            restored = restore_run(cache, cached_items)
+            if restored:
+                print(f"♻️  Restored {len(restored)} cached intermediate(s): " +
+                      ", ".join(f"{item['sample']} {item['stage']}" for item in restored))
+
+        # Every rule declares mem_mb/disk_mb; the budgets let snakemake pack as many jobs as fit
+        tmp_dir = "SLURM jobs"
+        if executor == "local":
+            print(f"🔧 Using {selected_cores} cores")
+            mem_mb = mem_mb or self._physical_memory_mb()
+            # Same scratch location as the sort/merge rules
+            tmp_dir = check_tmp_dir("/tmp")
+            if not tmp_disk_mb and os.path.isdir(tmp_dir):
+                tmp_disk_mb = shutil.disk_usage(tmp_dir).free // 1024**2
+        if mem_mb:
+            print(f"🧠 Memory budget: {mem_mb / 1024:.1f} GB")
+        if tmp_disk_mb:
+            print(f"💽 Scratch budget in {tmp_dir}: {tmp_disk_mb / 1024:.1f} GB")
+        profile_dir = write_profile(work_dir, executor, cores=selected_cores, mem_mb=mem_mb,
+                                    tmp_disk_mb=tmp_disk_mb, jobs=jobs, config=run_config)
+        if executor == "slurm":
+            print(f"🖥️  Submitting jobs with sbatch (profile: {profile_dir.relative_to(work_dir)})")
+
         try:
-            subprocess.run(["snakemake", "--cores", str(selected_cores)], cwd=run_dir, check=True)
+            subprocess.run(["snakemake", "--profile", str(profile_dir.relative_to(work_dir))], cwd=work_dir, check=True)
             print("✅ Pipeline completed successfully!")
+            if preview:
+                for plot in sorted((work_dir / "results" / "final").rglob("mutation_frequency_plot.png")):
+                    print(f"📊 Preview plot: {plot.relative_to(self.repo_root)}")
+            if cache is not None:
+                stored = store_run(cache, cached_items)
+                print(f"💾 Cached {stored} intermediate(s) ({cache.usage() / 1024**3:.1f} GB in {self.cache_dir})")
         except subprocess.CalledProcessError as e:
             print(f"❌ Pipeline failed with exit code: {e.returncode}")
             sys.exit(e.returncode)
@@ -195,6 +468,51 @@ To run: mbs run {run_name}
             print("❌ snakemake not found. Please install and activate the environment")
             sys.exit(1)
 
+    def _setup_preview(self, run_dir: Path, run_config: dict, preview: tuple, seed: int = 0) -> Path:
+        """Create runs/<run>/results_preview, a copy of the run that subsamples every library.
+
+        It gets the current Snakefile template (runs configured earlier lack its subsample rule)
+        and the run's datasets.tab and combinations.tab, and has its own .snakemake, logs and
+        results, so a later full run in the run directory neither sees nor waits for it. Each sample keeps a fraction of its read pairs: the given fraction,
+        or enough for the given coverage of the reference.
+        """
+        kind, value = preview
+        preview_dir = run_dir / "results_preview"
+        preview_dir.mkdir(exist_ok=True)
+        shutil.copy2(self.templates_dir / "Snakefile.template", preview_dir / "Snakefile")
+        for name in ("datasets.tab", "combinations.tab"):
+            if (run_dir / name).exists():
+                shutil.copy2(run_dir / name, preview_dir / name)
+
+        reference = self.master_data_dir / "reference_genomes" / run_config['ref_genome']
+        datasets = pd.read_table(run_dir / "datasets.tab", sep="\t", comment='#')
+        try:
+            fractions = preview_fractions(datasets, kind, value, reference)
+        except (OSError, ValueError) as e:
+            print(f"❌ Cannot size the preview: {e}")
+            sys.exit(1)
+        config = dict(run_config)
+        config.update({
+            "reference_dir": str(reference.parent),
+            "run_name": f"{run_dir.name}/results_preview",
+            "preview": {"size": f"{value:g}x" if kind == "coverage" else value, "seed": seed, "fractions": fractions},
+        })
+        with open(preview_dir / "config.yaml", 'w') as f:
+            f.write(f"# Preview of {run_dir.name}, written by mbs run --preview; regenerated on every preview\n")
+            yaml.safe_dump(config, f, sort_keys=False, default_flow_style=False)
+
+        print(f"🔍 Preview in {preview_dir.relative_to(self.repo_root)}: " +
+              ", ".join(f"{sample} {100 * fraction:.3g}%" for sample, fraction in fractions.items()) + " of read pairs")
+        return preview_dir
+
+    @staticmethod
+    def _physical_memory_mb() -> Optional[int]:
+        """Total physical memory in MB, or None where the OS does not report it"""
+        try:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024**2
+        except (AttributeError, ValueError, OSError):
+            return None
+
     def status(self, run_name: str, detailed: bool = False):
         """Show snakemake summary for a run (quick status)."""
         run_dir = self.runs_dir / run_name
@@ -213,63 +531,48 @@ To run: mbs run {run_name}
             print("❌ snakemake not found. Please install and activate the environment")
             sys.exit(1)
 
-    def watch(self, run_name: str, interval_seconds: int = 10, detailed: bool = True):
-        """Continuously show status; if tqdm is available, render a simple progress bar.
+    def watch(self, run_name: str, interval_seconds: float = 2, once: bool = False, preview: bool = False):
+        """Follow a run's progress (per-rule counts, throughput, ETA) from its snakemake log.
 
-        Note: Progress is heuristic, based on parsing Snakemake summary output.
+        Only the lines appended to .snakemake/log since the last poll are read, so watching
+        costs the workflow nothing (unlike polling snakemake --summary, which rebuilds the DAG).
         """
         run_dir = self.runs_dir / run_name
         if not run_dir.exists():
             print(f"❌ Run not found: {run_name}")
             return
-
-        # Attempt to estimate total tasks from a dryrun
-        total_tasks: Optional[int] = None
-        try:
-            dry = subprocess.run(["snakemake", "--dryrun"], cwd=run_dir, check=False, capture_output=True, text=True)
-            m = re.search(r"total\s+(\d+)\s+steps", dry.stdout, re.IGNORECASE)
-            if m:
-                total_tasks = int(m.group(1))
-        except Exception:
-            pass
-
-        print(f"👀 Watching status for {run_name} (refresh {interval_seconds}s)" + (f"; total ~{total_tasks} tasks" if total_tasks else ""))
-        bar = None
+        if preview:
+            run_dir = run_dir / "results_preview"
+            run_name = f"{run_name} preview"
+        
+        if not once:
+            print(f"👀 Watching {run_name} (refresh {interval_seconds}s, Ctrl-C to stop)")
         try:
-            while True:
-                args = ["snakemake", "--detailed-summary"] if detailed else ["snakemake", "--summary"]
-                res = subprocess.run(args, cwd=run_dir, check=False, capture_output=True, text=True)
-                out = res.stdout
-                # Parse simple finished/pending counts
-                finished = len(re.findall(r"finished", out))
-                pending = len(re.findall(r"pending|incomplete|failed", out))
-                total = total_tasks or (finished + pending if (finished + pending) > 0 else None)
- 
-                if total:
-                    if bar is None:
-                        bar = tqdm(total=total, desc="Pipeline progress", unit="tasks")
-                    bar.n = min(finished, total)
-                    bar.refresh()
-                else:
-                    print(f"Status: finished={finished}" + (f" / {total}" if total else "") + (f", pending~{pending}" if pending else ""))
-
-                time.sleep(interval_seconds)
+            progress = watch_progress(run_dir, interval=interval_seconds, once=once)
         except KeyboardInterrupt:
             print("\n👋 Stopped watching.")
+            return
+        if progress is not None and progress.status == "complete":
+            print("✅ Pipeline completed successfully!")
+        elif progress is not None and progress.status == "failed":
+            print(f"❌ Pipeline failed; see {latest_log(run_dir)}")
     
-    def list_runs(self):
-        """List all configured runs"""
+    def list_runs(self, verbose: bool = True) -> list:
+        """List all configured runs; returns their directories"""
         if not self.runs_dir.exists():
-            print("No runs found")
-            return
+            if verbose:
+                print("No runs found")
+            return []
         
-        runs = [d for d in self.runs_dir.iterdir() if d.is_dir()]
+        runs = sorted(d for d in self.runs_dir.iterdir() if d.is_dir())
         if not runs:
-            print("No runs found")
-            return
+            if verbose:
+                print("No runs found")
+            return []
         
-        print(f"Found {len(runs)} run(s):")
-        for run_dir in sorted(runs):
+        if verbose:
+            print(f"Found {len(runs)} run(s):")
+        for run_dir in runs:
             summary_file = run_dir / "run_summary.txt"
             if summary_file.exists():
                 with open(summary_file, 'r') as f:
@@ -278,7 +581,52 @@ To run: mbs run {run_name}
             else:
                 run_name = run_dir.name
             
-            print(f"  📁 {run_name}")
+            if verbose:
+                print(f"  📁 {run_name}")
+        return runs
+    
+    def plot_runs(self, run_names: Optional[list] = None, jobs: Optional[int] = None,
+                  out_dir: Optional[str] = None, min_dp: int = 5, **options):
+        """Re-plot the final VCFs of the given runs (default: all) across a process pool"""
+        from mapping_by_sequencing.pipeline.plot_batch import plot_many, run_jobs
+        
+        if run_names:
+            run_dirs = [self.runs_dir / name for name in run_names]
+            missing = [d.name for d in run_dirs if not d.exists()]
+            if missing:
+                print(f"❌ Run directory not found: {', '.join(missing)}")
+                sys.exit(1)
+        else:
+            run_dirs = self.list_runs(verbose=False)
+        
+        plot_jobs = [job for run_dir in run_dirs for job in run_jobs(run_dir, out_dir, min_dp=min_dp, **options)]
+        if not plot_jobs:
+            print("❌ No final VCFs found (runs must have completed results/final/all_vs_*_ann.vcf)")
+            sys.exit(1)
+        
+        index_file = Path(out_dir or self.runs_dir) / "plot_index.tsv"
+        print(f"📊 Plotting {len(plot_jobs)} VCF(s) from {len(run_dirs)} run(s)")
+        index = plot_many(plot_jobs, processes=jobs, index_file=index_file)
+        print(f"📋 Index: {index_file}")
+        return index
+
+    def perf(self, run_names: Optional[list] = None, tsv: Optional[str] = None):
+        """Per-rule wall time, CPU, memory and input-size scaling of runs (default: all), with critical paths.
+
+        Reads the benchmarks/<rule>/*.tsv files every job writes, so sizing mem_mb or a
+        SLURM allocation can start from the max RSS and wall time measured on earlier runs.
+        """
+        if run_names:
+            run_dirs = [self.runs_dir / name for name in run_names]
+            missing = [name for name, d in zip(run_names, run_dirs) if not d.exists()]
+            if missing:
+                print(f"❌ Run directory not found: {', '.join(missing)}")
+                sys.exit(1)
+        else:
+            run_dirs = self.list_runs(verbose=False)
+        print(perf_report(run_dirs, tsv=tsv))
+        if tsv:
+            print(f"📋 Per-job table: {tsv}")
 
 
 def main():
@@ -288,7 +636,16 @@ def main():
 Examples:
   python scripts/run_manager.py configure E1 E19 E20
   python scripts/run_manager.py run run_20250810_E1_vs_E19_vs_E20
+  python scripts/run_manager.py run run_20250810_E1_vs_E19_vs_E20 --cores 32 --mem 120G --tmp-disk 500G
+  python scripts/run_manager.py run run_20250810_E1_vs_E19_vs_E20 --executor slurm --jobs 200
+  python scripts/run_manager.py add-sample run_20250810_E1_vs_E19_vs_E20 E21 --cores 32
+  python scripts/run_manager.py batch E1:E19,E20 E1:E21,E22 --cores 32 --mem 128G
+  python scripts/run_manager.py batch --controls E1 E2 --mutants E19 E20 E21
   python scripts/run_manager.py list
+  python scripts/run_manager.py watch run_20250810_E1_vs_E19_vs_E20
+  python scripts/run_manager.py prepare-reference myreference-genome.fna
+  python scripts/run_manager.py plot --jobs 8
+  python scripts/run_manager.py perf --tsv jobs.tsv
         """
     )
     
@@ -297,22 +654,84 @@ Examples:
     # Configure command
     configure_parser = subparsers.add_parser('configure', help='Configure new run')
     configure_parser.add_argument('control_sample', help='Control sample (e.g., E1)')
-    configure_parser.add_argument('mutant1', help='First mutant sample (e.g., E19)')
-    configure_parser.add_argument('mutant2', help='Second mutant sample (e.g., E20)')
+    configure_parser.add_argument('mutants', nargs='+', help='One or more mutant samples (e.g., E19 E20)')
+    configure_parser.add_argument('--name', help='Run name suffix (default: CONTROL_vs_MUTANT1_vs_...)')
     
     # Run command  
     run_parser = subparsers.add_parser('run', help='Run pipeline')
     run_parser.add_argument('run_name', help='Run directory name')
     run_parser.add_argument('--cores', type=int, default=None, help='Number of cores to use (default: all available)')
+    run_parser.add_argument('--mem', type=mem_to_mb, default=None, help='Total memory shared by all jobs, e.g. 120G or MB (default: physical memory when local)')
+    run_parser.add_argument('--tmp-disk', type=mem_to_mb, default=None, help='Scratch space under $TMP shared by all jobs, e.g. 500G (default: free space when local)')
+    run_parser.add_argument('--executor', choices=EXECUTORS, default='local', help='Run jobs on this machine or submit them to SLURM (default: local)')
+    run_parser.add_argument('--jobs', type=int, default=None, help='SLURM jobs submitted at once (default: cluster.max_jobs in config.yaml)')
+    run_parser.add_argument('--no-cache', action='store_true', help='Do not restore or store intermediates in the shared cache')
+    run_parser.add_argument('--preview', type=parse_preview, default=None, metavar='SIZE',
+                            help='Quick run on subsampled reads into results_preview/: a fraction of read pairs (e.g. 0.05) or a coverage (e.g. 5x)')
+    run_parser.add_argument('--seed', type=int, default=0, help='Subsampling seed for --preview (default: 0)')
     # simple interface; additional snakemake flags can be given manually if desired
     
+    # Add-sample command
+    add_parser = subparsers.add_parser('add-sample', help='Add mutants to an existing run and compute only what they change')
+    add_parser.add_argument('run_name', help='Run directory name')
+    add_parser.add_argument('samples', nargs='+', help='One or more mutant samples to add (e.g., E21)')
+    add_parser.add_argument('--cores', type=int, default=None, help='Number of cores to use (default: all available)')
+    add_parser.add_argument('--mem', type=mem_to_mb, default=None, help='Total memory shared by all jobs, e.g. 120G or MB (default: physical memory when local)')
+    add_parser.add_argument('--tmp-disk', type=mem_to_mb, default=None, help='Scratch space under $TMP shared by all jobs, e.g. 500G (default: free space when local)')
+    add_parser.add_argument('--executor', choices=EXECUTORS, default='local', help='Run jobs on this machine or submit them to SLURM (default: local)')
+    add_parser.add_argument('--jobs', type=int, default=None, help='SLURM jobs submitted at once (default: cluster.max_jobs in config.yaml)')
+    add_parser.add_argument('--no-cache', action='store_true', help='Do not restore or store intermediates in the shared cache')
+    add_parser.add_argument('--configure-only', action='store_true', help='Update datasets.tab without starting the run')
+
+    # Batch command
+    batch_parser = subparsers.add_parser('batch', help='Configure and run many combinations as one workflow')
+    batch_parser.add_argument('combinations', nargs='*', help='Combinations as CONTROL:MUTANT[,MUTANT...] (e.g., E1:E19,E20)')
+    batch_parser.add_argument('--file', help='File with one CONTROL:MUTANT[,MUTANT...] combination per line')
+    batch_parser.add_argument('--controls', nargs='+', default=[], help='Matrix mode: controls to pair with every --mutants sample')
+    batch_parser.add_argument('--mutants', nargs='+', default=[], help='Matrix mode: mutants, each analysed against every control')
+    batch_parser.add_argument('--name', help='Batch name suffix (default: number of combinations)')
+    batch_parser.add_argument('--cores', type=int, default=None, help='Number of cores to use (default: all available)')
+    batch_parser.add_argument('--mem', '--mem-mb', dest='mem', type=mem_to_mb, default=None, help='Total memory shared by all jobs, e.g. 128G or MB (default: physical memory when local)')
+    batch_parser.add_argument('--tmp-disk', type=mem_to_mb, default=None, help='Scratch space under $TMP shared by all jobs, e.g. 500G (default: free space when local)')
+    batch_parser.add_argument('--executor', choices=EXECUTORS, default='local', help='Run jobs on this machine or submit them to SLURM (default: local)')
+    batch_parser.add_argument('--jobs', type=int, default=None, help='SLURM jobs submitted at once (default: cluster.max_jobs in config.yaml)')
+    batch_parser.add_argument('--no-cache', action='store_true', help='Do not restore or store intermediates in the shared cache')
+    batch_parser.add_argument('--configure-only', action='store_true', help='Create the batch run without starting it')
+
     # List command
     subparsers.add_parser('list', help='List all runs')
 
+    # Prepare-reference command
+    prepare_parser = subparsers.add_parser('prepare-reference', help='Build shared reference indexes (bwa, .fai, .dict, contig map)')
+    prepare_parser.add_argument('references', nargs='*', help='FASTA names in data/reference_genomes or paths (default: all)')
+    prepare_parser.add_argument('--only', nargs='+', choices=INDEX_STEPS, help='Only these steps (default: all)')
+    prepare_parser.add_argument('--force', action='store_true', help='Rebuild even if up to date')
+
+    # Plot command
+    plot_parser = subparsers.add_parser('plot', help='Re-plot the final VCFs of runs in parallel')
+    plot_parser.add_argument('runs', nargs='*', help='Run directory names (default: all runs)')
+    plot_parser.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes (default: CPU count)')
+    plot_parser.add_argument('--out-dir', help='Write plots here instead of into each run')
+    plot_parser.add_argument('--min-dp', type=int, default=5, help='Minimum total depth of a site (default: 5)')
+    plot_parser.add_argument('--window', type=int, help='Sliding-window size in bp (default: from each run config)')
+    plot_parser.add_argument('--step', type=int, help='Window step in bp (default: from each run config)')
+
+    # Perf command
+    perf_parser = subparsers.add_parser('perf', help='Per-rule runtime, memory and scaling from job benchmarks, with the critical path')
+    perf_parser.add_argument('runs', nargs='*', help='Run directory names (default: all runs)')
+    perf_parser.add_argument('--tsv', help='Also write one row per job to this TSV')
+
     # Status command
     status_parser = subparsers.add_parser('status', help='Show run status (Snakemake summary)')
     status_parser.add_argument('run_name', help='Run directory name')
     status_parser.add_argument('--detailed', action='store_true', help='Show detailed summary')
+
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Follow a running pipeline (per-rule progress, throughput, ETA)')
+    watch_parser.add_argument('run_name', help='Run directory name')
+    watch_parser.add_argument('--interval', type=float, default=2, help='Seconds between log reads (default: 2)')
+    watch_parser.add_argument('--once', action='store_true', help='Print the current progress and exit')
+    watch_parser.add_argument('--preview', action='store_true', help='Follow the run\'s --preview instead')
     
     args = parser.parse_args()
     
@@ -323,13 +742,43 @@ Examples:
     manager = RunManager()
     
     if args.command == 'configure':
-        manager.configure_run(args.control_sample, args.mutant1, args.mutant2)
+        manager.configure_run(args.control_sample, args.mutants, name=args.name)
     elif args.command == 'run':
-        manager.run_pipeline(args.run_name, cores=args.cores)
+        manager.run_pipeline(args.run_name, cores=args.cores, use_cache=not args.no_cache,
+                             mem_mb=args.mem, tmp_disk_mb=args.tmp_disk, executor=args.executor, jobs=args.jobs,
+                             preview=args.preview, seed=args.seed)
+    elif args.command == 'add-sample':
+        manager.add_samples(args.run_name, args.samples)
+        if not args.configure_only:
+            manager.run_pipeline(args.run_name, cores=args.cores, use_cache=not args.no_cache,
+                                 mem_mb=args.mem, tmp_disk_mb=args.tmp_disk, executor=args.executor, jobs=args.jobs)
+    elif args.command == 'batch':
+        specs = list(args.combinations)
+        if args.file:
+            with open(args.file, 'r') as f:
+                specs += [l.strip() for l in f if l.strip() and not l.startswith('#')]
+        combinations = [RunManager.parse_combination(spec) for spec in specs]
+        combinations += [(ctrl, [mutant]) for ctrl in args.controls for mutant in args.mutants]
+        if not combinations:
+            print("❌ No combinations given (use CONTROL:MUTANT[,MUTANT...], --file or --controls/--mutants)")
+            sys.exit(1)
+        batch_name = manager.configure_batch(combinations, name=args.name)
+        if not args.configure_only:
+            manager.run_pipeline(batch_name, cores=args.cores, use_cache=not args.no_cache,
+                                 mem_mb=args.mem, tmp_disk_mb=args.tmp_disk, executor=args.executor, jobs=args.jobs)
     elif args.command == 'list':
         manager.list_runs()
+    elif args.command == 'prepare-reference':
+        manager.prepare_reference(args.references, steps=args.only, force=args.force)
+    elif args.command == 'plot':
+        manager.plot_runs(args.runs, jobs=args.jobs, out_dir=args.out_dir, min_dp=args.min_dp,
+                          window=args.window, step=args.step)
+    elif args.command == 'perf':
+        manager.perf(args.runs, tsv=args.tsv)
     elif args.command == 'status':
         manager.status(args.run_name, detailed=getattr(args, 'detailed', False))
+    elif args.command == 'watch':
+        manager.watch(args.run_name, interval_seconds=args.interval, once=args.once, preview=args.preview)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+"""
+Deterministic read-pair subsampling for preview runs.
+
+A pair is kept when a keyed hash of its read name falls below the sampling
+fraction. The decision depends only on the seed and the name, so R1 and R2
+are filtered independently (in parallel) and still keep the same pairs, and
+the same seed always selects the same reads, whatever the file order.
+
+``mbs run --preview`` takes either a fraction of the read pairs or a target
+coverage; a coverage is turned into one fraction per sample from the
+reference length and the bases in the sample's libraries, estimated from
+the first reads and the compressed file sizes.
+
+Usage:
+    python -m mapping_by_sequencing.pipeline.subsample R1.fastq.gz R2.fastq.gz -o sub.R1.fastq.gz sub.R2.fastq.gz --fraction 0.05
+"""
+
+import gzip
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Tuple
+
+# Reads looked at per FASTQ to estimate its total bases
+ESTIMATE_READS = 20000
+
+
+def parse_preview(value: str) -> Tuple[str, float]:
+    """
+    ``--preview`` argument: a fraction of read pairs in (0, 1] or a coverage
+    such as "5x" (bare numbers above 1 are read as coverage too).
+    """
+    text = str(value).strip().lower()
+    try:
+        number = float(text[:-1] if text.endswith("x") else text)
+    except ValueError:
+        raise ValueError(f"Invalid preview size: {value!r} (use a fraction like 0.05 or a coverage like 5x)")
+    if number <= 0:
+        raise ValueError(f"Preview size must be positive, not {value!r}")
+    if text.endswith("x") or number > 1:
+        return "coverage", number
+    return "fraction", number
+
+
+def _read_name(header: bytes) -> bytes:
+    name = header[1:].split(None, 1)[0]
+    return name[:-2] if name[-2:] in (b"/1", b"/2") else name
+
+
+def _subsample_file(source: str, target: str, fraction: float, seed: int) -> Tuple[int, int]:
+    """Write the kept records of one FASTQ; returns (records read, records kept)."""
+    threshold = int(fraction * 2**64)
+    key = str(seed).encode()
+    total = kept = 0
+    tmp = f"{target}.tmp{os.getpid()}"
+    try:
+        with gzip.open(source, 'rb') as fin, gzip.open(tmp, 'wb', compresslevel=1) as fout:
+            buffer = []
+            for header in fin:
+                try:
+                    record = header + next(fin) + next(fin) + next(fin)
+                except StopIteration:
+                    raise ValueError(f"{source} is truncated: its last record (read {total + 1}) "
+                                     f"has fewer than 4 lines") from None
+                total += 1
+                digest = hashlib.blake2b(_read_name(header), digest_size=8, key=key).digest()
+                if int.from_bytes(digest, "big") < threshold:
+                    buffer.append(record)
+                    kept += 1
+                    if len(buffer) >= 10000:
+                        fout.write(b"".join(buffer))
+                        buffer = []
+            fout.write(b"".join(buffer))
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return total, kept
+
+
+def subsample_pair(r1, r2, out1, out2, fraction: float, seed: int = 0) -> Tuple[int, int]:
+    """
+    Keep about ``fraction`` of the read pairs of R1/R2. With a fraction of 1
+    the outputs are symlinks to the inputs.
+
+    Returns:
+        tuple: (pairs read, pairs kept)
+    """
+    for out in (out1, out2):
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.lexists(out):
+            os.remove(out)
+    if fraction >= 1:
+        os.symlink(os.path.abspath(r1), out1)
+        os.symlink(os.path.abspath(r2), out2)
+        return 0, 0
+    try:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            first, second = pool.map(_subsample_file, [str(r1), str(r2)], [str(out1), str(out2)],
+                                     [fraction] * 2, [seed] * 2)
+    except (OSError, EOFError, ValueError):
+        # The other file may have been written completely: never leave half a pair
+        for out in (out1, out2):
+            if os.path.exists(out):
+                os.remove(out)
+        raise
+    if first != second:
+        for out in (out1, out2):
+            os.remove(out)
+        raise ValueError(f"{r1} and {r2} are not paired: {first[0]} and {second[0]} reads, "
+                         f"{first[1]} and {second[1]} kept")
+    return first
+
+
+def estimate_bases(fastq) -> int:
+    """
+    Bases in a (gzipped) FASTQ, extrapolated from its first ESTIMATE_READS
+    reads and the share of the file they take up.
+    """
+    size = os.path.getsize(fastq)
+    with open(fastq, 'rb') as raw:
+        reader = gzip.GzipFile(fileobj=raw) if str(fastq).endswith(".gz") else raw
+        bases = reads = 0
+        for i, line in enumerate(reader):
+            if i % 4 == 1:
+                bases += len(line.rstrip())
+                reads += 1
+                if reads >= ESTIMATE_READS:
+                    break
+        else:
+            return bases
+        consumed = raw.tell()
+    return int(bases * size / consumed) if consumed else bases
+
+
+def genome_length(fasta) -> int:
+    """Reference length from its .fai index, or by reading the FASTA."""
+    fai = Path(f"{fasta}.fai")
+    if fai.exists():
+        with open(fai) as f:
+            return sum(int(line.split("\t")[1]) for line in f if line.strip())
+    opener = gzip.open if str(fasta).endswith(".gz") else open
+    with opener(fasta, 'rt') as f:
+        return sum(len(line.strip()) for line in f if not line.startswith(">"))
+
+
+def preview_fractions(datasets, kind: str, value: float, reference=None) -> Dict[str, float]:
+    """
+    Sampling fraction per sample of a datasets table (sample, R1, R2 columns).
+    For a coverage, each sample gets the fraction that brings it to that
+    coverage of the reference, or 1 if it has less.
+    """
+    samples = list(dict.fromkeys(datasets['sample']))
+    if kind == "fraction":
+        return {sample: value for sample in samples}
+    length = genome_length(reference)
+    if not length:
+        raise ValueError(f"Reference {reference} is empty")
+    fractions = {}
+    for sample in samples:
+        rows = datasets[datasets['sample'] == sample]
+        bases = sum(estimate_bases(row.R1) + estimate_bases(row.R2) for row in rows.itertuples())
+        fractions[sample] = round(min(1.0, value * length / bases), 6) if bases else 1.0
+    return fractions
+
+
+def main():
+    """
+    Command-line interface: subsample one pair of FASTQ files.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Deterministically subsample read pairs by read name hash')
+    parser.add_argument('r1', help='R1 FASTQ(.gz)')
+    parser.add_argument('r2', help='R2 FASTQ(.gz)')
+    parser.add_argument('-o', '--output', nargs=2, required=True, metavar=('OUT1', 'OUT2'), help='Output FASTQ.gz files')
+    parser.add_argument('--fraction', type=float, required=True, help='Fraction of pairs to keep (0-1]')
+    parser.add_argument('--seed', type=int, default=0, help='Hash key: the same seed keeps the same pairs (default: 0)')
+    args = parser.parse_args()
+
+    if not 0 < args.fraction <= 1:
+        print(f"❌ --fraction must be in (0, 1], not {args.fraction}")
+        sys.exit(1)
+    try:
+        total, kept = subsample_pair(args.r1, args.r2, args.output[0], args.output[1], args.fraction, args.seed)
+    except (OSError, EOFError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.fraction >= 1:
+        print("✅ Linked all pairs (fraction 1)")
+    else:
+        print(f"✅ Kept {kept:,} of {total:,} pairs ({100 * kept / max(total, 1):.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from mapping_by_sequencing.pipeline.vcf_filter import filter_vcf_chunked, filter_vcf_samples
+
 def get_AF(INFO):
     AF = None
     INFO = INFO.split(";")
@@ -12,7 +14,7 @@ def get_AF(INFO):
     print(AF)
     return AF
 
-def filter_vcf(vcf_file, vcf_filt_file):
+def filter_vcf(vcf_file, vcf_filt_file, **settings):
     """
     Filter VCF according to:
     - AD[snp_index]/DP > 30%
@@ -35,30 +37,83 @@ FORMAT/DP4  .. Deprecated in favor of FORMAT/ADF and FORMAT/ADR; Number of high-
                alt-forward and alt-reverse bases (Number=4,Type=Integer)
 FORMAT/DPR  .. Deprecated in favor of FORMAT/AD; Number of high-quality bases for each observed allele (Number=R,Type=Integer)
 INFO/DPR    .. Deprecated in favor of INFO/AD; Number of high-quality bases for each observed allele (Number=R,Type=Integer)
+
+    Records are processed in blocks by ``vcf_filter.filter_vcf_chunked``;
+    plain and bgzipped VCFs are accepted, and ``.gz`` outputs are BGZF.
+    ``settings`` may override min_af, min_dp, min_alt_per_strand and
+    min_strand_fraction (see ``get_snp_filter_settings``).
+    """
+    return filter_vcf_chunked(vcf_file, vcf_filt_file, **settings)
+
+def make_calling_regions(fai_file, region_size=0):
     """
-    vcf = open(vcf_file, 'r')
-    vcf_filt = open(vcf_filt_file, 'w')
-    for l in vcf:
-        if l.startswith("#"):
-            # it's a header
-            vcf_filt.write(l)
-        else:
-            m = l.split()
-            REF = m[3]
-            ALT = m[4].split(',')
-            if REF == "G" and "A" in ALT:
-                snp_index = ALT.index("A")
-            elif REF == "C" and "T" in ALT:
-                snp_index = ALT.index("T")
-            else:
+    Split the contigs listed in a samtools .fai index into variant-calling shards.
+
+    region_size <= 0 gives one shard per contig; otherwise each contig is cut
+    into windows of at most region_size bp. Shards keep the .fai (and hence
+    BAM header) order so that concatenating them reproduces a whole-genome call.
+    Returns a list of (chrom, start, end) tuples with 1-based inclusive coordinates.
+    """
+    regions = []
+    with open(fai_file, 'r') as fai:
+        for l in fai:
+            if not l.strip():
                 continue
-            INFO = m[7]
-            FORMAT_DEF = m[8].split(":")
-            AD_index = FORMAT_DEF.index("AD") # here you gotta find the allele you want
-            DP_index = FORMAT_DEF.index("DP")
-            SAMPLE_INFO = m[-1]
-            AD = int(SAMPLE_INFO.split(":")[AD_index].split(',')[snp_index+1])
-            DP = int(SAMPLE_INFO.split(":")[DP_index])
-            if AD/DP >= 0.3:
-                vcf_filt.write(l)
-    vcf_filt.close()
+            m = l.split('\t')
+            chrom, length = m[0], int(m[1])
+            step = region_size if region_size and region_size > 0 else length
+            for start in range(1, length + 1, step):
+                regions.append((chrom, start, min(start + step - 1, length)))
+    return regions
+
+def write_calling_regions(fai_file, regions_file, region_size=0):
+    """
+    Write the shards of make_calling_regions as a TSV of shard id and
+    bcftools region string (contig names containing ':' are braced).
+    """
+    regions = make_calling_regions(fai_file, region_size)
+    width = max(4, len(str(len(regions))))
+    with open(regions_file, 'w') as out:
+        for i, (chrom, start, end) in enumerate(regions):
+            name = "{%s}" % chrom if ":" in chrom else chrom
+            out.write("r{i:0{width}d}\t{name}:{start}-{end}\n".format(i=i, width=width, name=name, start=start, end=end))
+
+def bam_sort_order(bam_file):
+    """
+    Return the SO value of a BAM's @HD header line (e.g. "coordinate"), or None.
+    Only the header at the start of the BGZF stream is decompressed.
+    """
+    import gzip
+    import struct
+    with gzip.open(bam_file, 'rb') as bam:
+        if bam.read(4) != b"BAM\1":
+            raise ValueError("{} is not a BAM file".format(bam_file))
+        l_text = struct.unpack("<i", bam.read(4))[0]
+        header = bam.read(l_text).decode("ascii", errors="replace")
+    for l in header.splitlines():
+        if l.startswith("@HD"):
+            for field in l.split("\t")[1:]:
+                if field.startswith("SO:"):
+                    return field[3:]
+        break
+    return None
+
+def fastp_summary(json_file):
+    """
+    Key metrics of a fastp JSON report: read counts before and after
+    trimming, Q30 rate and GC content of the kept reads, adapter-trimmed
+    reads and duplication rate. Read counts include both mates.
+    """
+    import json
+    with open(json_file) as f:
+        report = json.load(f)
+    before = report.get("summary", {}).get("before_filtering", {})
+    after = report.get("summary", {}).get("after_filtering", {})
+    return {
+        "reads_in": before.get("total_reads", 0),
+        "reads_out": after.get("total_reads", 0),
+        "q30_rate": after.get("q30_rate"),
+        "gc_content": after.get("gc_content"),
+        "adapter_trimmed_reads": report.get("adapter_cutting", {}).get("adapter_trimmed_reads", 0),
+        "duplication_rate": report.get("duplication", {}).get("rate"),
+    }
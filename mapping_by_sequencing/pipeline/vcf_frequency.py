@@ -0,0 +1,248 @@
+"""
+Columnar allele-frequency parser for annotated multi-sample VCFs.
+
+Blocks of whole records are located with the ``VcfBlock`` offsets of
+``vcf_filter``; FORMAT strings are resolved once per distinct string and
+GT/AD/DP of every mutant sample column are decoded as arrays. Input may be
+plain text, gzip or BGZF.
+"""
+
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .vcf_filter import DEFAULT_BLOCK_BYTES, VcfBlock, iter_blocks, parse_ints, subfield_bounds, _format_keys
+from .vcf_io import open_vcf
+
+logger = logging.getLogger(__name__)
+
+ONE, DOT = ord("1"), ord(".")
+
+
+def _is_control_sample(name: str, control_sample: str) -> bool:
+    """True if a VCF sample column belongs to the control.
+
+    Columns are either the sample name itself (joint calling) or the BAM path
+    (e.g. results/E1/map/E1_OUT-sorted.bam), so match whole path components
+    rather than substrings: 'E1' must not match 'E19'.
+    """
+    return name == control_sample or control_sample in Path(name).parts
+
+
+def _sample_field(block: VcfBlock, codes: np.ndarray, formats: List[bytes], col_start: np.ndarray,
+                  col_end: np.ndarray, key: bytes, format_cache: Dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Byte bounds of FORMAT field ``key`` within the given sample columns, and whether it is present."""
+    key_index = np.array([_format_keys(format_cache, f).get(key, -1) for f in formats], dtype=np.int64)[codes]
+    start, end, valid = subfield_bounds(block.separators(b":"), col_start, col_end, np.maximum(key_index, 0))
+    return start, end, valid & (key_index >= 0)
+
+
+def _contains_byte(block: VcfBlock, start: np.ndarray, end: np.ndarray, byte: int) -> np.ndarray:
+    """True where the short fields ``[start, end)`` (e.g. GT) contain ``byte``; read one byte column at a time."""
+    found = np.zeros(start.size, dtype=bool)
+    length = end - start
+    last = len(block.arr) - 1
+    for k in range(int(length.max(initial=0))):
+        found |= (k < length) & (block.arr[np.minimum(start + k, last)] == byte)
+    return found
+
+
+def _field_changes(block: VcfBlock, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Indices i > 0 whose field ``[start, end)`` differs from that of i - 1 (e.g. CHROM)."""
+    length = end - start
+    changed = length[1:] != length[:-1]
+    last = len(block.arr) - 1
+    for k in range(int(length.max(initial=0))):
+        changed |= (k < length[1:]) & (block.arr[np.minimum(start[1:] + k, last)]
+                                       != block.arr[np.minimum(start[:-1] + k, last)])
+    return np.flatnonzero(changed) + 1
+
+
+def _comma_tokens(block: VcfBlock, start: np.ndarray, end: np.ndarray):
+    """
+    Split the fields ``[start, end)`` on commas.
+
+    Returns:
+        tuple: (values, token_ok, is_dot, first) where ``first`` holds the
+        index of each field's first token; the tokens of field i run up to
+        ``first[i + 1]``
+    """
+    commas = block.separators(b",")
+    # Bounds of absent fields may be inverted; treat them as empty
+    end = np.maximum(start, end)
+    lo = np.searchsorted(commas, start)
+    n_tokens = np.searchsorted(commas, end) - lo + 1
+    first = np.cumsum(n_tokens) - n_tokens
+    total = int(n_tokens.sum())
+    inner = np.ones(total, dtype=bool)
+    inner[first] = False
+    # Comma offsets inside each field, row-major
+    comma_idx = np.arange(total - len(start)) + np.repeat(lo - (first - np.arange(len(start))), n_tokens - 1)
+    token_start = np.empty(total, dtype=np.int64)
+    token_start[first] = start
+    token_start[inner] = commas[comma_idx] + 1
+    last = first + n_tokens - 1
+    token_end = np.empty(total, dtype=np.int64)
+    token_end[last] = end
+    outer = np.ones(total, dtype=bool)
+    outer[last] = False
+    token_end[outer] = commas[comma_idx]
+    values, token_ok = parse_ints(block.arr, token_start, token_end)
+    is_dot = (token_end - token_start == 1) & (block.arr[np.minimum(token_start, len(block.arr) - 1)] == DOT)
+    return values, token_ok, is_dot, first
+
+
+def _allele_depths(block: VcfBlock, start: np.ndarray, end: np.ndarray):
+    """
+    (ref depth, summed alt depth, ok) from AD-style fields; '.' entries are skipped.
+
+    ``ok`` is False where a value is not an integer or fewer than two values remain.
+    """
+    if start.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=bool)
+    values, token_ok, is_dot, first = _comma_tokens(block, start, end)
+    bad = np.add.reduceat((~token_ok & ~is_dot).astype(np.int64), first) > 0
+    counted = np.add.reduceat(token_ok.astype(np.int64), first)
+    total = np.add.reduceat(np.where(token_ok, values, 0), first)
+    # First integer token of each field is the REF depth
+    big = np.iinfo(np.int64).max
+    first_ok = np.minimum.reduceat(np.where(token_ok, np.arange(values.size), big), first)
+    ref = np.where(counted > 0, values[np.minimum(first_ok, values.size - 1)], 0)
+    return ref, total - ref, ~bad & (counted >= 2)
+
+
+def _depths_from_strands(block: VcfBlock, adf: Tuple[int, int], adr: Tuple[int, int]) -> Optional[List[int]]:
+    """AD rebuilt from ADF + ADR for one record (rare path: AD absent or empty)."""
+    try:
+        adf_vals = [int(x) for x in block.buf[adf[0]:adf[1]].split(b",") if x != b"."]
+        adr_vals = [int(x) for x in block.buf[adr[0]:adr[1]].split(b",") if x != b"."]
+    except ValueError:
+        return None
+    return [a + b for a, b in zip(adf_vals, adr_vals)] or None
+
+
+def _block_frequencies(block: VcfBlock, rows: np.ndarray, mutant_cols: List[int], min_dp: int,
+                       format_cache: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean alt-allele fraction over the mutant samples carrying an ALT genotype, and how many did."""
+    freq_sum = np.zeros(rows.size, dtype=np.float64)
+    n_used = np.zeros(rows.size, dtype=np.int64)
+    ends = block.ends[rows]
+    n_samples = np.searchsorted(block._tabs, ends) - block._first_tab[rows] - 8
+    # FORMAT strings are resolved once for all sample columns
+    all_codes, formats = block.format_codes(rows)
+
+    for col in mutant_cols:
+        present = n_samples > col
+        sub = rows[present]
+        if sub.size == 0:
+            continue
+        col_start, col_end = block.sample_bounds(sub, np.full(sub.size, col, dtype=np.int64))
+        codes = all_codes[present]
+
+        # An ALT genotype (any '1' in GT) is required
+        gt_start, gt_end, gt_ok = _sample_field(block, codes, formats, col_start, col_end, b"GT", format_cache)
+        use = gt_ok & _contains_byte(block, gt_start, gt_end, ONE)
+
+        ad_start, ad_end, ad_ok = _sample_field(block, codes, formats, col_start, col_end, b"AD", format_cache)
+        ad_ok &= ad_end > ad_start
+        ref, alt, depth_ok = _allele_depths(block, ad_start, ad_end)
+
+        rebuild = np.flatnonzero(use & ~ad_ok)
+        if rebuild.size:
+            adf_start, adf_end, adf_ok = _sample_field(block, codes, formats, col_start, col_end, b"ADF", format_cache)
+            adr_start, adr_end, adr_ok = _sample_field(block, codes, formats, col_start, col_end, b"ADR", format_cache)
+            for i in rebuild:
+                if not (adf_ok[i] and adr_ok[i] and adf_end[i] > adf_start[i] and adr_end[i] > adr_start[i]):
+                    continue
+                depths = _depths_from_strands(block, (adf_start[i], adf_end[i]), (adr_start[i], adr_end[i]))
+                if depths and len(depths) >= 2:
+                    ref[i], alt[i], depth_ok[i], ad_ok[i] = depths[0], sum(depths[1:]), True, True
+        use &= ad_ok & depth_ok
+
+        total = ref + alt
+        dp_start, dp_end, dp_ok = _sample_field(block, codes, formats, col_start, col_end, b"DP", format_cache)
+        dp, dp_int = parse_ints(block.arr, dp_start, dp_end)
+        total = np.where(dp_ok & dp_int & (dp > total), dp, total)
+        use &= total >= max(1, min_dp)
+
+        freq = np.divide(alt, total, out=np.zeros(sub.size, dtype=np.float64), where=use)
+        idx = np.flatnonzero(present)[use]
+        freq_sum[idx] += freq[use]
+        n_used[idx] += 1
+    return freq_sum, n_used
+
+
+def parse_vcf_frequency_columnar(vcf_file: str, control_sample: Optional[str] = None, min_dp: int = 0,
+                                 block_bytes: int = DEFAULT_BLOCK_BYTES) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Per-site mutation frequency of the mutant samples of a VCF.
+
+    A site's frequency is the mean over mutant samples with an ALT genotype
+    of alt depth / max(AD sum, DP), in percent; sites where no mutant
+    qualifies are left out. Mutants are all sample columns except the control.
+
+    Args:
+        vcf_file (str): VCF path (plain, gzip or BGZF)
+        control_sample (str): Control sample name, excluded from the mean
+        min_dp (int): Minimum total depth for a sample to count
+        block_bytes (int): Approximate size of each parsed block
+
+    Returns:
+        dict: Chromosome -> (positions, frequencies) NumPy arrays, in file order
+    """
+    chunks: Dict[bytes, List[Tuple[np.ndarray, np.ndarray]]] = OrderedDict()
+    format_cache: Dict[bytes, Dict[bytes, int]] = {}
+    mutant_cols: Optional[List[int]] = None
+    short_records = 0
+
+    with open_vcf(vcf_file, "rb") as handle:
+        for block in iter_blocks(handle, block_bytes):
+            header_rows = np.flatnonzero(block.is_header)
+            for i in header_rows:
+                line = block.line(i)
+                if line.startswith(b"#CHROM"):
+                    names = line.rstrip(b"\r\n").decode().split("\t")[9:]
+                    mutant_cols = [j for j, name in enumerate(names)
+                                   if not (control_sample and _is_control_sample(name, control_sample))]
+
+            rows = np.flatnonzero(~block.is_header & (block.ends - block.starts > 1))
+            if rows.size == 0:
+                continue
+            n_tabs = np.searchsorted(block._tabs, block.ends[rows]) - block._first_tab[rows]
+            short = n_tabs < 9
+            short_records += int(short.sum())
+            rows = rows[~short]
+            if rows.size == 0:
+                continue
+            if mutant_cols is None:
+                # No #CHROM line: every sample column of the first record is a mutant
+                mutant_cols = list(range(int(n_tabs[~short][0]) - 8))
+
+            freq_sum, n_used = _block_frequencies(block, rows, mutant_cols, min_dp, format_cache)
+            site = n_used > 0
+            if not np.any(site):
+                continue
+            rows, freq = rows[site], freq_sum[site] / n_used[site] * 100.0
+            pos_start, pos_end = block.column_bounds(1)
+            positions, pos_ok = parse_ints(block.arr, pos_start[rows], pos_end[rows])
+            if not np.all(pos_ok):
+                raise ValueError(f"Invalid POS in VCF record: {block.line(rows[np.flatnonzero(~pos_ok)[0]])[:80]!r}")
+
+            chrom_start, chrom_end = block.column_bounds(0)
+            chrom_start, chrom_end = chrom_start[rows], chrom_end[rows]
+            # Records are grouped by chromosome: split the block at chromosome changes
+            breaks = [0] + _field_changes(block, chrom_start, chrom_end).tolist() + [rows.size]
+            for lo, hi in zip(breaks[:-1], breaks[1:]):
+                chrom = block.buf[chrom_start[lo]:chrom_end[lo]]
+                chunks.setdefault(chrom, []).append((positions[lo:hi], freq[lo:hi]))
+
+    if short_records:
+        logger.warning(f"{short_records} record(s) with insufficient columns skipped")
+    return OrderedDict(
+        (chrom.decode(), (np.concatenate([p for p, _ in parts]), np.concatenate([f for _, f in parts])))
+        for chrom, parts in chunks.items()
+    )
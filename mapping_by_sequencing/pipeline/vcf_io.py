@@ -0,0 +1,79 @@
+"""
+VCF input/output helpers shared by the pipeline stages.
+
+Plain-text and gzip/BGZF-compressed VCFs are opened transparently; outputs
+whose name ends in ``.gz`` are piped through ``bgzip -@`` so that
+``bcftools index`` and ``tabix`` accept them, with compression running in
+bgzip's threads instead of the Python process.
+"""
+
+import gzip
+import io
+import os
+import shutil
+import subprocess
+
+# bgzip compression threads for BGZF outputs
+BGZIP_THREADS = min(4, os.cpu_count() or 1)
+
+
+class BgzfWriter(io.RawIOBase):
+    """Binary BGZF writer that pipes into htslib's multi-threaded ``bgzip``."""
+
+    def __init__(self, path: str, level: int = 6, threads: int = BGZIP_THREADS):
+        bgzip = shutil.which("bgzip")
+        if bgzip is None:
+            raise FileNotFoundError("bgzip not found; activate the pipeline environment (conda activate mbs) "
+                                    f"or write {os.path.basename(path)} uncompressed")
+        self._path = path
+        self._handle = open(path, "wb")
+        self._process = subprocess.Popen([bgzip, "-c", "-l", str(level), "-@", str(threads)],
+                                         stdin=subprocess.PIPE, stdout=self._handle)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._process.stdin.write(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self._process.stdin.close()
+        returncode = self._process.wait()
+        self._handle.close()
+        super().close()
+        if returncode != 0:
+            raise OSError(f"bgzip failed with exit code {returncode} while writing {self._path}")
+
+
+def is_gzipped(path: str) -> bool:
+    """Return True if ``path`` starts with the gzip magic bytes (covers BGZF)."""
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def open_vcf(path: str, mode: str = "r", level: int = 6, threads: int = BGZIP_THREADS):
+    """
+    Open a VCF for reading or writing.
+
+    Args:
+        path (str): VCF path; compression is detected from the content when
+            reading and from a ``.gz`` suffix when writing
+        mode (str): ``"r"``/``"w"`` for text streams, ``"rb"``/``"wb"`` for binary
+        level (int): Deflate level for BGZF output
+        threads (int): bgzip compression threads for BGZF output
+
+    Returns:
+        A file object yielding/accepting VCF lines
+    """
+    binary = "b" in mode
+    if mode.startswith("r"):
+        if is_gzipped(path):
+            return gzip.open(path, "rb" if binary else "rt")
+        return open(path, "rb" if binary else "r")
+    if str(path).endswith(".gz"):
+        writer = io.BufferedWriter(BgzfWriter(path, level=level, threads=threads))
+        return writer if binary else io.TextIOWrapper(writer)
+    return open(path, "wb" if binary else "w")
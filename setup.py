@@ -7,6 +7,7 @@ setup(
     author="Pipeline Development Team",
     packages=find_packages(),
     install_requires=[
+        "numpy",
         "pandas",
         "pyyaml",
     ],
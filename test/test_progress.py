@@ -0,0 +1,46 @@
+"""
+Tests for following a workflow through its snakemake log.
+
+``data/progress/message_rules.snakemake.log`` is the log of a real snakemake
+run of ``data/progress/Snakefile``, whose ``trim`` and ``merge`` rules have a
+``message:`` and are therefore logged as ``Job N: <message>``.
+"""
+
+from pathlib import Path
+
+from mapping_by_sequencing.pipeline.progress import WorkflowProgress, message_rules
+
+DATA = Path(__file__).parent / "data" / "progress"
+
+
+def feed_log(progress, stop=None):
+    for line in (DATA / "message_rules.snakemake.log").read_text().splitlines():
+        if line == stop:
+            break
+        progress.feed(line)
+    return progress
+
+
+def test_message_jobs_are_counted_under_their_rule():
+    progress = feed_log(WorkflowProgress())
+    assert progress.status == "complete"
+    assert (progress.steps_done, progress.steps_total) == (6, 6)
+    assert dict(progress.done) == {"trim": 2, "count": 2, "merge": 1, "all": 1}
+    assert "?" not in progress.done
+    assert not progress.running
+    assert len(progress.durations["trim"]) == 2
+    assert "merge" in progress.durations
+    assert "?" not in progress.render()
+
+
+def test_message_jobs_run_under_their_rule():
+    messages = message_rules(DATA / "Snakefile")
+    assert [rule for _, rule in messages] == ["trim", "merge"]
+    progress = feed_log(WorkflowProgress(messages), stop="Finished jobid: 3 (Rule: trim)")
+    assert sorted(progress.running.items()) == [(3, ("trim", progress.started_at)),
+                                                (5, ("trim", progress.started_at))]
+
+
+def test_message_jobs_without_patterns_still_run():
+    progress = feed_log(WorkflowProgress(), stop="Finished jobid: 3 (Rule: trim)")
+    assert sorted(progress.running) == [3, 5]